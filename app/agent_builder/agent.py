@@ -1,17 +1,23 @@
 import logging
-from typing import Annotated, List, TypedDict
+from typing import Annotated, List, Optional, TypedDict
 import os
 from datetime import datetime, timedelta, timezone
 import pytz
-from langchain.prompts import MessagesPlaceholder
-from langchain.schema import HumanMessage, SystemMessage
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph, START, add_messages, END
 from langgraph.prebuilt import ToolNode, tool_node, tools_condition
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from googleapiclient.discovery import build, HttpError
-from langchain_core.prompts import ChatPromptTemplate
+from googleapiclient.discovery import HttpError
+from app.agent_builder.busy_index import get_busy_index
+from app.agent_builder.calendar_prefetch import CalendarPrefetcher
+from app.agent_builder.calendar_service import aget_calendar_timezone, get_calendar_service
+from app.agent_builder.checkpointer import build_checkpointer, close_checkpointer
+from app.agent_builder.history import HistoryManager
+from app.agent_builder.prompt_registry import PromptRegistry
+from app.agent_builder.slot_finder import find_free_slots, working_windows
+from app.utils.metrics import metrics
+from app.utils.resources import resources
+from app.voice_manager.session_scheduler import scheduler
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,9 +27,22 @@ logger = logging.getLogger(__name__)
 
 CALENDAR_ID = os.environ.get("GOOGLE_CALENDAR_ID", "primary")
 
-memory = InMemorySaver()
+# Opened in each worker by the lifespan: a SQLite connection must not be inherited across fork
+resources.register("checkpointer", build_checkpointer, close=close_checkpointer)
 
-llm = init_chat_model('google_genai:gemini-2.5-flash', temperature=0.8)
+
+def build_chat_model():
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model('google_genai:gemini-2.5-flash', temperature=0.8)
+
+
+# Created on first use (or during startup) so importing the agent needs no credentials
+resources.register("chat_model", build_chat_model)
+
+
+def get_chat_model():
+    return resources.get("chat_model")
 
 
 class AgentState(TypedDict):
@@ -34,8 +53,12 @@ class Event(TypedDict):
     start_time: str
     end_time: str
 
+class Slot(TypedDict):
+    start_time: str
+    end_time: str
+
 @tool
-def get_current_year() -> int:
+async def get_current_year() -> int:
     """
         Returns the current year in integer format. for example 2025
 
@@ -47,7 +70,7 @@ def get_current_year() -> int:
     return datetime.now(timezone.utc).year
 
 @tool
-def check_calendar_availability(date_and_time: str, duration_minutes: int = 30) -> bool:
+async def check_calendar_availability(date_and_time: str, duration_minutes: int = 30) -> bool:
     """
     Checks if the given date and time conflicts with any existing events in the user's Google Calendar.
 
@@ -69,26 +92,14 @@ def check_calendar_availability(date_and_time: str, duration_minutes: int = 30)
     """
     try:
         logger.info(f"Checking calendar availability for {date_and_time}")
-        service = build("calendar", "v3", cache_discovery=False)
+        busy_index = get_busy_index(CALENDAR_ID)
         start_time_dt = datetime.fromisoformat(date_and_time)
         end_time_dt = start_time_dt + timedelta(minutes=duration_minutes)
 
-        calendar = service.calendars().get(calendarId=CALENDAR_ID).execute()
-        tz_str = calendar['timeZone']
+        tz_str = await aget_calendar_timezone(CALENDAR_ID)
         tz = pytz.timezone(tz_str)
 
-        event_result = (
-            service.events()
-            .list(
-                calendarId=CALENDAR_ID,
-                timeMin=tz.localize(start_time_dt).isoformat(),
-                timeMax=tz.localize(end_time_dt).isoformat(),
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-        events = event_result.get("items", [])
+        events = await busy_index.aoverlapping(tz.localize(start_time_dt), tz.localize(end_time_dt))
 
         logger.info(f"Events found: {events} for {date_and_time}")
         if len(events) > 0:
@@ -96,11 +107,11 @@ def check_calendar_availability(date_and_time: str, duration_minutes: int = 30)
         else:
             return True  # No conflict
     except HttpError as error:
-        print(f"An error occurred: {error}")
+        logger.error(f"An error occurred: {error}")
         raise error
     
 @tool
-def get_events_for_date(date: str) -> List[Event]:
+async def get_events_for_date(date: str) -> List[Event]:
     """
     Fetches all events from the user's Google Calendar for the specified date.
 
@@ -122,35 +133,20 @@ def get_events_for_date(date: str) -> List[Event]:
     """
     try:
         logger.info(f"Fetching events for date: {date}")
-        service = build("calendar", "v3", cache_discovery=False)
-        calendar = service.calendars().get(calendarId=CALENDAR_ID).execute()
-        tz_str = calendar['timeZone']
+        busy_index = get_busy_index(CALENDAR_ID)
+        tz_str = await aget_calendar_timezone(CALENDAR_ID)
         tz = pytz.timezone(tz_str)
 
-        time_min_dt = tz.localize(datetime.strptime(f"{date}T00:00:00", "%Y-%m-%dT%H:%M:%S"))
-        time_max_dt = tz.localize(datetime.strptime(f"{date}T23:59:59", "%Y-%m-%dT%H:%M:%S"))
-
-        event_result = (
-            service.events()
-            .list(
-                calendarId=CALENDAR_ID,
-                timeMin=time_min_dt.isoformat(),
-                timeMax=time_max_dt.isoformat(),
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-        events = event_result.get("items", [])
-        event_summaries = []
+        day = datetime.strptime(date, "%Y-%m-%d")
+        time_min_dt = tz.localize(day)
+        time_max_dt = tz.localize(day + timedelta(days=1))
 
-        for event in events:
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            end = event["end"].get("dateTime", event["end"].get("date"))
+        event_summaries = []
+        for block in await busy_index.aoverlapping(time_min_dt, time_max_dt):
             event_summaries.append({
-                "title": event["summary"],
-                "start_time": start,
-                "end_time": end
+                "title": block.title,
+                "start_time": block.start_raw,
+                "end_time": block.end_raw
             })
         logger.info(f"Events on {date}: {event_summaries}")
         return event_summaries
@@ -158,8 +154,14 @@ def get_events_for_date(date: str) -> List[Event]:
         logger.error(f"An error occurred: {error}")
         raise error
 
+def _insert_event(event: dict) -> dict:
+    created_event = get_calendar_service().events().insert(calendarId=CALENDAR_ID, body=event).execute()
+    # Write through so the next availability check sees the booking without a sync
+    get_busy_index(CALENDAR_ID).upsert(created_event)
+    return created_event
+
 @tool
-def create_event_for_datetime(date_and_time: str, title: str, description: str, duration_minutes: int = 30) -> str:
+async def create_event_for_datetime(date_and_time: str, title: str, description: str, duration_minutes: int = 30) -> str:
     """
     Creates a new event in the user's Google Calendar at the specified date and time.
 
@@ -182,11 +184,9 @@ def create_event_for_datetime(date_and_time: str, title: str, description: str,
     """
     try:
         logger.info(f"Creating event '{title}' at {date_and_time}")
-        service = build("calendar", "v3", cache_discovery=False)
         start_time_dt = datetime.fromisoformat(date_and_time)
         end_time_dt = start_time_dt + timedelta(minutes=duration_minutes)
-        calendar = service.calendars().get(calendarId=CALENDAR_ID).execute()
-        time_zone = calendar['timeZone']
+        time_zone = await aget_calendar_timezone(CALENDAR_ID)
         event = {
             "summary": title,
             "description": description,
@@ -196,32 +196,137 @@ def create_event_for_datetime(date_and_time: str, title: str, description: str,
                 "timeZone": time_zone,
             },
         }
-        created_event = service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+        # The Calendar client is blocking; the insert runs on the scheduler's pool
+        created_event = await scheduler.run_blocking("tool", _insert_event, event)
         logger.info(f"Event created: {created_event.get('htmlLink')}")
         return "Event created successfully"
     except HttpError as error:
         logger.error(f"An error occurred: {error}")
         raise error
     
-tools = [check_calendar_availability, get_events_for_date, create_event_for_datetime, get_current_year]
+@tool
+async def find_available_slots(
+    start_date: str,
+    end_date: str,
+    duration_minutes: int = 30,
+    working_hours_start: str = "09:00",
+    working_hours_end: str = "17:00",
+    preferred_time: Optional[str] = None,
+    max_results: int = 3,
+    include_weekends: bool = False,
+) -> List[Slot]:
+    """
+    Finds the open appointment slots nearest to the patient's request in the user's Google Calendar.
+
+    Use this instead of probing times one by one with check_calendar_availability, for example when
+    the requested time is taken and you need to offer alternatives, or when the patient gives a
+    range such as "sometime next week".
+
+    Args:
+        start_date (str): First day to search in 'YYYY-MM-DD' format (e.g. '2025-10-11')
+        end_date (str): Last day to search (inclusive) in 'YYYY-MM-DD' format (e.g. '2025-10-13')
+        duration_minutes (int): The duration of the appointment in minutes. Default is 30 minutes.
+        working_hours_start (str): Opening time in 'HH:MM' format. Default is '09:00'.
+        working_hours_end (str): Closing time in 'HH:MM' format. Default is '17:00'.
+        preferred_time (str): Optional ISO date and time the patient asked for (e.g. '2025-10-11T15:30:00').
+            When given, the slots closest to it are returned.
+        max_results (int): The number of slots to return. Default is 3.
+        include_weekends (bool): Whether Saturdays and Sundays can be booked. Default is False.
+    Returns:
+        List[Slot]: Open slots in chronological order, empty if nothing is free in the range.
+    Raises:
+        HttpError: If there is an error connecting to the Google Calendar API or the dates are invalid.
+    Example:
+        find_available_slots("2025-10-11", "2025-10-11", 30, preferred_time="2025-10-11T15:00:00")
+        # Returns: [
+            {"start_time": "2025-10-11T14:30:00+11:00", "end_time": "2025-10-11T15:00:00+11:00"},
+            {"start_time": "2025-10-11T15:30:00+11:00", "end_time": "2025-10-11T16:00:00+11:00"},
+            {"start_time": "2025-10-11T16:00:00+11:00", "end_time": "2025-10-11T16:30:00+11:00"}
+        ]
+    """
+    try:
+        logger.info(f"Finding available slots between {start_date} and {end_date}")
+        busy_index = get_busy_index(CALENDAR_ID)
+        tz_str = await aget_calendar_timezone(CALENDAR_ID)
+        tz = pytz.timezone(tz_str)
+
+        first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+        windows = working_windows(
+            first_day,
+            last_day,
+            datetime.strptime(working_hours_start, "%H:%M").time(),
+            datetime.strptime(working_hours_end, "%H:%M").time(),
+            tz,
+            include_weekends=include_weekends,
+        )
+        if not windows:
+            return []
+
+        # One (usually empty) delta sync, then the gap search runs over the local index
+        busy = [(block.start, block.end) for block in await busy_index.aoverlapping(windows[0][0], windows[-1][1])]
+        preferred = tz.localize(datetime.fromisoformat(preferred_time)) if preferred_time else None
+        slots = find_free_slots(
+            busy,
+            windows,
+            timedelta(minutes=duration_minutes),
+            max_results=max_results,
+            not_before=datetime.now(tz),
+            preferred=preferred,
+        )
+        available = [
+            {"start_time": start.astimezone(tz).isoformat(), "end_time": end.astimezone(tz).isoformat()}
+            for start, end in slots
+        ]
+        logger.info(f"Available slots: {available}")
+        return available
+    except HttpError as error:
+        logger.error(f"An error occurred: {error}")
+        raise error
+
+tools = [check_calendar_availability, find_available_slots, get_events_for_date, create_event_for_datetime, get_current_year]
     
-llm_with_tools = llm.bind_tools(tools=tools)
+prompt_registry = PromptRegistry(get_chat_model, tools)
+prompt_registry.register("receptionist", "system_prompt.md")
 
-def initiate_chat(state):
+history_manager = HistoryManager()
+calendar_prefetcher = CalendarPrefetcher(CALENDAR_ID)
+
+async def initiate_chat(state):
     try:
-        with open("/Users/asantha/Desktop/voice_assistant/app/system_prompt.md", "r") as f:
-            system_prompt = f.read()
-        prompt = ChatPromptTemplate.from_messages(
-            messages = [
-                SystemMessage(content=system_prompt),
-                MessagesPlaceholder(variable_name="messages")
-            ]
+        last_message = state['messages'][-1] if state['messages'] else None
+        if isinstance(last_message, HumanMessage):
+            # First pass of a turn: warm the calendar data the tools are likely to need
+            # while the model is still thinking
+            calendar_prefetcher.maybe_prefetch(last_message.content)
+        chain = await prompt_registry.aget_chain("receptionist")
+        messages, history_stats = history_manager.compact(state['messages'])
+        # Ratio of sent to original shows how much the compaction saves per model call
+        for window, tokens, message_count in (
+            ("original", history_stats.original_tokens, history_stats.original_messages),
+            ("sent", history_stats.sent_tokens, history_stats.sent_messages),
+        ):
+            metrics.counter("voice_agent_history_tokens_total", "Estimated history tokens per model call", window=window).inc(tokens)
+            metrics.counter("voice_agent_history_messages_total", "History messages per model call", window=window).inc(message_count)
+        # Stream tokens so the graph can surface them (stream_mode="messages") to TTS
+        response = None
+        # One "llm" slot per model call, released before the tools step runs
+        async with scheduler.stage("llm"):
+            async for chunk in chain.astream({"messages": messages}):
+                response = chunk if response is None else response + chunk
+        if response is None:
+            # Surfaces as a failed turn, which the client is told about
+            raise RuntimeError("The model returned an empty stream")
+        usage = response.usage_metadata or {}
+        logger.info(
+            f"Agent prompt: {history_stats.sent_messages}/{history_stats.original_messages} messages, "
+            f"~{history_stats.sent_tokens}/{history_stats.original_tokens} history tokens, "
+            f"input_tokens={usage.get('input_tokens')} output_tokens={usage.get('output_tokens')}"
         )
-        chain = prompt | llm_with_tools
-        response = chain.invoke({"messages": state['messages']})
-        logger.info(f"Agent response: {response}")
+        logger.debug(f"Agent response: {response}")
+        # add_messages appends; returning the whole history would re-merge every message
         return {
-            "messages": state['messages'] + [response]
+            "messages": [response]
         }
     except Exception as e:
         logger.error(f"Error in initiate_chat: {e}")
@@ -230,6 +335,7 @@ def initiate_chat(state):
 graph_builder = StateGraph(AgentState)
 graph_builder.add_node('agent_node', initiate_chat)
 
+# Calendar tools are async, so the independent calls of one model step run concurrently
 tool_node = ToolNode(tools=tools)
 graph_builder.add_node('tools', tool_node)
 graph_builder.add_conditional_edges(
@@ -239,4 +345,15 @@ graph_builder.add_conditional_edges(
 graph_builder.add_edge('tools', 'agent_node')
 graph_builder.set_entry_point('agent_node')
 graph_builder.add_edge('agent_node', END)
-graph = graph_builder.compile(checkpointer=memory)
+
+
+def build_graph():
+    return graph_builder.compile(checkpointer=resources.get("checkpointer"))
+
+
+resources.register("graph", build_graph)
+
+
+def get_graph():
+    return resources.get("graph")
+
@@ -0,0 +1,257 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytz
+from googleapiclient.errors import HttpError
+
+from app.agent_builder.calendar_service import get_calendar_service, get_calendar_timezone
+from app.utils.metrics import metrics
+from app.voice_manager.session_scheduler import scheduler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BUSY_INDEX_REFRESH_SECONDS = float(os.environ.get("BUSY_INDEX_REFRESH_SECONDS", "30"))
+# Start of the booking horizon: blocks that ended longer ago than this are dropped
+BUSY_INDEX_HISTORY_HOURS = float(os.environ.get("BUSY_INDEX_HISTORY_HOURS", "24"))
+
+
+@dataclass(frozen=True)
+class BusyBlock:
+    event_id: str
+    start: datetime  # timezone aware, UTC
+    end: datetime
+    title: str
+    start_raw: str
+    end_raw: str
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """What overlap queries read: replaced as a whole, never changed in place."""
+    blocks: Tuple[BusyBlock, ...] = ()  # sorted by start
+    starts: Tuple[datetime, ...] = ()
+    max_duration: timedelta = timedelta(0)
+
+
+def _parse_event_time(value: Dict[str, str], tz) -> datetime:
+    if "dateTime" in value:
+        parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = tz.localize(parsed)
+    else:
+        # All-day events are expressed in the calendar's local time zone
+        parsed = tz.localize(datetime.strptime(value["date"], "%Y-%m-%d"))
+    return parsed.astimezone(pytz.utc)
+
+
+class BusyIndex:
+    """
+    In-memory interval index of the busy blocks on one calendar.
+
+    The index is populated with a full `events().list` sync and then kept current with the
+    Calendar API's incremental sync tokens: at most one (usually empty) delta request per
+    `refresh_seconds`, however many slots the agent probes in between. Locally created
+    events are written through with `upsert()` so they are visible immediately.
+
+    Nothing can be booked in the past, so the full sync only lists events that end after
+    the start of the booking horizon (`history` before now) and every sync prunes the
+    blocks that have since fallen behind it; the index holds the upcoming calendar, not
+    its whole history.
+
+    Overlap queries use a list sorted by start time plus the longest block duration to
+    bound the bisect window. They read an immutable snapshot without locking: a sync
+    fetches its pages holding only the sync lock and then swaps in a new snapshot, so a
+    query on the event loop never waits on a Calendar round trip.
+
+    The async queries run the sync on the scheduler's thread pool ("tool" stage) and
+    share it: parallel tool calls and a speculative prefetch that find the index stale
+    at the same time wait on one delta request instead of each making their own.
+    """
+
+    def __init__(
+        self,
+        calendar_id: str,
+        service_factory: Callable = get_calendar_service,
+        refresh_seconds: float = BUSY_INDEX_REFRESH_SECONDS,
+        history: timedelta = timedelta(hours=BUSY_INDEX_HISTORY_HOURS),
+    ):
+        self.calendar_id = calendar_id
+        self.service_factory = service_factory
+        self.refresh_seconds = refresh_seconds
+        self.history = history
+        self.api_requests = 0
+        self._blocks: Dict[str, BusyBlock] = {}
+        self._snapshot = _Snapshot()
+        self._sync_token: Optional[str] = None
+        self._last_sync = 0.0
+        # One sync at a time; held across the Calendar requests
+        self._sync_lock = threading.Lock()
+        # Guards `_blocks` while it is changed; never held across network I/O
+        self._lock = threading.Lock()
+        # Events written through while a sync is fetching, re-applied over its pages
+        self._upserted_during_sync: Optional[List[Dict]] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def timezone(self):
+        return pytz.timezone(get_calendar_timezone(self.calendar_id))
+
+    def _rebuild(self):
+        blocks = tuple(sorted(self._blocks.values(), key=lambda block: block.start))
+        self._snapshot = _Snapshot(
+            blocks=blocks,
+            starts=tuple(block.start for block in blocks),
+            max_duration=max((block.end - block.start for block in blocks), default=timedelta(0)),
+        )
+
+    def _apply(self, event: Dict, tz) -> None:
+        event_id = event["id"]
+        if event.get("status") == "cancelled" or "start" not in event:
+            self._blocks.pop(event_id, None)
+            return
+        self._blocks[event_id] = BusyBlock(
+            event_id=event_id,
+            start=_parse_event_time(event["start"], tz),
+            end=_parse_event_time(event["end"], tz),
+            title=event.get("summary", ""),
+            start_raw=event["start"].get("dateTime", event["start"].get("date")),
+            end_raw=event["end"].get("dateTime", event["end"].get("date")),
+        )
+
+    def _horizon_start(self) -> datetime:
+        return datetime.now(pytz.utc) - self.history
+
+    def _prune(self):
+        horizon_start = self._horizon_start()
+        for event_id in [event_id for event_id, block in self._blocks.items() if block.end <= horizon_start]:
+            del self._blocks[event_id]
+
+    def _list_pages(self, **params):
+        service = self.service_factory()
+        page_token = None
+        while True:
+            self.api_requests += 1
+            result = service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, pageToken=page_token, **params
+            ).execute()
+            yield result
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return
+
+    def _fetch_pages(self) -> Tuple[List[Dict], bool]:
+        """The changes since the last sync, or every event on the horizon; also whether it was a full listing."""
+        full_sync = self._sync_token is None
+        # The Calendar API rejects timeMin together with a sync token
+        params = {"timeMin": self._horizon_start().isoformat()} if full_sync else {"syncToken": self._sync_token}
+        try:
+            return list(self._list_pages(**params)), full_sync
+        except HttpError as error:
+            if getattr(error, "status_code", None) == 410 or getattr(error.resp, "status", None) == 410:
+                logger.info(f"Sync token expired for {self.calendar_id}, running a full sync")
+                self._sync_token = None
+                return self._fetch_pages()
+            raise
+
+    def _sync(self):
+        tz = self.timezone
+        with self._lock:
+            self._upserted_during_sync = []
+        try:
+            pages, full_sync = self._fetch_pages()
+        finally:
+            with self._lock:
+                upserted, self._upserted_during_sync = self._upserted_during_sync, None
+
+        with self._lock:
+            if full_sync:
+                self._blocks.clear()
+            for page in pages:
+                for event in page.get("items", []):
+                    self._apply(event, tz)
+            # The pages may predate an event booked meanwhile
+            for event in upserted:
+                self._apply(event, tz)
+            self._prune()
+            self._rebuild()
+        for page in pages:
+            if page.get("nextSyncToken"):
+                self._sync_token = page["nextSyncToken"]
+        self._last_sync = time.monotonic()
+        logger.debug(f"Busy index for {self.calendar_id} synced ({'full' if full_sync else 'incremental'}), {len(self._blocks)} blocks")
+
+    def is_stale(self, lookahead: float = 0.0) -> bool:
+        """Whether the index is (or, `lookahead` seconds from now, will be) due for a sync."""
+        return self._sync_token is None or time.monotonic() - self._last_sync >= self.refresh_seconds - lookahead
+
+    def ensure_fresh(self, lookahead: float = 0.0, trigger: str = "query"):
+        with self._sync_lock:
+            if self.is_stale(lookahead):
+                self._sync()
+                metrics.counter("voice_busy_index_syncs_total", "Calendar syncs of the free/busy index", trigger=trigger).inc()
+
+    async def aensure_fresh(self, lookahead: float = 0.0, trigger: str = "query"):
+        if not self.is_stale(lookahead):
+            return
+        inflight = self._inflight
+        if inflight is None or inflight.done() or inflight.get_loop() is not asyncio.get_running_loop():
+            inflight = asyncio.ensure_future(scheduler.run_blocking("tool", self.ensure_fresh, lookahead, trigger))
+            self._inflight = inflight
+        # Shielded: a caller cancelled by barge-in must not cancel the sync others wait on
+        await asyncio.shield(inflight)
+
+    def invalidate(self):
+        """Forces a delta sync on the next query, e.g. after a push notification."""
+        self._last_sync = 0.0
+
+    def upsert(self, event: Dict):
+        """Writes an event created or changed locally through to the index."""
+        tz = self.timezone
+        with self._lock:
+            self._apply(event, tz)
+            self._rebuild()
+            if self._upserted_during_sync is not None:
+                self._upserted_during_sync.append(event)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[BusyBlock]:
+        """Returns the busy blocks that overlap [start, end). Datetimes must be timezone aware."""
+        self.ensure_fresh()
+        return self._query(start, end)
+
+    async def aoverlapping(self, start: datetime, end: datetime) -> List[BusyBlock]:
+        await self.aensure_fresh()
+        return self._query(start, end)
+
+    def _query(self, start: datetime, end: datetime) -> List[BusyBlock]:
+        start, end = start.astimezone(pytz.utc), end.astimezone(pytz.utc)
+        snapshot = self._snapshot
+        lo = bisect.bisect_left(snapshot.starts, start - snapshot.max_duration)
+        hi = bisect.bisect_left(snapshot.starts, end)
+        return [block for block in snapshot.blocks[lo:hi] if block.end > start]
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return not self.overlapping(start, end)
+
+
+_indexes: Dict[str, BusyIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_busy_index(calendar_id: str) -> BusyIndex:
+    with _indexes_lock:
+        index = _indexes.get(calendar_id)
+        if index is None:
+            index = BusyIndex(calendar_id)
+            _indexes[calendar_id] = index
+        return index
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import date, timedelta
+from typing import List, Optional, Set
+
+from app.agent_builder.busy_index import get_busy_index
+from app.agent_builder.calendar_service import aget_calendar_timezone
+from app.utils.metrics import metrics, traced
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CALENDAR_PREFETCH = os.environ.get("CALENDAR_PREFETCH", "true").lower() == "true"
+# Refresh the index if it would otherwise go stale within this long, i.e. before the tool runs
+CALENDAR_PREFETCH_LOOKAHEAD_SECONDS = float(os.environ.get("CALENDAR_PREFETCH_LOOKAHEAD_SECONDS", "10"))
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+        ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"),
+        ("november", "nov"), ("december", "dec"),
+    ], start=1)
+    for name in names
+}
+WEEKDAYS = {name: number for number, name in enumerate(
+    ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+)}
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH_DAY = re.compile(rf"\b({_MONTH})\.?\s+(?:the\s+)?{_DAY}\b")
+_DAY_MONTH = re.compile(rf"\b(?:the\s+)?{_DAY}\s+(?:of\s+)?({_MONTH})\b")
+_ORDINAL = re.compile(r"\bthe\s+(\d{1,2})(?:st|nd|rd|th)\b")
+_WEEKDAY = re.compile(rf"\b(next\s+|this\s+)?({'|'.join(WEEKDAYS)})\b")
+_RELATIVE = re.compile(r"\b(day after tomorrow|today|tonight|tomorrow|next week)\b")
+
+
+def _in_year(today: date, month: int, day: int) -> Optional[date]:
+    """The date in the current year, or next year if it has passed (callers do not say the year)."""
+    try:
+        candidate = date(today.year, month, day)
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def mentioned_dates(text: str, today: Optional[date] = None) -> List[date]:
+    """
+    Dates a caller's utterance refers to, e.g. "tomorrow", "next Thursday", "October 21st",
+    "the 3rd of November" or "2025-10-21". "next week" yields its Monday to Friday.
+
+    Deliberately cheap and approximate: a miss only costs the prefetch, not correctness.
+    """
+    today = today or date.today()
+    text = text.lower()
+    found: Set[date] = set()
+    for year, month, day in _ISO_DATE.findall(text):
+        try:
+            found.add(date(int(year), int(month), int(day)))
+        except ValueError:
+            pass
+    for month, day in _MONTH_DAY.findall(text):
+        found.add(_in_year(today, MONTHS[month], int(day)))
+    for day, month in _DAY_MONTH.findall(text):
+        found.add(_in_year(today, MONTHS[month], int(day)))
+    if not found:
+        for day in _ORDINAL.findall(text):
+            # "the 21st": this month, or next month if it has passed
+            month_start = today.replace(day=1)
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            for first in (month_start, next_month):
+                try:
+                    candidate = first.replace(day=int(day))
+                except ValueError:
+                    continue
+                if candidate >= today:
+                    found.add(candidate)
+                    break
+    for qualifier, weekday in _WEEKDAY.findall(text):
+        ahead = (WEEKDAYS[weekday] - today.weekday()) % 7
+        if qualifier.strip() == "next" and ahead == 0:
+            ahead = 7
+        found.add(today + timedelta(days=ahead))
+    for phrase in _RELATIVE.findall(text):
+        if phrase in ("today", "tonight"):
+            found.add(today)
+        elif phrase == "tomorrow":
+            found.add(today + timedelta(days=1))
+        elif phrase == "day after tomorrow":
+            found.add(today + timedelta(days=2))
+        else:
+            monday = today + timedelta(days=7 - today.weekday())
+            found.update(monday + timedelta(days=offset) for offset in range(5))
+    found.discard(None)
+    return sorted(found)
+
+
+class CalendarPrefetcher:
+    """
+    Speculatively refreshes the calendar data a turn is likely to need while the LLM is
+    still deciding which tool to call.
+
+    When the caller's utterance mentions a date that has not passed, the calendar's time
+    zone is loaded and the free/busy index is delta-synced in the background if it is, or
+    would be within `lookahead` seconds, due for a sync. The availability tools then
+    answer from the local index instead of waiting on the Calendar API, and a tool call
+    that arrives while the prefetch is still running joins it rather than syncing again.
+    """
+
+    def __init__(self, calendar_id: str, lookahead: float = CALENDAR_PREFETCH_LOOKAHEAD_SECONDS,
+                 enabled: bool = CALENDAR_PREFETCH):
+        self.calendar_id = calendar_id
+        self.lookahead = lookahead
+        self.enabled = enabled
+        self._tasks: Set[asyncio.Task] = set()
+
+    def maybe_prefetch(self, transcript: str) -> Optional[asyncio.Task]:
+        if not self.enabled:
+            return None
+        today = date.today()
+        dates = [day for day in mentioned_dates(transcript, today) if day >= today]
+        if not dates:
+            return None
+        if not get_busy_index(self.calendar_id).is_stale(self.lookahead):
+            metrics.counter("voice_calendar_prefetch_total", "Speculative calendar prefetches", result="fresh").inc()
+            return None
+        metrics.counter("voice_calendar_prefetch_total", "Speculative calendar prefetches", result="started").inc()
+        logger.debug(f"Prefetching calendar {self.calendar_id} for {dates}")
+        # The task copies the turn's context, so its span lands on the turn's trace
+        task = asyncio.create_task(self._prefetch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _prefetch(self):
+        try:
+            with traced("calendar_prefetch"):
+                await aget_calendar_timezone(self.calendar_id)
+                await get_busy_index(self.calendar_id).aensure_fresh(self.lookahead, trigger="prefetch")
+        except Exception as e:
+            # The tool call will retry and report the error itself
+            logger.warning(f"Calendar prefetch failed: {e}")
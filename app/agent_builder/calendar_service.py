@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import google.auth
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+
+from app.utils.resources import resources
+from app.voice_manager.session_scheduler import scheduler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+CALENDAR_METADATA_TTL_SECONDS = float(os.environ.get("CALENDAR_METADATA_TTL_SECONDS", "3600"))
+CALENDAR_HTTP_TIMEOUT_SECONDS = float(os.environ.get("CALENDAR_HTTP_TIMEOUT_SECONDS", "10"))
+
+
+class TTLCache:
+    """Small thread-safe TTL cache that counts hits and misses."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # Load outside the lock so a slow API call does not serialize other keys
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def get_fresh(self, key: Hashable) -> Any:
+        """The cached value if it has not expired (counted as a hit), else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_credentials = None
+_thread_local = threading.local()
+
+calendar_metadata_cache = TTLCache(CALENDAR_METADATA_TTL_SECONDS)
+
+
+def _thread_http() -> google_auth_httplib2.AuthorizedHttp:
+    # httplib2 connections are not thread-safe, so each executor thread keeps its own
+    # keep-alive connection pool and reuses it across tool calls
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(
+            _credentials, http=httplib2.Http(timeout=CALENDAR_HTTP_TIMEOUT_SECONDS)
+        )
+        _thread_local.http = http
+    return http
+
+
+def _build_request(http, *args, **kwargs):
+    return HttpRequest(_thread_http(), *args, **kwargs)
+
+
+def build_calendar_service():
+    global _credentials
+    _credentials, _ = google.auth.default(scopes=CALENDAR_SCOPES)
+    service = build(
+        "calendar", "v3",
+        credentials=_credentials,
+        requestBuilder=_build_request,
+        cache_discovery=False,
+    )
+    logger.info("Google Calendar service initialized")
+    return service
+
+
+resources.register("calendar_service", build_calendar_service)
+
+
+def get_calendar_service():
+    """Returns the process-wide Calendar v3 service. Discovery runs once per process."""
+    return resources.get("calendar_service")
+
+
+def set_calendar_service(service):
+    """Replaces the process-wide service, e.g. with `app.fakes.calendar.FakeCalendarService`."""
+    resources.set("calendar_service", service)
+    calendar_metadata_cache.invalidate()
+
+
+def get_calendar_timezone(calendar_id: str) -> str:
+    """Returns the calendar's IANA time zone, served from the metadata cache when fresh."""
+    def load():
+        calendar = get_calendar_service().calendars().get(calendarId=calendar_id).execute()
+        return calendar["timeZone"]
+
+    return calendar_metadata_cache.get_or_load(("timeZone", calendar_id), load)
+
+
+async def aget_calendar_timezone(calendar_id: str) -> str:
+    """Async `get_calendar_timezone`: a cache hit is answered inline, a miss loads on the scheduler's pool."""
+    time_zone = calendar_metadata_cache.get_fresh(("timeZone", calendar_id))
+    if time_zone is not None:
+        return time_zone
+    return await scheduler.run_blocking("tool", get_calendar_timezone, calendar_id)
+
+
+def calendar_cache_stats() -> Dict[str, Any]:
+    return calendar_metadata_cache.stats()
@@ -0,0 +1,477 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from app.utils.session_store import SessionStore, build_session_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_BACKEND = os.environ.get("CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+CHECKPOINT_HOT_THREADS = int(os.environ.get("CHECKPOINT_HOT_THREADS", "256"))
+CHECKPOINT_THREAD_TTL_SECONDS = float(os.environ.get("CHECKPOINT_THREAD_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_KEEP_PER_THREAD = int(os.environ.get("CHECKPOINT_KEEP_PER_THREAD", "5"))
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = float(os.environ.get("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "300"))
+
+HotKey = Tuple[str, str]
+
+
+class ThreadedCheckpointSaver(BaseCheckpointSaver[str]):
+    """Async interface for a blocking checkpointer: each call runs in the default executor."""
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> HotKey:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, partial(fn, *args, **kwargs))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._run(self.delete_thread, thread_id)
+
+
+class TieredCheckpointSaver(ThreadedCheckpointSaver):
+    """
+    Conversation checkpointer with a bounded in-memory hot tier over a durable SQLite store.
+
+    - Every checkpoint is written to SQLite, so threads survive restarts and can be resumed
+      by any worker that shares the database file.
+    - The latest checkpoint of recently active threads is kept in an LRU of at most
+      `max_hot_threads` entries. A hot hit is validated against the latest checkpoint id in
+      SQLite, so a thread advanced by another worker is reloaded instead of served stale.
+    - Threads idle for longer than `thread_ttl_seconds` are deleted, and only the newest
+      `keep_per_thread` checkpoints of each thread are retained. Pruning runs at most once
+      per `prune_interval_seconds`, piggybacked on writes.
+    """
+
+    def __init__(
+        self,
+        durable: SqliteSaver,
+        max_hot_threads: int = CHECKPOINT_HOT_THREADS,
+        thread_ttl_seconds: float = CHECKPOINT_THREAD_TTL_SECONDS,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+        prune_interval_seconds: float = CHECKPOINT_PRUNE_INTERVAL_SECONDS,
+    ):
+        super().__init__(serde=durable.serde)
+        self.durable = durable
+        self.max_hot_threads = max_hot_threads
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.keep_per_thread = keep_per_thread
+        self.prune_interval_seconds = prune_interval_seconds
+        self.hot_hits = 0
+        self.hot_misses = 0
+        self._hot: "OrderedDict[HotKey, CheckpointTuple]" = OrderedDict()
+        self._hot_lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        with self.durable.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+            )
+
+    def _latest_checkpoint_id(self, key: HotKey) -> Optional[str]:
+        with self.durable.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                key,
+            )
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def _remember(self, key: HotKey, checkpoint_tuple: CheckpointTuple):
+        with self._hot_lock:
+            self._hot[key] = checkpoint_tuple
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.max_hot_threads:
+                self._hot.popitem(last=False)
+
+    def _forget(self, key: HotKey):
+        with self._hot_lock:
+            self._hot.pop(key, None)
+
+    def _touch_thread(self, thread_id: str):
+        with self.durable.cursor() as cur:
+            cur.execute(
+                "INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (thread_id, time.time()),
+            )
+
+    def hot_threads(self) -> int:
+        return len(self._hot)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if get_checkpoint_id(config):
+            return self.durable.get_tuple(config)
+
+        key = self._key(config)
+        with self._hot_lock:
+            cached = self._hot.get(key)
+        if cached is not None and cached.checkpoint["id"] == self._latest_checkpoint_id(key):
+            self.hot_hits += 1
+            with self._hot_lock:
+                if key in self._hot:
+                    self._hot.move_to_end(key)
+            # The graph mutates version bookkeeping on the loaded checkpoint
+            return cached._replace(checkpoint=copy_checkpoint(cached.checkpoint))
+
+        self.hot_misses += 1
+        checkpoint_tuple = self.durable.get_tuple(config)
+        if checkpoint_tuple is None:
+            self._forget(key)
+            return None
+        self._remember(key, checkpoint_tuple._replace(checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint)))
+        return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.durable.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved_config = self.durable.put(config, checkpoint, metadata, new_versions)
+        key = self._key(saved_config)
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent_config = (
+            {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": parent_id}}
+            if parent_id else None
+        )
+        self._remember(key, CheckpointTuple(
+            config=saved_config,
+            checkpoint=copy_checkpoint(checkpoint),
+            metadata=get_checkpoint_metadata(config, metadata),
+            parent_config=parent_config,
+            pending_writes=[],
+        ))
+        self._touch_thread(key[0])
+        self._maybe_prune()
+        return saved_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.durable.put_writes(config, writes, task_id, task_path)
+        # Pending writes are part of the checkpoint tuple; reload them from SQLite next time
+        self._forget(self._key(config))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.durable.delete_thread(thread_id)
+        with self.durable.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+        with self._hot_lock:
+            for key in [key for key in self._hot if key[0] == str(thread_id)]:
+                del self._hot[key]
+
+    def _maybe_prune(self):
+        if time.monotonic() - self._last_prune >= self.prune_interval_seconds:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def prune(self) -> int:
+        """Deletes expired threads and old checkpoints. Returns the number of expired threads."""
+        cutoff = time.time() - self.thread_ttl_seconds
+        with self.durable.cursor() as cur:
+            cur.execute("SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,))
+            expired = [row[0] for row in cur.fetchall()]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+
+        with self.durable.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                        ) AS position FROM checkpoints
+                    ) WHERE position > ?
+                )
+                """,
+                (self.keep_per_thread,),
+            )
+            cur.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                "AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+        if expired:
+            logger.info(f"Expired {len(expired)} idle conversation threads")
+        return len(expired)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        return self.durable.get_next_version(current, channel)
+
+
+class StoreCheckpointSaver(ThreadedCheckpointSaver):
+    """
+    Conversation checkpointer over a `SessionStore`, so threads can be resumed by workers
+    on other hosts (CHECKPOINT_BACKEND=redis).
+
+    Per thread and namespace the store holds the ids of the newest `keep_per_thread`
+    checkpoints, one record per checkpoint and one record of pending writes per
+    checkpoint. Every key expires `thread_ttl_seconds` after the thread's last write, so
+    idle threads are dropped by the store itself instead of by a prune pass.
+
+    Read-modify-write updates (the id index, pending writes) are serialized per process;
+    session affinity keeps a thread's turns on one worker, so they do not race across
+    processes.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        thread_ttl_seconds: float = CHECKPOINT_THREAD_TTL_SECONDS,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+    ):
+        super().__init__()
+        self.store = store
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.keep_per_thread = keep_per_thread
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prefix(thread_id: str, checkpoint_ns: str = "") -> str:
+        return f"ckpt:{thread_id}:{checkpoint_ns}:"
+
+    def _dumps(self, value: Any) -> bytes:
+        kind, data = self.serde.dumps_typed(value)
+        return kind.encode() + b"\n" + data
+
+    def _loads(self, raw: bytes) -> Any:
+        kind, _, data = raw.partition(b"\n")
+        return self.serde.loads_typed((kind.decode(), data))
+
+    def _index(self, prefix: str) -> List[str]:
+        raw = self.store.get(prefix + "index")
+        return json.loads(raw) if raw else []
+
+    def _load(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        prefix = self._prefix(thread_id, checkpoint_ns)
+        raw = self.store.get(prefix + "cp:" + checkpoint_id)
+        if raw is None:
+            return None
+        record = self._loads(raw)
+        raw_writes = self.store.get(prefix + "writes:" + checkpoint_id)
+        writes = self._loads(raw_writes) if raw_writes else {}
+        parent_id = record["parent_id"]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=record["checkpoint"],
+            metadata=record["metadata"],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, value) for task_id, channel, value, _ in writes.values()],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, checkpoint_ns = self._key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            index = self._index(self._prefix(thread_id, checkpoint_ns))
+            if not index:
+                return None
+            checkpoint_id = index[-1]
+        return self._load(thread_id, checkpoint_ns, checkpoint_id)
+
+    def _namespaces(self, thread_id: Optional[str]) -> Iterator[HotKey]:
+        scan_prefix = f"ckpt:{thread_id}:" if thread_id is not None else "ckpt:"
+        for key in self.store.scan(scan_prefix):
+            if key.endswith(":index"):
+                # ckpt:<thread>:<ns>:index; namespaces may contain ':' themselves
+                found_thread, _, rest = key[len("ckpt:"):].partition(":")
+                yield found_thread, rest[:-len(":index")]
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        configurable = (config or {}).get("configurable", {})
+        thread_id = configurable.get("thread_id")
+        if thread_id is not None and "checkpoint_ns" in configurable:
+            namespaces = [(str(thread_id), configurable["checkpoint_ns"])]
+        else:
+            namespaces = list(self._namespaces(str(thread_id) if thread_id is not None else None))
+        wanted_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        for found_thread, checkpoint_ns in namespaces:
+            for checkpoint_id in reversed(self._index(self._prefix(found_thread, checkpoint_ns))):
+                if wanted_id and checkpoint_id != wanted_id:
+                    continue
+                if before_id and checkpoint_id >= before_id:
+                    continue
+                checkpoint_tuple = self._load(found_thread, checkpoint_ns, checkpoint_id)
+                if checkpoint_tuple is None:
+                    continue
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id, checkpoint_ns = self._key(config)
+        prefix = self._prefix(thread_id, checkpoint_ns)
+        record = {
+            "checkpoint": checkpoint,
+            "metadata": get_checkpoint_metadata(config, metadata),
+            "parent_id": config["configurable"].get("checkpoint_id"),
+        }
+        with self._lock:
+            self.store.set(prefix + "cp:" + checkpoint["id"], self._dumps(record), ttl=self.thread_ttl_seconds)
+            index = [checkpoint_id for checkpoint_id in self._index(prefix) if checkpoint_id != checkpoint["id"]]
+            index.append(checkpoint["id"])
+            dropped, index = index[:-self.keep_per_thread], index[-self.keep_per_thread:]
+            self.store.set(prefix + "index", json.dumps(index).encode(), ttl=self.thread_ttl_seconds)
+            if dropped:
+                self.store.delete(*(prefix + kind + checkpoint_id for checkpoint_id in dropped for kind in ("cp:", "writes:")))
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id, checkpoint_ns = self._key(config)
+        key = self._prefix(thread_id, checkpoint_ns) + "writes:" + config["configurable"]["checkpoint_id"]
+        with self._lock:
+            raw = self.store.get(key)
+            stored = self._loads(raw) if raw else {}
+            for index, (channel, value) in enumerate(writes):
+                write_index = WRITES_IDX_MAP.get(channel, index)
+                write_key = f"{task_id}:{write_index}"
+                # Regular writes are idempotent per task; special channels are overwritten
+                if write_index >= 0 and write_key in stored:
+                    continue
+                stored[write_key] = (task_id, channel, value, task_path)
+            self.store.set(key, self._dumps(stored), ttl=self.thread_ttl_seconds)
+
+    def delete_thread(self, thread_id: str) -> None:
+        keys = list(self.store.scan(f"ckpt:{thread_id}:"))
+        if keys:
+            self.store.delete(*keys)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+
+def build_checkpointer(backend: str = CHECKPOINT_BACKEND, db_path: str = CHECKPOINT_DB_PATH) -> BaseCheckpointSaver:
+    """
+    Creates the conversation checkpointer configured by CHECKPOINT_BACKEND:
+    "sqlite" (default, durable and bounded, shared by the workers of one host),
+    "redis" (shared across hosts, REDIS_URL) or "memory" (process-local, for development).
+    """
+    if backend == "memory":
+        return InMemorySaver()
+    if backend == "sqlite":
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return TieredCheckpointSaver(SqliteSaver(conn))
+    if backend == "redis":
+        return StoreCheckpointSaver(build_session_store("redis"))
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
+
+
+def close_checkpointer(saver: BaseCheckpointSaver):
+    """Closes the SQLite connection or store behind a checkpointer from `build_checkpointer`."""
+    if isinstance(saver, TieredCheckpointSaver):
+        saver.durable.conn.close()
+    elif isinstance(saver, StoreCheckpointSaver):
+        saver.store.close()
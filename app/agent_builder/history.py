@@ -0,0 +1,148 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "3"))
+SUMMARY_LINE_CHARS = 160
+MAX_SUMMARY_LINES = 24
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Cheap local token estimate (~4 characters per token) so compaction needs no API call."""
+    chars = 0
+    for message in messages:
+        content = message.content
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            chars += len(tool_call["name"]) + len(json.dumps(tool_call.get("args", {}), default=str))
+    return chars // CHARS_PER_TOKEN + 4 * len(messages)
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+
+
+def _clip(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into turns, each starting at a caller (human) message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _compact_turn(turn: List[BaseMessage]) -> Tuple[List[BaseMessage], List[str]]:
+    """Keeps what was said in an old turn and reduces tool exchanges to one-line notes."""
+    kept: List[BaseMessage] = []
+    notes: List[str] = []
+    tool_calls = {}
+    for message in turn:
+        if isinstance(message, ToolMessage):
+            call = tool_calls.get(message.tool_call_id, {})
+            args = json.dumps(call.get("args", {}), default=str)
+            notes.append(_clip(f"{call.get('name', message.name)}({args}) -> {_text(message)}"))
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                tool_calls[tool_call["id"]] = tool_call
+            text = _text(message)
+            if text:
+                kept.append(AIMessage(content=text, id=message.id))
+        else:
+            kept.append(message)
+    return kept, notes
+
+
+def _spoken_lines(turn: List[BaseMessage]) -> List[str]:
+    lines = []
+    for message in turn:
+        text = _text(message)
+        if text and isinstance(message, HumanMessage):
+            lines.append(_clip(f"Caller: {text}"))
+        elif text and isinstance(message, AIMessage):
+            lines.append(_clip(f"You: {text}"))
+    return lines
+
+
+@dataclass
+class HistoryStats:
+    original_messages: int
+    sent_messages: int
+    original_tokens: int
+    sent_tokens: int
+
+
+class HistoryManager:
+    """
+    Builds the message window sent to the LLM on each agent step.
+
+    The last `keep_turns` turns are sent verbatim (including tool calls and results, which
+    the model needs to pair calls with responses). Older turns keep only what the caller
+    and assistant said; their tool exchanges become one-line notes. If the window is still
+    over `token_budget`, the oldest turns are folded into a short summary, which is itself
+    trimmed from the oldest line if needed; the recent turns are never cut. Notes and
+    summary are sent as an extra system message. The stored thread history is unchanged.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+
+    def _summary_message(self, tool_notes: List[str], earlier_lines: List[str]) -> Optional[SystemMessage]:
+        sections = []
+        if earlier_lines:
+            sections.append("Earlier in this call:\n" + "\n".join(earlier_lines[-MAX_SUMMARY_LINES:]))
+        if tool_notes:
+            sections.append("Earlier tool results in this call:\n" + "\n".join(f"- {note}" for note in tool_notes[-MAX_SUMMARY_LINES:]))
+        return SystemMessage(content="\n\n".join(sections)) if sections else None
+
+    def compact(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], HistoryStats]:
+        original_tokens = estimate_tokens(messages)
+        turns = split_turns(messages)
+        recent = turns[-self.keep_turns:] if self.keep_turns else []
+        old = turns[:len(turns) - len(recent)]
+
+        tool_notes: List[str] = []
+        compacted_old: List[List[BaseMessage]] = []
+        for turn in old:
+            kept, notes = _compact_turn(turn)
+            compacted_old.append(kept)
+            tool_notes.extend(notes)
+
+        recent_messages = [message for turn in recent for message in turn]
+        earlier_lines: List[str] = []
+
+        def window() -> List[BaseMessage]:
+            summary = self._summary_message(tool_notes, earlier_lines)
+            head = [summary] if summary else []
+            return head + [message for turn in compacted_old for message in turn] + recent_messages
+
+        result = window()
+        while compacted_old and estimate_tokens(result) > self.token_budget:
+            earlier_lines.extend(_spoken_lines(compacted_old.pop(0)))
+            result = window()
+        # Still over budget: the summary itself gives way, oldest lines first
+        while (earlier_lines or tool_notes) and estimate_tokens(result) > self.token_budget:
+            (earlier_lines or tool_notes).pop(0)
+            result = window()
+
+        return result, HistoryStats(
+            original_messages=len(messages),
+            sent_messages=len(result),
+            original_tokens=original_tokens,
+            sent_tokens=estimate_tokens(result),
+        )
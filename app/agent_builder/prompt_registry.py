@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable, RunnableLambda
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent
+PROMPT_RELOAD_CHECK_SECONDS = float(os.environ.get("PROMPT_RELOAD_CHECK_SECONDS", "5"))
+GEMINI_CONTEXT_CACHE = os.environ.get("GEMINI_CONTEXT_CACHE", "false").lower() in ("1", "true", "yes")
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Recreate the context cache this long before it expires
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 60
+
+
+def _as_call_context(messages: List[BaseMessage]) -> List[BaseMessage]:
+    # A cached system instruction cannot be combined with one in the request, so per-call
+    # context (e.g. the history summary) is passed as a user-side note instead
+    return [
+        HumanMessage(content=f"[Call notes]\n{message.content}") if isinstance(message, SystemMessage) else message
+        for message in messages
+    ]
+
+
+@dataclass
+class PromptEntry:
+    path: Path
+    mtime: float = 0.0
+    text: str = ""
+    chain: Optional[Runnable] = None
+    cached_chain: Optional[Runnable] = None
+    cache_name: Optional[str] = None
+    cache_expires_at: float = 0.0
+    last_checked: float = 0.0
+
+
+class PromptRegistry:
+    """
+    Loads prompt files relative to the `app` package and builds their LLM chains once.
+
+    Files are re-read only when their mtime changes, and the mtime is checked at most every
+    `reload_check_seconds`, so the hot path of a turn does no disk I/O.
+
+    `llm` may be a zero-argument factory, so the model is only created when the first
+    chain is built rather than when the registry is.
+
+    With `context_cache=True` the system prompt and tool declarations are stored in a Gemini
+    context cache and the chain references it by name, so repeated turns do not pay for the
+    static prefix again. If the cache cannot be created (e.g. the prompt is below the
+    model's minimum cacheable size), the uncached chain is used.
+    """
+
+    def __init__(
+        self,
+        llm: Union[Runnable, Callable[[], Runnable]],
+        tools: list,
+        reload_check_seconds: float = PROMPT_RELOAD_CHECK_SECONDS,
+        context_cache: bool = GEMINI_CONTEXT_CACHE,
+        context_cache_ttl_seconds: int = GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+    ):
+        self._llm = llm
+        self.tools = tools
+        self._llm_with_tools: Optional[Runnable] = None
+        self.reload_check_seconds = reload_check_seconds
+        self.context_cache = context_cache
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds
+        self._entries: Dict[str, PromptEntry] = {}
+        self._lock = threading.Lock()
+        self._cache_client = None
+
+    @property
+    def llm(self) -> Runnable:
+        if not isinstance(self._llm, Runnable):
+            self._llm = self._llm()
+        return self._llm
+
+    @property
+    def llm_with_tools(self) -> Runnable:
+        if self._llm_with_tools is None:
+            self._llm_with_tools = self.llm.bind_tools(tools=self.tools)
+        return self._llm_with_tools
+
+    def set_llm(self, llm):
+        """Replaces the model, e.g. with `app.fakes.llm.ScriptedChatModel`; chains are rebuilt on next use."""
+        with self._lock:
+            self._llm = llm
+            self._llm_with_tools = None
+            for entry in self._entries.values():
+                entry.chain = None
+                self._delete_context_cache(entry)
+
+    def register(self, name: str, filename: str):
+        self._entries[name] = PromptEntry(path=PROMPTS_DIR / filename)
+
+    def _load(self, entry: PromptEntry):
+        mtime = entry.path.stat().st_mtime
+        if entry.chain is not None and mtime == entry.mtime:
+            return
+        entry.text = entry.path.read_text(encoding="utf-8")
+        entry.mtime = mtime
+        prompt = ChatPromptTemplate.from_messages(
+            messages = [
+                SystemMessage(content=entry.text),
+                MessagesPlaceholder(variable_name="messages")
+            ]
+        )
+        entry.chain = prompt | self.llm_with_tools
+        # Any cached prefix belongs to the previous text
+        self._delete_context_cache(entry)
+        logger.info(f"Loaded prompt {entry.path.name}")
+
+    def _get_cache_client(self):
+        if self._cache_client is None:
+            from google.ai.generativelanguage_v1beta import CacheServiceClient
+            self._cache_client = CacheServiceClient(client_options={"api_key": os.environ["GOOGLE_API_KEY"]})
+        return self._cache_client
+
+    def _create_context_cache(self, entry: PromptEntry):
+        from google.ai.generativelanguage_v1beta import CachedContent, Content, Part
+        from google.protobuf.duration_pb2 import Duration
+        from langchain_google_genai._function_utils import convert_to_genai_function_declarations
+
+        cached = self._get_cache_client().create_cached_content(cached_content=CachedContent(
+            model=self.llm.model,
+            display_name=f"voice-assistant-{entry.path.stem}",
+            system_instruction=Content(parts=[Part(text=entry.text)]),
+            tools=[convert_to_genai_function_declarations(self.tools)],
+            ttl=Duration(seconds=self.context_cache_ttl_seconds),
+        ))
+        entry.cache_name = cached.name
+        entry.cached_chain = (
+            RunnableLambda(lambda value: _as_call_context(value["messages"]))
+            | self.llm.bind(cached_content=cached.name)
+        )
+        entry.cache_expires_at = time.monotonic() + self.context_cache_ttl_seconds - CONTEXT_CACHE_REFRESH_MARGIN_SECONDS
+        logger.info(f"Created Gemini context cache {cached.name} for {entry.path.name}")
+
+    def _delete_context_cache(self, entry: PromptEntry):
+        entry.cache_expires_at = 0.0
+        entry.cached_chain = None
+        if entry.cache_name is None:
+            return
+        name, entry.cache_name = entry.cache_name, None
+        try:
+            self._get_cache_client().delete_cached_content(name=name)
+        except Exception as e:
+            logger.warning(f"Could not delete context cache {name}: {e}")
+
+    def _cached_chain(self, entry: PromptEntry) -> Optional[Runnable]:
+        if time.monotonic() >= entry.cache_expires_at:
+            # Expired caches are removed by the API; just create a new one
+            entry.cache_name = None
+            entry.cached_chain = None
+            try:
+                self._create_context_cache(entry)
+            except Exception as e:
+                logger.warning(f"Gemini context cache unavailable, sending the full prompt: {e}")
+                # Do not retry on every turn
+                entry.cache_expires_at = time.monotonic() + self.context_cache_ttl_seconds
+                return None
+        return entry.cached_chain
+
+    def get_chain(self, name: str) -> Runnable:
+        entry = self._entries[name]
+        with self._lock:
+            now = time.monotonic()
+            if entry.chain is None or now - entry.last_checked >= self.reload_check_seconds:
+                entry.last_checked = now
+                self._load(entry)
+            if self.context_cache:
+                cached_chain = self._cached_chain(entry)
+                if cached_chain is not None:
+                    return cached_chain
+            return entry.chain
+
+    async def aget_chain(self, name: str) -> Runnable:
+        entry = self._entries[name]
+        now = time.monotonic()
+        fresh = entry.chain is not None and now - entry.last_checked < self.reload_check_seconds
+        if fresh and (not self.context_cache or now < entry.cache_expires_at):
+            return self.get_chain(name)
+        # File reads and cache creation are blocking, keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_chain, name)
@@ -0,0 +1,92 @@
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sorts and merges overlapping or touching busy intervals."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def working_windows(first_day: date, last_day: date, day_start: time, day_end: time, tz,
+                    include_weekends: bool = False) -> List[Interval]:
+    windows = []
+    day = first_day
+    while day <= last_day:
+        if include_weekends or day.weekday() < 5:
+            windows.append((
+                tz.localize(datetime.combine(day, day_start)),
+                tz.localize(datetime.combine(day, day_end)),
+            ))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_gaps(windows: List[Interval], busy: List[Interval]) -> List[Interval]:
+    """
+    Subtracts sorted, merged busy intervals from sorted working windows in one linear pass.
+    """
+    gaps = []
+    i = 0
+    for window_start, window_end in windows:
+        # Skip busy blocks that end before this window
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor = window_start
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                gaps.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            j += 1
+        if cursor < window_end:
+            gaps.append((cursor, window_end))
+    return gaps
+
+
+def _align(moment: datetime, step: timedelta) -> datetime:
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = moment - midnight
+    remainder = offset % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def find_free_slots(
+    busy: Iterable[Interval],
+    windows: List[Interval],
+    duration: timedelta,
+    max_results: int = 3,
+    step: timedelta = timedelta(minutes=15),
+    not_before: Optional[datetime] = None,
+    preferred: Optional[datetime] = None,
+) -> List[Interval]:
+    """
+    Returns up to `max_results` open slots of `duration` inside `windows`.
+
+    Slots start on `step` boundaries. Without `preferred` the earliest slots are returned;
+    with it, the slots closest to the preferred start time, in chronological order.
+    """
+    candidates: List[Interval] = []
+    for gap_start, gap_end in free_gaps(windows, merge_intervals(busy)):
+        if not_before is not None and gap_start < not_before:
+            gap_start = not_before
+        slot_start = _align(gap_start, step)
+        while slot_start + duration <= gap_end:
+            candidates.append((slot_start, slot_start + duration))
+            if preferred is None and len(candidates) >= max_results:
+                return candidates
+            slot_start += step
+
+    if preferred is not None:
+        candidates = sorted(candidates, key=lambda slot: abs(slot[0] - preferred))[:max_results]
+        candidates.sort()
+    return candidates[:max_results]
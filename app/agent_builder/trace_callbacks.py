@@ -0,0 +1,73 @@
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.utils.metrics import TurnTrace
+
+AGENT_NODE = "agent_node"
+TOOLS_NODE = "tools"
+
+
+class GraphTraceHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callbacks of one graph run into spans on the turn's trace: each
+    `agent_node` pass, each LLM call (with its time to first token) and each tool call.
+
+    Runs inline on the event loop, so recording a span is a dict lookup and a histogram
+    observation, not a thread hop.
+    """
+
+    run_inline = True
+
+    def __init__(self, trace: TurnTrace):
+        self.trace = trace
+        self._open: Dict[UUID, Tuple[str, float, Dict[str, Any]]] = {}
+
+    def _start(self, run_id: UUID, name: str, **attributes):
+        self._open[run_id] = (name, time.perf_counter(), attributes)
+
+    def _end(self, run_id: UUID, **attributes):
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        name, started, opened_attributes = opened
+        self.trace.add(name, started, **opened_attributes, **attributes)
+
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: UUID, **kwargs):
+        if kwargs.get("name") == AGENT_NODE:
+            self._start(run_id, AGENT_NODE)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: Any, *, run_id: UUID, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized: Optional[Dict[str, Any]], prompts: Any, *, run_id: UUID, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        opened = self._open.get(run_id)
+        if opened is not None and "first_token_ms" not in opened[2]:
+            opened[2]["first_token_ms"] = round((time.perf_counter() - opened[1]) * 1000, 2)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, *, run_id: UUID, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        self._start(run_id, "tool", tool=name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._end(run_id, error=type(error).__name__)
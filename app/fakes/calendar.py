@@ -0,0 +1,148 @@
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httplib2
+import pytz
+from googleapiclient.errors import HttpError
+
+
+class _Request:
+    def __init__(self, backend: "FakeCalendarService", fn, *args, **kwargs):
+        self._backend = backend
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+
+    def execute(self):
+        self._backend.requests += 1
+        if self._backend.latency:
+            time.sleep(self._backend.latency)
+        return self._fn(*self._args, **self._kwargs)
+
+
+class _Calendars:
+    def __init__(self, backend: "FakeCalendarService"):
+        self._backend = backend
+
+    def get(self, calendarId: str):
+        return _Request(self._backend, lambda: {"id": calendarId, "timeZone": self._backend.time_zone})
+
+
+class _Events:
+    def __init__(self, backend: "FakeCalendarService"):
+        self._backend = backend
+
+    def list(self, calendarId: str, **params):
+        return _Request(self._backend, self._backend._list_events, **params)
+
+    def insert(self, calendarId: str, body: Dict):
+        return _Request(self._backend, self._backend.add_event, body)
+
+    def delete(self, calendarId: str, eventId: str):
+        return _Request(self._backend, self._backend.delete_event, eventId)
+
+
+class FakeCalendarService:
+    """
+    Local, deterministic stand-in for the Calendar v3 service object returned by
+    `googleapiclient.discovery.build`, covering the calls the agent tools make.
+
+    Every change bumps a version counter so `events().list(syncToken=...)` returns only
+    the delta (including cancelled tombstones), like the real incremental sync API;
+    `expire_sync_tokens()` makes the tokens issued so far fail with 410 Gone, as the real
+    API does when a token is too old. `requests` counts executed API calls and `latency`
+    adds a per-call delay.
+    """
+
+    def __init__(self, time_zone: str = "Australia/Sydney", latency: float = 0.0):
+        self.time_zone = time_zone
+        self.latency = latency
+        self.requests = 0
+        self._events: Dict[str, Dict] = {}
+        self._versions: Dict[str, int] = {}
+        self._version = 0
+        # Bumped by expire_sync_tokens(); tokens from an earlier epoch are rejected
+        self._sync_epoch = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def calendars(self):
+        return _Calendars(self)
+
+    def events(self):
+        return _Events(self)
+
+    def _normalize_time(self, value: Dict) -> Dict:
+        if "dateTime" not in value:
+            return dict(value)
+        parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = pytz.timezone(value.get("timeZone", self.time_zone)).localize(parsed)
+        return {**value, "dateTime": parsed.isoformat()}
+
+    def _start(self, event: Dict) -> datetime:
+        value = event["start"]
+        if "dateTime" in value:
+            return datetime.fromisoformat(value["dateTime"])
+        return pytz.timezone(self.time_zone).localize(datetime.strptime(value["date"], "%Y-%m-%d"))
+
+    def _end(self, event: Dict) -> datetime:
+        value = event["end"]
+        if "dateTime" in value:
+            return datetime.fromisoformat(value["dateTime"])
+        return pytz.timezone(self.time_zone).localize(datetime.strptime(value["date"], "%Y-%m-%d"))
+
+    def add_event(self, body: Dict) -> Dict:
+        with self._lock:
+            event_id = body.get("id") or f"evt{next(self._ids)}"
+            event = {
+                **body,
+                "id": event_id,
+                "status": "confirmed",
+                "start": self._normalize_time(body["start"]),
+                "end": self._normalize_time(body["end"]),
+                "htmlLink": f"https://calendar.local/event/{event_id}",
+            }
+            self._version += 1
+            self._events[event_id] = event
+            self._versions[event_id] = self._version
+            return dict(event)
+
+    def delete_event(self, event_id: str) -> None:
+        with self._lock:
+            if event_id in self._events:
+                self._version += 1
+                self._events[event_id] = {"id": event_id, "status": "cancelled"}
+                self._versions[event_id] = self._version
+
+    def expire_sync_tokens(self) -> None:
+        with self._lock:
+            self._sync_epoch += 1
+
+    def _list_events(self, syncToken: Optional[str] = None, timeMin: Optional[str] = None,
+                     timeMax: Optional[str] = None, **_) -> Dict:
+        with self._lock:
+            if syncToken is not None:
+                epoch, since = (int(part) for part in syncToken.split(":"))
+                if epoch != self._sync_epoch:
+                    raise HttpError(httplib2.Response({"status": 410}), b'{"error": {"code": 410, "message": "Sync token is no longer valid"}}')
+                items = [dict(e) for i, e in self._events.items() if self._versions[i] > since]
+            else:
+                items = [dict(e) for e in self._events.values() if e.get("status") != "cancelled"]
+                if timeMin:
+                    lower = datetime.fromisoformat(timeMin.replace("Z", "+00:00"))
+                    items = [e for e in items if self._end(e) > lower]
+                if timeMax:
+                    upper = datetime.fromisoformat(timeMax.replace("Z", "+00:00"))
+                    items = [e for e in items if self._start(e) < upper]
+            live = [e for e in items if e.get("status") != "cancelled"]
+            live.sort(key=self._start)
+            cancelled = [e for e in items if e.get("status") == "cancelled"]
+            return {"items": live + cancelled, "nextSyncToken": f"{self._sync_epoch}:{self._version}"}
+
+    def events_on(self, day: str) -> List[Dict]:
+        """Convenience accessor for assertions in tests and benchmarks."""
+        return [e for e in self._events.values() if e.get("status") != "cancelled" and self._start(e).date().isoformat() == day]
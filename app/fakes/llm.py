@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+@dataclass
+class ScriptedTurn:
+    """
+    One scripted agent turn: the tool calls made (one model step each, in order) before
+    the spoken `reply`. An entry that is a list of calls is one step issuing them in
+    parallel. `transcript` selects the turn by the caller's last utterance.
+    """
+
+    reply: str
+    tool_calls: List[Union[Dict[str, Any], List[Dict[str, Any]]]] = field(default_factory=list)
+    transcript: Optional[str] = None
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Offline stand-in for the Gemini chat model.
+
+    The step within a turn is the number of model messages since the caller's last
+    message, so the scripted tool calls run through the real ToolNode before the reply
+    is streamed word by word. Turns whose `transcript` matches the last utterance are
+    preferred; otherwise turns are used round-robin.
+
+    `first_token_latency` is paid once per model call and `token_latency` per streamed
+    word, with `asyncio.sleep` so concurrent sessions overlap like network calls do.
+    """
+
+    turns: List[ScriptedTurn]
+    first_token_latency: float = 0.3
+    token_latency: float = 0.01
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _turn(self, messages: List[BaseMessage]) -> ScriptedTurn:
+        last_human = next((message for message in reversed(messages) if isinstance(message, HumanMessage)), None)
+        text = (last_human.content if last_human is not None else "").strip().lower()
+        for turn in self.turns:
+            if turn.transcript and turn.transcript.strip().lower() == text:
+                return turn
+        return self.turns[self.calls % len(self.turns)]
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        self.calls += 1
+        turn = self._turn(messages)
+        step = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, AIMessage):
+                step += 1
+        if step < len(turn.tool_calls):
+            calls = turn.tool_calls[step]
+            calls = calls if isinstance(calls, list) else [calls]
+            return AIMessage(content="", tool_calls=[{
+                "name": call["name"],
+                "args": call.get("args", {}),
+                "id": f"call_{self.calls}_{step}_{index}",
+            } for index, call in enumerate(calls)])
+        return AIMessage(content=turn.reply)
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        if message.tool_calls:
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ])
+            return
+        words = message.content.split(" ")
+        for index, word in enumerate(words):
+            yield AIMessageChunk(content=word if index == 0 else f" {word}")
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(message.content.split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        await asyncio.sleep(self.first_token_latency)
+        for index, chunk in enumerate(self._chunks(message)):
+            if index and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+def appointment_script(days_ahead: int = 3) -> List[ScriptedTurn]:
+    """A short booking conversation that exercises the calendar tools, dated relative to today."""
+    day = time.strftime("%Y-%m-%d", time.localtime(time.time() + days_ahead * 86400))
+    return [
+        ScriptedTurn(
+            transcript="I would like to book an appointment",
+            reply="Of course. Which day would suit you best? I can also suggest the next free times.",
+        ),
+        ScriptedTurn(
+            transcript=f"Can I come in on {day} at ten in the morning",
+            tool_calls=[{"name": "check_calendar_availability", "args": {"date_and_time": f"{day}T10:00:00"}}],
+            reply=f"Ten in the morning on {day} is available. Shall I book it for you?",
+        ),
+        ScriptedTurn(
+            transcript="Actually what else do you have that week",
+            tool_calls=[{"name": "find_available_slots", "args": {"start_date": day, "end_date": day, "preferred_time": f"{day}T10:00:00"}}],
+            reply="I have a few openings that day, including the morning and early afternoon. Which one works for you?",
+        ),
+        ScriptedTurn(
+            transcript="The first one please my name is Alex",
+            tool_calls=[{"name": "create_event_for_datetime", "args": {
+                "date_and_time": f"{day}T10:00:00",
+                "title": "Appointment for Alex",
+                "description": "Booked by the voice assistant benchmark",
+            }}],
+            reply="You are all set. Your appointment is booked. Is there anything else I can help with?",
+        ),
+    ]
@@ -0,0 +1,110 @@
+import re
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+
+def _pattern(match: str) -> "re.Pattern":
+    """Translates a Redis glob (`*`, `?`, `[...]`, backslash escapes) into a regex."""
+    parts = []
+    index = 0
+    while index < len(match):
+        char = match[index]
+        if char == "\\" and index + 1 < len(match):
+            index += 1
+            parts.append(re.escape(match[index]))
+        elif char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append(".")
+        elif char == "[":
+            end = match.find("]", index + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = match[index + 1:end]
+                parts.append("[^" + body[1:] + "]" if body.startswith("^") else "[" + body + "]")
+                index = end
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return re.compile("".join(parts), re.DOTALL)
+
+
+class FakeRedis:
+    """
+    In-process stand-in for a `redis.Redis` client, covering the commands the session
+    store uses (GET, SET with EX/PX/NX, DELETE, EXISTS, SCAN). Values are returned as
+    bytes like a client without `decode_responses`.
+
+    Several stores (standing in for several workers or hosts) can share one instance to
+    exercise cross-worker resumes without a server. `commands` counts calls.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self.commands = 0
+
+    @staticmethod
+    def _key(name) -> str:
+        return name.decode() if isinstance(name, bytes) else str(name)
+
+    @staticmethod
+    def _value(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def get(self, name) -> Optional[bytes]:
+        with self._lock:
+            self.commands += 1
+            return self._live(self._key(name))
+
+    def set(self, name, value, ex: Optional[float] = None, px: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            self.commands += 1
+            key = self._key(name)
+            if nx and self._live(key) is not None:
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            self._data[key] = (self._value(value), time.monotonic() + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            self.commands += 1
+            deleted = 0
+            for name in names:
+                if self._live(self._key(name)) is not None:
+                    deleted += 1
+                self._data.pop(self._key(name), None)
+            return deleted
+
+    def exists(self, *names) -> int:
+        with self._lock:
+            self.commands += 1
+            return sum(1 for name in names if self._live(self._key(name)) is not None)
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> Iterator[bytes]:
+        pattern = _pattern(match) if match else None
+        with self._lock:
+            self.commands += 1
+            keys = [key for key in list(self._data) if self._live(key) is not None]
+        for key in keys:
+            if pattern is None or pattern.fullmatch(key):
+                yield key.encode()
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+    def close(self):
+        pass
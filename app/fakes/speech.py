@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List, Optional
+
+
+def _response(transcript: str, is_final: bool):
+    alternative = SimpleNamespace(transcript=transcript, confidence=1.0)
+    result = SimpleNamespace(alternatives=[alternative], is_final=is_final)
+    return SimpleNamespace(results=[result])
+
+
+class FakeSpeechClient:
+    """
+    Offline stand-in for `speech.SpeechAsyncClient` streaming recognition.
+
+    Each recognition stream plays back the next scripted transcript: words are revealed
+    as interim results while audio chunks arrive, and the full sentence is returned as a
+    final result once the request stream is half-closed.
+    """
+
+    def __init__(self, transcripts: Optional[List[str]] = None, chunks_per_word: int = 2, latency: float = 0.0):
+        self.transcripts = transcripts or ["I would like to book an appointment"]
+        self.chunks_per_word = chunks_per_word
+        self.latency = latency
+        self.streams_opened = 0
+        self.audio_bytes = 0
+
+    async def streaming_recognize(self, requests):
+        transcript = self.transcripts[self.streams_opened % len(self.transcripts)]
+        self.streams_opened += 1
+        return self._recognize(requests, transcript.split())
+
+    async def _recognize(self, requests, words: List[str]):
+        chunks = 0
+        revealed = 0
+        async for request in requests:
+            audio = getattr(request, "audio_content", b"")
+            if not audio:
+                continue
+            self.audio_bytes += len(audio)
+            chunks += 1
+            words_due = min(len(words), chunks // self.chunks_per_word)
+            if words_due > revealed:
+                revealed = words_due
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                yield _response(" ".join(words[:revealed]), is_final=False)
+
+        if chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            yield _response(" ".join(words), is_final=True)
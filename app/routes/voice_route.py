@@ -1,24 +1,23 @@
 import asyncio
-import base64
 import json
 import logging
-import os
-import tempfile
 import time
-from elevenlabs import TextToSpeechConvertRequestOutputFormat
+from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import ffmpeg
-from langchain.schema import HumanMessage
 import ulid
-import websockets
-import whisper
-from app.agent_builder.agent import graph
-from elevenlabs.client import ElevenLabs
-import soundfile as sf
-import numpy as np
-
-from app.utils.speech_utils import speech_to_text_stream, text_to_speech
+from app.agent_builder.agent import get_graph
+
+from app.utils.metrics import TurnTrace, metrics, stage_histogram
+from app.utils.speech_utils import speech_to_text_stream
+from app.utils.tts_cache import load_prewarm_phrases
+from app.utils.tts_engines import get_tts_router
+from app.voice_manager.audio_decoder import AudioDecoder
+from app.voice_manager.audio_output import OUTPUT_MODE_BINARY, OUTPUT_MODE_JSON, build_audio_output, codec_for_output_format
 from app.voice_manager.audio_stream_manager import AudioStreamManager
+from app.voice_manager.session_state import VoiceSession, session_states
+from app.voice_manager.turn_pipeline import TurnPipeline
+from app.voice_manager.vad import VAD_AUTO_ENDPOINT, VAD_ENABLED, EnergyVad
+from app.voice_manager.websocket_sender import WebSocketSender
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,125 +25,211 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 router = APIRouter()
-model = whisper.load_model("turbo")
-ELEVEN_API_KEY = os.environ['ELEVENLABS_API_KEY']
-elevenlabs = ElevenLabs(api_key=ELEVEN_API_KEY)
 
-MIN_BUFFER_SIZE = 16000 * 2 * 3 # 3 seconds of 16kHz, 16-bit, mono audio
 
-# Define audio parameters for the incoming raw audio (assuming 16kHz, 16-bit, mono)
-SAMPLE_RATE = 16000
-SUBTYPE = 'PCM_16' # 16-bit PCM
+async def prewarm_tts_cache():
+    """Synthesizes the fixed phrases in tts_phrases.txt that are not cached yet."""
+    added = await get_tts_router().prewarm(load_prewarm_phrases())
+    logger.info(f"Pre-warmed {added} TTS phrases")
 
 @router.websocket("/ws/voice")
 async def voice_streamer(websocket: WebSocket):
     await websocket.accept()
-    audio_manager = AudioStreamManager(websocket)
-    audio_manager.is_streaming = True
+    # Every outgoing message goes through one writer so barge-in can drop queued audio
+    sender = WebSocketSender(websocket)
+    sender.start()
+    session_id = ulid.new().str
+    metrics.counter("voice_sessions_total", "Voice WebSocket sessions opened").inc()
     chat_thread_id = None
+    voice_session: Optional[VoiceSession] = None
+    transcript_buffer = []
+    utterance_lock = asyncio.Lock()
+    endpoint_tasks = set()
+
+    def new_trace() -> TurnTrace:
+        # Turn latencies are measured from the moment the utterance ended
+        return TurnTrace(session_id=session_id, thread_id=chat_thread_id)
+
+    async def save_session():
+        # Best effort: a store outage must not end the call, only later resumes elsewhere
+        try:
+            await session_states.save(voice_session)
+        except Exception as e:
+            logger.warning(f"Could not save session {chat_thread_id}: {e}")
+
+    async def resume_chat(thread_id: str):
+        """Adopts an existing conversation, which may have been started on another worker."""
+        nonlocal chat_thread_id, voice_session
+        chat_thread_id = thread_id or None
+        if chat_thread_id is None:
+            # No id to resume: the next turn starts a new conversation
+            voice_session = None
+            await sender.send_json({"event_type": "chat_thread_acknowledged", "chatThreadId": None, "resumed": False, "turns": 0})
+            return
+        try:
+            voice_session = await session_states.load(thread_id)
+        except Exception as e:
+            logger.warning(f"Could not load session {thread_id}: {e}")
+            voice_session = None
+        resumed = voice_session is not None
+        if voice_session is None:
+            voice_session = VoiceSession(chat_thread_id=thread_id, node=session_states.node)
+        elif voice_session.pending_transcript:
+            # Finals the previous connection received but never answered
+            transcript_buffer[:0] = voice_session.pending_transcript
+            voice_session.pending_transcript = []
+        acknowledgement = {
+            "event_type": "chat_thread_acknowledged",
+            "chatThreadId": thread_id,
+            "resumed": resumed,
+            "turns": voice_session.turns,
+        }
+        owner = session_states.owner(thread_id)
+        if owner is not None and owner != session_states.node:
+            # Served here from the shared state, but the owner has it hot; clients may reconnect there
+            acknowledgement["node"] = owner
+        await sender.send_json(acknowledgement)
+
+    async def complete_utterance(trace: Optional[TurnTrace] = None):
+        """Waits for the final transcripts of the ended utterance and starts the reply."""
+        nonlocal chat_thread_id, voice_session
+        trace = trace or new_trace()
+        async with utterance_lock:
+            with trace.span("stt_final"):
+                await audio_manager.wait_for_utterance_end()
+
+            # Process any remaining audio in the buffer before stopping
+            if transcript_buffer:
+                full_transcript = " ".join(filter(None, transcript_buffer))
+                await sender.send_json({
+                    "event_type": "final_transcript",
+                    "text": full_transcript
+                })
+
+                if chat_thread_id is None:
+                    # Pinned to this node, so resuming it later needs no hop
+                    chat_thread_id = session_states.new_thread_id()
+                    voice_session = VoiceSession(chat_thread_id=chat_thread_id, node=session_states.node)
+                trace.thread_id = chat_thread_id
+
+                # Runs as a task so a barge-in can be received while the reply plays
+                turn_pipeline.start(full_transcript, chat_thread_id, trace)
+
+                transcript_buffer.clear() # Clear buffer after full processing
+                voice_session.turns += 1
+                voice_session.pending_transcript = []
+                await save_session()
+
+    async def on_speech_start():
+        # The caller is talking over the assistant
+        await turn_pipeline.cancel()
+
+    async def on_endpoint():
+        # Called from the decoder's reader; finishing the turn must not block decoding
+        task = asyncio.create_task(complete_utterance(new_trace()))
+        endpoint_tasks.add(task)
+        task.add_done_callback(endpoint_tasks.discard)
+
+    async def on_throttle(paused: bool):
+        # Only sent with AUDIO_OVERFLOW_POLICY=throttle
+        await sender.send_json({
+            "event_type": "throttle",
+            "paused": paused
+        })
+
+    audio_manager = AudioStreamManager(
+        websocket,
+        on_throttle=on_throttle,
+        vad=EnergyVad() if VAD_ENABLED else None,
+        auto_endpoint=VAD_AUTO_ENDPOINT,
+        on_speech_start=on_speech_start,
+        on_endpoint=on_endpoint,
+    )
+    decoder = AudioDecoder(on_frame=audio_manager.add_audio_chunk)
+
+    async def send_transcript(transcript: str, is_final: bool):
+        await sender.send_json({
+            "event_type": "final_transcript_segment" if is_final else "interim_transcript",
+            "text": transcript
+        })
+
+    tts_router = get_tts_router()
+    turn_pipeline = TurnPipeline(sender, get_graph(), tts_router.synthesize)
+
+    # One recognition task for the whole session; it is fed by the audio manager
+    stt_task = asyncio.create_task(speech_to_text_stream(audio_manager, transcript_buffer, on_transcript=send_transcript))
     try:
-        stt_task = None
-        transcript_buffer = []
-        audio_buffer = bytearray()
+        # Lets a hash-based load balancer route on the thread id before the socket opens
+        if websocket.query_params.get("chatThreadId"):
+            await resume_chat(websocket.query_params["chatThreadId"])
         while True:
             try:
                 message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
                 if "bytes" in message:
-                    print('byte message recieved')
+                    logger.debug('byte message received')
+                    if audio_manager.vad is None and turn_pipeline.is_active():
+                        # Without VAD any audio counts as the caller talking over the assistant
+                        await turn_pipeline.cancel()
                     audio_data = message["bytes"]
-                    with tempfile.NamedTemporaryFile(delete=True, suffix=".webm") as webm_file:
-                        webm_path = webm_file.name
-                        webm_file.write(audio_data)  
-                        wav_path = webm_path.replace(".webm", ".wav")
-                        ffmpeg.input(webm_path).output(wav_path, format="wav", acodec="pcm_s16le", ac=1, ar="16000").run(quiet=True)
-                        with open(wav_path, "rb") as wav_file:
-                            audio_data = wav_file.read()
-                    await audio_manager.add_audio_chunk(audio_data)
-                    audio_manager.is_streaming = True
-                    stt_task = asyncio.create_task(speech_to_text_stream(audio_manager, transcript_buffer))
-                    while not stt_task.done():
-                        await asyncio.sleep(0.1)
-                    await websocket.send_json({
+                    decode_started = time.perf_counter()
+                    await decoder.feed(audio_data)
+                    stage_histogram("decode").observe((time.perf_counter() - decode_started) * 1000)
+                    await sender.send_json({
                         "event_type": "audio_chunk_processed",
                         "text": "Audio chunk received and processed"
                     })
 
                 elif "text" in message:
-                    print('text message recieved')
+                    logger.debug('text message received')
                     data = json.loads(message["text"])
                     if data.get("event_type") == "start_listening":
-                        await websocket.send_json({
+                        await turn_pipeline.cancel()
+                        await sender.send_json({
                             "event_type": "listening",
                             "text": "Listening started"
                         })
-                    elif data.get("event_type") == "existing_chat":
-                        chat_thread_id = data.get("chatThreadId")
-                        await websocket.send_json({
-                            "event_type": "chat_thread_acknowledged",
-                            "chatThreadId": chat_thread_id
+                    elif data.get("event_type") == "audio_output_mode":
+                        mode = data.get("mode", OUTPUT_MODE_JSON)
+                        if mode not in (OUTPUT_MODE_JSON, OUTPUT_MODE_BINARY):
+                            mode = OUTPUT_MODE_JSON
+                        turn_pipeline.audio_output = build_audio_output(sender, mode, codec_for_output_format(tts_router.output_format))
+                        await sender.send_json({
+                            "event_type": "audio_output_mode_acknowledged",
+                            "mode": mode
                         })
+                    elif data.get("event_type") == "existing_chat":
+                        await resume_chat(data.get("chatThreadId"))
                     elif data.get("event_type") == "stop_listening":
-                        await audio_manager.stop_streaming()
-
-                        # Process any remaining audio in the buffer before stopping
-                        if transcript_buffer:
-                            full_transcript = " ".join(filter(None, transcript_buffer))
-                            await websocket.send_json({
-                                "event_type": "final_transcript",
-                                "text": full_transcript
-                            })
-
-                            if chat_thread_id is None:
-                                chat_thread_id = ulid.new().str
-
-                            agent_response = graph.invoke(
-                                {
-                                    "messages": [HumanMessage(content=full_transcript)]
-                                },
-                                config={"configurable": {"thread_id": chat_thread_id}}
-                            )
-
-                            response_text = agent_response['messages'][-1].content
-
-                            await websocket.send_json({
-                                "event_type": "agent_response",
-                                "text": {"responseText": response_text, "chatThreadId": chat_thread_id}
-                            })
-
-                            audio = elevenlabs.text_to_speech.stream(
-                                text=response_text,
-                                voice_id="ZF6FPAbjXT4488VcRRnw",
-                                model_id="eleven_multilingual_v2",
-                                output_format="mp3_22050_32"
-                            )
-
-                            for chunk in audio:
-                                if chunk:
-                                    await websocket.send_json({
-                                        "event_type": "audio_response",
-                                        "audio_data": base64.b64encode(chunk).decode()
-                                    })
-
-                            await websocket.send_json({
-                                "event_type": "final_audio_response",
-                                "done": True
-                            })
-
-
-                            #audio_response = await text_to_speech(response_text)
-                            #audio_base64 = base64.b64encode(audio_response).decode()
-                            #await websocket.send_json({
-                            #    "event_type": "audio_response",
-                            #    "audio_data": audio_base64
-                            #})
-
-                            transcript_buffer.clear() # Clear buffer after full processing
+                        trace = new_trace()
+                        with trace.span("decode_flush"):
+                            await decoder.flush()
+                        # VAD may already have ended the utterance
+                        if audio_manager.is_streaming:
+                            await audio_manager.stop_streaming()
+                        await complete_utterance(trace)
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 logger.error(f"Error in voice streamer: {e}")
-                await websocket.send_json({"event_type": "error", "reason": "Internal server error"})      
+                await sender.send_json({"event_type": "error", "reason": "Internal server error"})      
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
     except Exception as e:
         logger.error(f"Error in voice streamer: {e}")
-        await websocket.send_json({"event_type": "error", "reason": "Internal server error"})
\ No newline at end of file
+        await sender.send_json({"event_type": "error", "reason": "Internal server error"})
+    finally:
+        stt_task.cancel()
+        for task in list(endpoint_tasks):
+            task.cancel()
+        await turn_pipeline.cancel()
+        await decoder.close()
+        if voice_session is not None and transcript_buffer:
+            voice_session.pending_transcript = list(filter(None, transcript_buffer))
+            await save_session()
+        audio_stats = audio_manager.stats()
+        metrics.counter("voice_audio_dropped_chunks_total", "Inbound audio chunks dropped by the session queue").inc(audio_stats["queue"]["dropped_chunks"])
+        logger.info(f"Audio stats for session {session_id}: {audio_stats}")
+        await sender.close()
@@ -1,9 +1,19 @@
+import asyncio
+import gc
 import logging
+import os
 from contextlib import asynccontextmanager
 from logging import getLogger
+from app.agent_builder.calendar_service import calendar_cache_stats
 from app.routes import voice_route
+from app.utils.metrics import metrics, register_stats_gauge
+from app.utils.resources import resources
+from app.utils.tts_cache import TTS_CACHE_ENABLED, TTS_CACHE_PREWARM, tts_cache_stats
+from app.utils.tts_engines import tts_engine_stats
+from app.voice_manager.session_scheduler import scheduler
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 logging.basicConfig(
@@ -12,17 +22,35 @@ logging.basicConfig(
 )
 logger = getLogger(__name__)
 
+# With more than one worker, `python -m app.server` forks them from a preloaded parent
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+
+register_stats_gauge("voice_calendar_cache", "Calendar metadata cache counters", calendar_cache_stats)
+register_stats_gauge("voice_tts_cache", "TTS audio cache counters", tts_cache_stats)
+
 def on_server_startup():
     logger.info("Server is starting up...")
 
 def on_server_shutdown():
     logger.info("Server is shutting down...")
+    scheduler.shutdown()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     on_server_startup()
+    # SDK clients and models are created here, in the background, instead of at import;
+    # /health reports readiness until they are all up
+    app.state.warmup = asyncio.create_task(resources.warm_up())
+    prewarm = None
+    if TTS_CACHE_ENABLED and TTS_CACHE_PREWARM:
+        # Runs in the background so startup does not wait on the TTS API
+        prewarm = asyncio.create_task(voice_route.prewarm_tts_cache())
     yield
+    for task in (app.state.warmup, prewarm):
+        if task is not None:
+            task.cancel()
+    await resources.aclose()
     on_server_shutdown()
 
 app = FastAPI(lifespan=lifespan)
@@ -42,10 +70,106 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    """200 once every startup resource is ready; 503 while starting or if one failed."""
+    readiness = resources.status()
+    warmup = getattr(app.state, "warmup", None)
+    if readiness["ready"]:
+        status = "healthy"
+    elif warmup is None or not warmup.done():
+        status = "starting"
+    else:
+        status = "degraded"
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={
+            "status": status,
+            "ready": readiness["ready"],
+            "resources": readiness["resources"],
+            "calendar_cache": calendar_cache_stats(),
+            "tts_cache": tts_cache_stats(),
+            "tts_engines": tts_engine_stats(),
+        },
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 app.include_router(voice_route.router)
 
-if __name__ == "__main__":
+
+
+def freeze_heap_before_fork():
+    """
+    Collects and then freezes everything the parent has allocated, so the collector in
+    the workers never touches those objects and their pages stay shared copy-on-write.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def serve_prefork(host: str, port: int, workers: int):
+    """
+    Binds the socket once and forks the workers from a parent that has imported the app,
+    so the imported modules are shared copy-on-write instead of being loaded by every
+    worker. Anything holding a connection, a thread pool or a native runtime (the
+    checkpointer's SQLite connection, gRPC and HTTP clients, Whisper/torch) is created per
+    worker, after the fork, by the lifespan. Workers that die are restarted until the
+    parent receives SIGINT/SIGTERM.
+    """
+    import signal
+    import socket
+
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    freeze_heap_before_fork()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+            os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+    logger.info(f"Serving on {host}:{port} with {workers} forked workers")
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting it")
+            spawn()
+
+
+if __name__ == "__main__":
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", "8000"))
+    if WEB_WORKERS > 1:
+        serve_prefork(host, port, WEB_WORKERS)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import bisect
+import hashlib
+import os
+import socket
+from typing import Dict, Iterable, List, Optional
+
+import ulid
+
+# Comma separated node addresses (e.g. "ws://10.0.0.1:8000,ws://10.0.0.2:8000"); empty = one node
+CLUSTER_NODES = [node.strip() for node in os.environ.get("CLUSTER_NODES", "").split(",") if node.strip()]
+# This host's entry in CLUSTER_NODES, the same for all of its workers
+NODE_URL = os.environ.get("NODE_URL", "")
+AFFINITY_VNODES = int(os.environ.get("AFFINITY_VNODES", "160"))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring that pins a key (a `chatThreadId`) to one of a set of nodes.
+
+    A node is a host, not a worker process: the workers of a pre-fork server accept from
+    one shared socket, so the kernel picks the worker and the host's workers share the
+    session store and checkpointer.
+
+    Every node is placed on the ring `vnodes` times, so keys spread evenly and adding or
+    removing a node only moves the keys of the arcs it gains or loses (about 1/N of
+    them); every other conversation stays on the worker that has it hot. The hash is
+    stable across processes and hosts, so a load balancer or any worker computes the
+    same owner.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = AFFINITY_VNODES):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            # On the (unlikely) collision of two nodes' points the first one keeps it
+            if point not in self._owners:
+                self._owners[point] = node
+                bisect.insort(self._points, point)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: owner for point, owner in self._owners.items() if owner != node}
+
+    def node_for(self, key: str) -> Optional[str]:
+        """The node that owns `key`: the first point clockwise of the key's hash."""
+        if not self._points:
+            return None
+        position = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[position]]
+
+    def owns(self, node: str, key: str) -> bool:
+        owner = self.node_for(key)
+        return owner is None or owner == node
+
+    def new_key_for(self, node: str, max_tries: int = 1000) -> str:
+        """
+        A new ulid that hashes to `node`, so a conversation started on a worker is already
+        pinned to it and its first resume needs no hop. Takes about one try per node.
+        """
+        if self._nodes and node not in self._nodes:
+            raise ValueError(f"{node} is not on the ring {self._nodes}")
+        key = ulid.new().str
+        for _ in range(max_tries):
+            if self.owns(node, key):
+                return key
+            key = ulid.new().str
+        return key
+
+
+def default_node() -> str:
+    return NODE_URL or f"{socket.gethostname()}:{os.getpid()}"
+
+
+cluster_ring = HashRing(CLUSTER_NODES)
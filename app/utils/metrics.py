@@ -0,0 +1,264 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TRACE_DUMP_DIR = os.environ.get("TRACE_DUMP_DIR", "")
+# Only turns slower than this are dumped; 0 dumps every turn
+TRACE_SLOW_TURN_MS = float(os.environ.get("TRACE_SLOW_TURN_MS", "0"))
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 150, 200, 300, 400, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram in milliseconds. `observe` is a bisect and three
+    increments under an uncontended lock, cheap enough for the hot path. Quantiles are
+    the upper bound of their bucket.
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide histograms and counters, rendered in the Prometheus text format.
+
+    `gauges` are callables evaluated at scrape time, for values another component already
+    tracks (cache sizes, hit counters) and that would be wasteful to mirror.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, LatencyHistogram]] = {}
+        self._counters: Dict[str, Dict[Labels, Counter]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[Labels, float]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str = "", **labels) -> LatencyHistogram:
+        key = _labels(labels)
+        series = self._histograms.get(name)
+        if series is None or key not in series:
+            with self._lock:
+                series = self._histograms.setdefault(name, {})
+                self._help.setdefault(name, help_text)
+                series.setdefault(key, LatencyHistogram())
+        return series[key]
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        key = _labels(labels)
+        series = self._counters.get(name)
+        if series is None or key not in series:
+            with self._lock:
+                series = self._counters.setdefault(name, {})
+                self._help.setdefault(name, help_text)
+                series.setdefault(key, Counter())
+        return series[key]
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Dict[Labels, float]]):
+        self._gauges.append((name, help_text, collect))
+
+    def render(self) -> str:
+        lines = []
+        for name, series in sorted(self._histograms.items()):
+            lines.append(f"# HELP {name} {self._help.get(name, '')}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(series.items()):
+                with histogram._lock:
+                    counts, count, total = list(histogram.counts), histogram.count, histogram.total
+                cumulative = 0
+                for bound, bucket_count in zip([*histogram.buckets, "+Inf"], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', str(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {round(total, 3)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name, series in sorted(self._counters.items()):
+            lines.append(f"# HELP {name} {self._help.get(name, '')}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, counter in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {counter.value}")
+        for name, help_text, collect in self._gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"Metric {name} could not be collected: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def register_stats_gauge(name: str, help_text: str, stats: Callable[[], Dict[str, Any]]):
+    """Exposes the numeric fields of an existing `stats()` dict as one gauge with a `stat` label."""
+
+    def collect() -> Dict[Labels, float]:
+        return {
+            (("stat", key),): value
+            for key, value in stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+    metrics.gauge(name, help_text, collect)
+
+
+def stage_histogram(stage: str, **labels) -> LatencyHistogram:
+    return metrics.histogram("voice_stage_latency_ms", "Latency of voice pipeline stages", stage=stage, **labels)
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float
+    duration_ms: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class TurnTrace:
+    """
+    Spans of one conversational turn, relative to the end of the caller's utterance.
+
+    Every span is also observed into the `voice_stage_latency_ms` histogram, so the trace
+    costs nothing extra unless it is dumped (TRACE_DUMP_DIR, optionally only for turns
+    slower than TRACE_SLOW_TURN_MS).
+    """
+
+    def __init__(self, session_id: str, thread_id: Optional[str] = None, started: Optional[float] = None):
+        self.session_id = session_id
+        self.thread_id = thread_id
+        self.started = time.perf_counter() if started is None else started
+        self.wall_started = time.time() - (time.perf_counter() - self.started)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, ended: Optional[float] = None, **attributes):
+        """Records a span from perf_counter timestamps."""
+        ended = time.perf_counter() if ended is None else ended
+        duration_ms = (ended - started) * 1000
+        labels = {"tool": attributes["tool"]} if "tool" in attributes else {}
+        stage_histogram(name, **labels).observe(duration_ms)
+        span = Span(name, round((started - self.started) * 1000, 2), round(duration_ms, 2), attributes)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, started, **attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [asdict(span) for span in sorted(self.spans, key=lambda span: span.start_ms)]
+        return {
+            "session_id": self.session_id,
+            "thread_id": self.thread_id,
+            "started_at": self.wall_started,
+            "spans": spans,
+        }
+
+    def finish(self, total_ms: Optional[float] = None, dump_dir: str = TRACE_DUMP_DIR, slow_turn_ms: float = TRACE_SLOW_TURN_MS):
+        """Writes the trace to `<dump_dir>/<session_id>.jsonl` when dumping is enabled."""
+        if not dump_dir or (total_ms is not None and total_ms < slow_turn_ms):
+            return
+        record = self.to_dict()
+        record["total_ms"] = total_ms
+        try:
+            path = Path(dump_dir)
+            path.mkdir(parents=True, exist_ok=True)
+            with open(path / f"{self.session_id}.jsonl", "a", encoding="utf-8") as trace_file:
+                trace_file.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not dump trace for session {self.session_id}: {e}")
+
+
+current_trace: contextvars.ContextVar[Optional[TurnTrace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def traced(name: str, **attributes):
+    """Span on the current turn's trace (if any); used by code that does not hold the trace."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **attributes):
+        yield
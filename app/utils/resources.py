@@ -0,0 +1,146 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+@dataclass
+class ResourceSpec:
+    factory: Callable[[], Any]
+    close: Optional[Callable[[Any], Any]] = None
+    # Created during startup (lifespan) rather than on first use
+    warm: bool = True
+    # Must be created on the event loop thread, e.g. async gRPC clients
+    loop_bound: bool = False
+
+
+class ResourceRegistry:
+    """
+    Process-wide heavyweight resources: model weights and SDK clients.
+
+    Modules register a factory at import time, which is free; the resource is created on
+    first `get()`, or ahead of traffic by `warm_up()` in the FastAPI lifespan. A factory
+    that raises (e.g. missing credentials) marks the resource failed and is retried on the
+    next `get()`, so a misconfigured backend degrades readiness instead of crashing the
+    import. `set()` installs a ready-made value, e.g. an offline fake.
+
+    `status()` is what `/health` reports as readiness.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, ResourceSpec] = {}
+        self._values: Dict[str, Any] = {}
+        self._states: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_ms: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None,
+                 warm: bool = True, loop_bound: bool = False):
+        with self._lock:
+            self._specs[name] = ResourceSpec(factory, close, warm, loop_bound)
+            self._locks.setdefault(name, threading.Lock())
+            self._states.setdefault(name, PENDING)
+
+    def get(self, name: str) -> Any:
+        value = self._values.get(name)
+        if value is not None:
+            return value
+        with self._locks[name]:
+            if name in self._values:
+                return self._values[name]
+            self._states[name] = LOADING
+            started = time.perf_counter()
+            try:
+                value = self._specs[name].factory()
+            except Exception as e:
+                self._states[name] = FAILED
+                self._errors[name] = f"{type(e).__name__}: {e}"
+                raise
+            self._load_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+            self._values[name] = value
+            self._states[name] = READY
+            self._errors.pop(name, None)
+            logger.info(f"Resource {name} ready in {self._load_ms[name]}ms")
+            return value
+
+    def peek(self, name: str) -> Optional[Any]:
+        """The resource if it has been created, without creating it."""
+        return self._values.get(name)
+
+    def set(self, name: str, value: Any):
+        if name not in self._specs:
+            self.register(name, lambda: value)
+        with self._locks[name]:
+            self._values[name] = value
+            self._states[name] = READY
+            self._errors.pop(name, None)
+
+    async def _warm(self, name: str):
+        try:
+            if self._specs[name].loop_bound:
+                self.get(name)
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, self.get, name)
+        except Exception as e:
+            logger.error(f"Resource {name} could not be created: {e}")
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Creates the warm resources concurrently. Failures are recorded, not raised."""
+        names = list(names) if names is not None else [name for name, spec in self._specs.items() if spec.warm]
+        await asyncio.gather(*(self._warm(name) for name in names if name not in self._values))
+
+    def status(self) -> Dict[str, Any]:
+        resources = {}
+        for name, spec in self._specs.items():
+            entry = {"state": self._states[name], "warm": spec.warm}
+            if name in self._load_ms:
+                entry["load_ms"] = self._load_ms[name]
+            if name in self._errors:
+                entry["error"] = self._errors[name]
+            resources[name] = entry
+        ready = all(self._states[name] == READY for name, spec in self._specs.items() if spec.warm)
+        return {"ready": ready, "resources": resources}
+
+    async def aclose(self):
+        for name, value in list(self._values.items()):
+            close = self._specs[name].close
+            if close is None:
+                continue
+            try:
+                result = close(value)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Error closing resource {name}: {e}")
+            self._values.pop(name, None)
+            self._states[name] = PENDING
+
+
+def close_client(client):
+    """Closes an SDK client: gRPC clients through their transport, others directly."""
+    transport = getattr(client, "transport", None)
+    if transport is not None and hasattr(transport, "close"):
+        return transport.close()
+    for method in ("aclose", "close"):
+        if hasattr(client, method):
+            return getattr(client, method)()
+    return None
+
+
+resources = ResourceRegistry()
@@ -0,0 +1,201 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "sessions.sqlite")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+SESSION_KEY_PREFIX = os.environ.get("SESSION_KEY_PREFIX", "voice:")
+
+
+class SessionStore:
+    """
+    Byte-valued key/value store with per-key expiry, shared by the workers that serve one
+    deployment. Backs the voice session records and, with CHECKPOINT_BACKEND=redis, the
+    conversation checkpoints.
+
+    The interface is synchronous, like the checkpointer's; async callers run it in the
+    default executor. `ttl` is in seconds, None keeps the key until it is deleted.
+    """
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, *keys: str):
+        raise NotImplementedError
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        """Keys that start with `prefix` and have not expired."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store: the state is lost on restart and not seen by other workers."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix) and self._live(key) is not None]
+        return iter(keys)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Store in a SQLite file, shared by every worker on a host (WAL mode, so readers do not
+    block the writer). Expired rows are skipped on read and swept on write at most once
+    per `sweep_interval` seconds.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = SESSION_DB_PATH, sweep_interval: float = 60.0):
+        self.db_path = db_path
+        self.sweep_interval = sweep_interval
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM session_kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO session_kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, time.time() + ttl if ttl is not None else None),
+            )
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                self._conn.execute("DELETE FROM session_kv WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM session_kv WHERE key = ?", [(key,) for key in keys])
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        # Range scan on the primary key; the upper bound is the prefix followed by the highest code point
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM session_kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+                (prefix, prefix + "\U0010ffff", time.time()),
+            ).fetchall()
+        return iter(row[0] for row in rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store in Redis (or any server speaking its protocol, e.g. Valkey or KeyDB), shared by
+    every worker on every host. Takes a redis-py style client, so tests can pass
+    `app.fakes.redis.FakeRedis` instead of a server.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = SESSION_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if ttl is not None:
+            self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+        else:
+            self.client.set(self.prefix + key, value)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        for key in self.client.scan_iter(match=self.prefix + _glob_escape(prefix) + "*", count=500):
+            key = key.decode() if isinstance(key, bytes) else key
+            yield key[len(self.prefix):]
+
+    def close(self):
+        self.client.close()
+
+
+def _glob_escape(text: str) -> str:
+    for char in "\\*?[]":
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def build_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    """
+    Creates the store configured by SESSION_STORE: "sqlite" (default, shared by the workers
+    of one host), "redis" (shared across hosts, REDIS_URL) or "memory" (single process).
+    """
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore(SESSION_DB_PATH)
+    if backend == "redis":
+        import redis
+
+        return RedisSessionStore(redis.Redis.from_url(REDIS_URL))
+    raise ValueError(f"Unknown session store: {backend}")
@@ -1,88 +1,82 @@
 import asyncio
-from typing import List
-import pyaudio
-import wave
-from collections.abc import Iterator
-from concurrent.futures import ThreadPoolExecutor
-import soundfile as sf
-import numpy as np
-import io
+import logging
+from typing import Awaitable, Callable, List, Optional
+from app.utils.resources import close_client, resources
+from app.utils.tts_cache import TTS_CACHE_ENABLED, cache_key, get_tts_cache
+from app.utils.stt_engines import GoogleStreamingEngine, get_stt_engine
 from app.voice_manager.audio_stream_manager import AudioStreamManager
-from google.cloud import speech
+from app.voice_manager.session_scheduler import scheduler
 from google.cloud import texttospeech
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
 
-speech_client = speech.SpeechClient()
-tts_client = texttospeech.TextToSpeechClient()
+resources.register(
+    "google_tts_client", texttospeech.TextToSpeechAsyncClient, close=close_client, warm=False, loop_bound=True,
+)
 
 
-async def speech_to_text_stream(audio_manager: AudioStreamManager, transcript_buffer: List[str]):
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=16000,
-        language_code="en-US",
-        enable_automatic_punctuation=True,
-    )
+def get_tts_client():
+    return resources.get("google_tts_client")
 
-    streaming_config = speech.StreamingRecognitionConfig(
-        config=config, interim_results=True
-    )
 
-    async def request_generator():
-        print("Starting request generator...")
-        async for chunk in audio_manager.audio_generator():
-            print("Recieved audio chunk")
-            #chunk = await convert_webm_to_linear16(chunk)
-            print("Converted audio chunk")
-            if chunk is None:
-                print("Chunk is None, skipping...")
-                continue
-            yield speech.StreamingRecognizeRequest(audio_content=chunk)
-            audio_manager.is_streaming = False  # Stop the audio generator after streaming
-
-    # Convert AsyncGenerator to sync Iterator
-    def sync_generator() -> Iterator[speech.StreamingRecognizeRequest]:
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            agen = request_generator()
-            while True:
-                try:
-                    request = loop.run_until_complete(agen.__anext__())
-                    yield request
-                except StopAsyncIteration:
-                    break
-        finally:
-            loop.close()
-
-    responses = speech_client.streaming_recognize(streaming_config, sync_generator())
-    print("streaming recieved: ", responses)
-
-    # Iterate over the responses
-    try:
-        for response in responses:
-            if not response.results:
-                continue
-            
-            result = response.results[0]
-            if not result.alternatives:
-                continue
-                
-            transcript = result.alternatives[0].transcript
-            
-            if result.is_final:
-                print(f"Final transcript: {transcript}")
-                transcript_buffer.append(transcript)
-            else:
-                print(f"Interim transcript: {transcript}")
-                
-    except Exception as e:
-        print(f"Error processing responses: {e}")
-        return None
-
-    return None
+TranscriptCallback = Callable[[str, bool], Awaitable[None]]
+
+
+async def speech_to_text_stream(
+    audio_manager: AudioStreamManager,
+    transcript_buffer: List[str],
+    on_transcript: Optional[TranscriptCallback] = None,
+    client=None,
+    engine=None,
+):
+    """
+    Runs for the lifetime of a WebSocket session and recognizes one utterance at a time
+    as audio arrives from the audio manager.
+
+    Recognition is delegated to an STT engine (`app.utils.stt_engines`), chosen with
+    STT_ENGINE unless `engine` is given. Interim and final transcripts are pushed through
+    `on_transcript` as they arrive and finals are also appended to `transcript_buffer`.
+
+    `client` is a shortcut for a Google engine on a custom client, e.g.
+    `app.fakes.speech.FakeSpeechClient` for offline use.
+    """
+    if engine is None:
+        engine = GoogleStreamingEngine(client) if client is not None else get_stt_engine()
+
+    async def emit(transcript: str, is_final: bool):
+        if is_final:
+            logger.debug(f"Final transcript: {transcript}")
+            transcript_buffer.append(transcript)
+        else:
+            logger.debug(f"Interim transcript: {transcript}")
+
+        if on_transcript is not None:
+            await on_transcript(transcript, is_final)
+
+    while True:
+        first_chunk = await audio_manager.next_chunk()
+        if first_chunk is None:
+            # Utterance ended without any (remaining) audio
+            audio_manager.mark_utterance_complete()
+            continue
+
+        # Engines take an "stt" slot per recognition request, not for the whole session
+        utterance_ended = await engine.recognize(first_chunk, audio_manager, emit)
+
+        if utterance_ended:
+            audio_manager.mark_utterance_complete()
 
 async def text_to_speech(text: str):
+    if TTS_CACHE_ENABLED:
+        key = cache_key(text, "en-US-neutral", "google-standard", "linear16_16000")
+        cached = await get_tts_cache().alookup(key)
+        if cached is not None:
+            return b"".join(get_tts_cache().serve(cached))
+
     syntesis_input = texttospeech.SynthesisInput(text=text)
 
     voice = texttospeech.VoiceSelectionParams(
@@ -95,10 +89,13 @@ async def text_to_speech(text: str):
         sample_rate_hertz=16000
     )
 
-    response = tts_client.synthesize_speech(
-        input=syntesis_input,
-        voice=voice,
-        audio_config=audio_config
-    )
+    async with scheduler.stage("tts"):
+        response = await get_tts_client().synthesize_speech(
+            input=syntesis_input,
+            voice=voice,
+            audio_config=audio_config
+        )
 
+    if TTS_CACHE_ENABLED:
+        await asyncio.get_running_loop().run_in_executor(None, get_tts_cache().store, key, response.audio_content)
     return response.audio_content
\ No newline at end of file
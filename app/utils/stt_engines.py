@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from google.cloud import speech
+
+from app.utils.resources import close_client, resources
+from app.voice_manager.audio_decoder import SAMPLE_RATE
+from app.voice_manager.audio_stream_manager import AudioStreamManager
+from app.voice_manager.session_scheduler import scheduler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+STT_ENGINE = os.environ.get("STT_ENGINE", "google")
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "turbo")
+WHISPER_DEVICE = os.environ.get("WHISPER_DEVICE", "cpu")
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE", "en")
+WHISPER_MAX_BATCH = int(os.environ.get("WHISPER_MAX_BATCH", "8"))
+WHISPER_MAX_WAIT_MS = float(os.environ.get("WHISPER_MAX_WAIT_MS", "50"))
+# Whisper's fixed input window
+WHISPER_SEGMENT_SAMPLES = 30 * SAMPLE_RATE
+
+TranscriptSink = Callable[[str, bool], Awaitable[None]]
+
+# The async gRPC client must be created inside the running event loop
+resources.register(
+    "speech_client", speech.SpeechAsyncClient, close=close_client, warm=STT_ENGINE == "google", loop_bound=True,
+)
+
+
+def get_speech_client():
+    return resources.get("speech_client")
+
+
+def set_speech_client(client):
+    """Replaces the process-wide client, e.g. with `app.fakes.speech.FakeSpeechClient`."""
+    resources.set("speech_client", client)
+
+
+class GoogleStreamingEngine:
+    """
+    Google streaming recognition: one stream per utterance, opened on its first chunk and
+    half-closed when the end-of-utterance sentinel arrives, so upload and recognition
+    overlap. Emits interim and final results.
+
+    `client` may be any object with an async `streaming_recognize(requests=...)` method,
+    e.g. `app.fakes.speech.FakeSpeechClient` for offline use.
+    """
+
+    name = "google"
+
+    def __init__(self, client=None, language_code: str = "en-US"):
+        self.client = client
+        self.streaming_config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=SAMPLE_RATE,
+                language_code=language_code,
+                enable_automatic_punctuation=True,
+            ),
+            interim_results=True,
+        )
+
+    async def recognize(self, first_chunk: bytes, audio_manager: AudioStreamManager, emit: TranscriptSink) -> bool:
+        """
+        Recognizes one utterance. Returns True once its end-of-utterance sentinel was
+        consumed; on a stream error the rest of the utterance is picked up by a new stream.
+        """
+        client = self.client or get_speech_client()
+        utterance_ended = False
+
+        async def request_generator():
+            nonlocal utterance_ended
+            yield speech.StreamingRecognizeRequest(streaming_config=self.streaming_config)
+            # Chunks are views into the session ring buffer; the request needs its own bytes
+            yield speech.StreamingRecognizeRequest(audio_content=bytes(first_chunk))
+            async for chunk in audio_manager.audio_generator():
+                yield speech.StreamingRecognizeRequest(audio_content=bytes(chunk))
+            utterance_ended = True
+
+        try:
+            # A slot per stream: the concurrent streaming requests are what the quota limits
+            async with scheduler.stage("stt"):
+                responses = await client.streaming_recognize(requests=request_generator())
+                async for response in responses:
+                    if not response.results:
+                        continue
+
+                    result = response.results[0]
+                    if not result.alternatives:
+                        continue
+
+                    await emit(result.alternatives[0].transcript, result.is_final)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Stream limits or transient errors: reopen on the next chunk
+            logger.error(f"Error processing responses: {e}")
+        return utterance_ended
+
+
+def load_whisper_model(name: str = WHISPER_MODEL, device: str = WHISPER_DEVICE):
+    import whisper
+
+    started = time.perf_counter()
+    model = whisper.load_model(name, device=device)
+    logger.info(f"Loaded Whisper model {name} on {device} in {time.perf_counter() - started:.1f}s")
+    return model
+
+
+# Loaded by each worker after the fork, never in a pre-fork parent: torch initialises its
+# OpenMP thread pool on load, and OpenMP hangs in a child forked after that
+resources.register("whisper_model", load_whisper_model, warm=STT_ENGINE == "whisper")
+
+
+def get_whisper_model(name: Optional[str] = None, device: Optional[str] = None):
+    """The process-wide WHISPER_MODEL, loaded once; another name or device loads a separate copy."""
+    if name in (None, WHISPER_MODEL) and device in (None, WHISPER_DEVICE):
+        return resources.get("whisper_model")
+    return load_whisper_model(name or WHISPER_MODEL, device or WHISPER_DEVICE)
+
+
+def whisper_transcribe_batch(clips: List[np.ndarray], model=None, language: str = WHISPER_LANGUAGE) -> List[str]:
+    """
+    Transcribes up to 30 s clips (float32, 16 kHz) in a single batched decoder pass.
+    """
+    import torch
+    import whisper
+
+    model = model or get_whisper_model()
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), n_mels=model.dims.n_mels)
+        for clip in clips
+    ]).to(model.device)
+    options = whisper.DecodingOptions(language=language, fp16=model.device.type != "cpu", without_timestamps=True)
+    return [result.text.strip() for result in whisper.decode(model, mel, options)]
+
+
+class MicroBatcher:
+    """
+    Collects requests from concurrent sessions into batches for one inference call.
+
+    A batch is dispatched when it holds `max_batch` items or when its first item has
+    waited `max_wait_ms`, whichever comes first. Batches run one at a time on the shared
+    thread pool; requests arriving during an inference form the next batch, so the batch
+    size grows with load while a lone request only pays the max-wait deadline.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int = WHISPER_MAX_BATCH,
+        max_wait_ms: float = WHISPER_MAX_WAIT_MS,
+        stage: str = "stt_batch",
+    ):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stage = stage
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._loop = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._runner is None or self._runner.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._runner = asyncio.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = [entry for entry in await self._collect() if not entry[1].cancelled()]
+            if not batch:
+                continue
+            try:
+                results = await scheduler.run_blocking(self.stage, self.process_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class WhisperEngine:
+    """
+    Local Whisper recognition on CPU. The utterance is buffered until its end-of-utterance
+    sentinel and then transcribed through a process-wide MicroBatcher, so utterances that
+    end at about the same time in different sessions share one decoder pass. Only final
+    results are emitted.
+    """
+
+    name = "whisper"
+
+    def __init__(self, batcher: Optional[MicroBatcher] = None):
+        self.batcher = batcher or get_whisper_batcher()
+
+    async def recognize(self, first_chunk: bytes, audio_manager: AudioStreamManager, emit: TranscriptSink) -> bool:
+        pcm = bytearray(first_chunk)
+        async for chunk in audio_manager.audio_generator():
+            pcm.extend(chunk)
+        samples = np.frombuffer(bytes(pcm[: len(pcm) - len(pcm) % 2]), dtype="<i2").astype(np.float32) / 32768.0
+        # Longer utterances are split into Whisper's 30 s windows
+        segments = [samples[i:i + WHISPER_SEGMENT_SAMPLES] for i in range(0, len(samples), WHISPER_SEGMENT_SAMPLES)]
+        try:
+            # The slot covers the transcription request, not the time spent buffering audio
+            async with scheduler.stage("stt"):
+                texts = await asyncio.gather(*(self.batcher.submit(segment) for segment in segments))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Whisper transcription failed: {e}")
+            return True
+        transcript = " ".join(text for text in texts if text)
+        if transcript:
+            await emit(transcript, True)
+        return True
+
+
+_whisper_batcher: Optional[MicroBatcher] = None
+
+
+def get_whisper_batcher() -> MicroBatcher:
+    global _whisper_batcher
+    if _whisper_batcher is None:
+        _whisper_batcher = MicroBatcher(whisper_transcribe_batch)
+    return _whisper_batcher
+
+
+def get_stt_engine(name: str = STT_ENGINE):
+    if name == GoogleStreamingEngine.name:
+        return GoogleStreamingEngine()
+    if name == WhisperEngine.name:
+        return WhisperEngine()
+    raise ValueError(f"Unknown STT engine: {name}")
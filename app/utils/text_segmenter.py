@@ -0,0 +1,63 @@
+import re
+from typing import List
+
+# Sentence end followed by whitespace, allowing closing quotes/brackets after the mark
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+["\'”’)\]]*\s+')
+CLAUSE_BOUNDARY = re.compile(r'[,;:—–]\s+')
+ABBREVIATIONS = ("dr.", "mr.", "mrs.", "ms.", "st.", "prof.", "e.g.", "i.e.", "a.m.", "p.m.", "vs.", "etc.")
+
+
+class SentenceSegmenter:
+    """
+    Cuts a token stream into speakable segments for TTS.
+
+    Whole sentences are released as soon as their terminating punctuation and the
+    following whitespace have been seen. When a sentence runs long, it is cut at the last
+    clause boundary (comma, semicolon, colon, dash) once `min_clause_chars` are buffered,
+    and as a last resort at a word boundary once `max_chars` are buffered.
+    """
+
+    def __init__(self, min_clause_chars: int = 60, max_chars: int = 220):
+        self.min_clause_chars = min_clause_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, end: int) -> bool:
+        head = self._buffer[:end].rstrip().lower()
+        return head.endswith(ABBREVIATIONS)
+
+    def _next_cut(self) -> int:
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            if not self._is_abbreviation(match.end()):
+                return match.end()
+
+        if len(self._buffer) >= self.min_clause_chars:
+            clause_ends = [m.end() for m in CLAUSE_BOUNDARY.finditer(self._buffer)]
+            if clause_ends:
+                return clause_ends[-1]
+
+        if len(self._buffer) >= self.max_chars:
+            space = self._buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+
+        return 0
+
+    def feed(self, text: str) -> List[str]:
+        """Adds streamed text and returns the segments that are ready to be spoken."""
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._next_cut()
+            if not cut:
+                break
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> List[str]:
+        """Returns whatever is left once the stream has ended."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return [segment] if segment else []
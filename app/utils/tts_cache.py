@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MEMORY_MB = float(os.environ.get("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.environ.get("TTS_CACHE_DISK_MB", "512"))
+TTS_CACHE_PREWARM = os.environ.get("TTS_CACHE_PREWARM", "true").lower() in ("1", "true", "yes")
+PREWARM_PHRASES_FILE = Path(__file__).resolve().parent.parent / "tts_phrases.txt"
+# Size of the chunks a cached entry is streamed in, close to what the TTS APIs send
+STREAM_CHUNK_BYTES = 4096
+
+Synthesizer = Callable[[str], AsyncIterator[bytes]]
+
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "—": "-", "–": "-"})
+
+
+def normalize_text(text: str) -> str:
+    """Case, whitespace and typographic quotes do not change how a phrase is spoken."""
+    text = unicodedata.normalize("NFKC", text).translate(_QUOTES)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    payload = json.dumps([normalize_text(text), voice_id, model_id, output_format], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TtsCache:
+    """
+    Content-addressed cache of synthesized audio.
+
+    Entries are keyed on the normalized text plus voice, model and output format. The
+    memory tier is an LRU bounded by bytes; the disk tier keeps one file per entry, read
+    in the executor on a hit and promoted to the memory tier. Disk entries are evicted
+    oldest-used first once `max_disk_bytes` is exceeded; the directory can be shared by
+    workers, so a file another worker evicted is treated as a miss.
+
+    Only complete syntheses are stored: a stream cut short by a barge-in is discarded.
+    """
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        max_memory_bytes: int = int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+        max_disk_bytes: int = int(TTS_CACHE_DISK_MB * 1024 * 1024),
+        chunk_bytes: int = STREAM_CHUNK_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.chunk_bytes = chunk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_synthesized = 0
+        self._scan_disk()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.audio"
+
+    def _scan_disk(self):
+        if not self.directory.exists():
+            return
+        entries = []
+        for path in self.directory.glob("*/*.audio"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _memory_lookup(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return audio
+
+    def _disk_lookup(self, key: str) -> Optional[bytes]:
+        """Blocking: reads a disk entry and promotes it to the memory tier."""
+        with self._lock:
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+        path = self._path(key)
+        try:
+            os.utime(path)
+            audio = path.read_bytes()
+        except FileNotFoundError:
+            # Evicted by another worker sharing the directory
+            with self._lock:
+                self._forget_disk(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, audio)
+        return audio
+
+    async def alookup(self, key: str) -> Optional[bytes]:
+        """Returns the cached audio, or None on a miss. A disk hit is read in the executor, not on the event loop."""
+        audio = self._memory_lookup(key)
+        if audio is not None:
+            return audio
+        with self._lock:
+            if key not in self._disk:
+                self.misses += 1
+                return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._disk_lookup, key)
+
+    def serve(self, audio: bytes) -> Iterator[bytes]:
+        """Streams a hit in chunks; `bytes_saved` counts only what the caller actually took."""
+        for offset in range(0, len(audio), self.chunk_bytes):
+            chunk = audio[offset:offset + self.chunk_bytes]
+            yield chunk
+            with self._lock:
+                self.bytes_saved += len(chunk)
+
+    def _forget_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def store(self, key: str, audio: bytes):
+        if not audio:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so concurrent readers never read a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(audio)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, audio)
+            self._forget_disk(key)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            evicted = []
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                self._path(old_key).unlink()
+            except FileNotFoundError:
+                pass
+
+    async def astore(self, key: str, audio: bytes):
+        """Stores freshly synthesized audio without blocking the event loop."""
+        with self._lock:
+            self.bytes_synthesized += len(audio)
+        await asyncio.get_running_loop().run_in_executor(None, self.store, key, audio)
+
+    async def prewarm(self, phrases: Iterable[str], synthesize: Synthesizer, voice_id: str, model_id: str, output_format: str) -> int:
+        """Synthesizes the phrases that are not cached yet. Returns how many were added."""
+        added = 0
+        for phrase in phrases:
+            key = cache_key(phrase, voice_id, model_id, output_format)
+            with self._lock:
+                if key in self._memory or key in self._disk:
+                    continue
+            try:
+                audio = b"".join([chunk async for chunk in synthesize(phrase)])
+            except Exception as e:
+                logger.warning(f"Could not pre-warm TTS phrase {phrase!r}: {e}")
+                continue
+            await asyncio.get_running_loop().run_in_executor(None, self.store, key, audio)
+            added += 1
+        return added
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "bytes_synthesized": self.bytes_synthesized,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+def load_prewarm_phrases(path: Path = PREWARM_PHRASES_FILE):
+    if not path.exists():
+        return []
+    lines = (line.strip() for line in path.read_text(encoding="utf-8").splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+_tts_cache: Optional[TtsCache] = None
+
+
+def get_tts_cache() -> TtsCache:
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = TtsCache()
+    return _tts_cache
+
+
+def tts_cache_stats() -> Dict[str, float]:
+    return get_tts_cache().stats() if _tts_cache is not None else {}
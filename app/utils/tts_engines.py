@@ -0,0 +1,315 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+from google.cloud import texttospeech
+
+from app.utils.metrics import metrics
+from app.utils.resources import resources
+from app.utils.tts_cache import TTS_CACHE_ENABLED, TtsCache, cache_key, get_tts_cache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TTS_ENGINES = [name.strip() for name in os.environ.get("TTS_ENGINES", "elevenlabs,google").split(",") if name.strip()]
+TTS_ENGINE_ORDER = os.environ.get("TTS_ENGINE_ORDER", "fixed")
+TTS_OUTPUT_FORMAT = os.environ.get("TTS_OUTPUT_FORMAT", "mp3_22050_32")
+TTS_FAILOVER_MS = float(os.environ.get("TTS_FAILOVER_MS", "1500"))
+TTS_POOL_SIZE = int(os.environ.get("TTS_POOL_SIZE", "16"))
+ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "ZF6FPAbjXT4488VcRRnw")
+ELEVENLABS_MODEL_ID = os.environ.get("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
+GOOGLE_TTS_VOICE = os.environ.get("GOOGLE_TTS_VOICE", "en-US-Neural2-F")
+# Engines are only reordered once they have this many first-byte samples
+MIN_SAMPLES_FOR_ORDERING = 20
+
+
+class TtsEngine:
+    """
+    Base class of the TTS engines. `stream(text)` yields encoded audio chunks in
+    `output_format`; `voice_id`/`model_id` identify the voice for the audio cache.
+    """
+
+    name = "base"
+
+    def __init__(self, output_format: str, voice_id: str, model_id: str):
+        self.output_format = output_format
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.first_byte_ms = metrics.histogram("voice_tts_engine_first_byte_ms", "Time to the first audio byte per TTS engine", engine=self.name)
+        self.total_ms = metrics.histogram("voice_tts_engine_total_ms", "Full synthesis time per TTS engine", engine=self.name)
+        self.errors = 0
+
+    def stream(self, text: str) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "first_byte": self.first_byte_ms.snapshot(),
+            "total": self.total_ms.snapshot(),
+            "errors": self.errors,
+        }
+
+
+class ElevenLabsEngine(TtsEngine):
+    """ElevenLabs streaming TTS over one pooled keep-alive HTTP/1.1 client per process."""
+
+    name = "elevenlabs"
+
+    def __init__(
+        self,
+        voice_id: str = ELEVENLABS_VOICE_ID,
+        model_id: str = ELEVENLABS_MODEL_ID,
+        output_format: str = TTS_OUTPUT_FORMAT,
+        pool_size: int = TTS_POOL_SIZE,
+    ):
+        super().__init__(output_format, voice_id, model_id)
+        self.pool_size = pool_size
+        self._client = None
+        self._http = None
+
+    def _get_client(self):
+        if self._client is None:
+            from elevenlabs.client import AsyncElevenLabs
+
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size, keepalive_expiry=120),
+                timeout=httpx.Timeout(30.0, connect=5.0),
+            )
+            self._client = AsyncElevenLabs(api_key=os.environ["ELEVENLABS_API_KEY"], httpx_client=self._http)
+        return self._client
+
+    async def stream(self, text: str):
+        audio = self._get_client().text_to_speech.stream(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format
+        )
+        async for chunk in audio:
+            yield chunk
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._client = None
+
+
+def google_audio_config(output_format: str) -> texttospeech.AudioConfig:
+    """Maps an ElevenLabs style output format (e.g. 'mp3_22050_32') onto a Google AudioConfig."""
+    codec, _, rest = output_format.partition("_")
+    sample_rate = int(rest.split("_", 1)[0]) if rest else 24000
+    encoding = {
+        "mp3": texttospeech.AudioEncoding.MP3,
+        "pcm": texttospeech.AudioEncoding.LINEAR16,
+        "opus": texttospeech.AudioEncoding.OGG_OPUS,
+    }[codec]
+    return texttospeech.AudioConfig(audio_encoding=encoding, sample_rate_hertz=sample_rate)
+
+
+class GoogleTtsEngine(TtsEngine):
+    """
+    Google Cloud TTS. Clients are created on first use and reused round-robin; each owns a
+    long-lived gRPC channel, so `pool_size` bounds the connections to the API.
+    """
+
+    name = "google"
+
+    def __init__(self, voice_name: str = GOOGLE_TTS_VOICE, output_format: str = TTS_OUTPUT_FORMAT, pool_size: int = 2, chunk_bytes: int = 4096):
+        super().__init__(output_format, voice_name, "google-tts")
+        self.voice = texttospeech.VoiceSelectionParams(language_code="-".join(voice_name.split("-")[:2]), name=voice_name)
+        self.audio_config = google_audio_config(output_format)
+        self.pool_size = pool_size
+        self.chunk_bytes = chunk_bytes
+        self._clients: List[texttospeech.TextToSpeechAsyncClient] = []
+        self._next = itertools.count()
+
+    def _get_client(self) -> texttospeech.TextToSpeechAsyncClient:
+        # The async gRPC clients must be created inside the running event loop
+        if len(self._clients) < self.pool_size:
+            self._clients.append(texttospeech.TextToSpeechAsyncClient())
+            return self._clients[-1]
+        return self._clients[next(self._next) % self.pool_size]
+
+    async def stream(self, text: str):
+        response = await self._get_client().synthesize_speech(
+            input=texttospeech.SynthesisInput(text=text),
+            voice=self.voice,
+            audio_config=self.audio_config
+        )
+        audio = response.audio_content
+        for offset in range(0, len(audio), self.chunk_bytes):
+            yield audio[offset:offset + self.chunk_bytes]
+
+
+class StubTtsEngine(TtsEngine):
+    """
+    Local engine for development and benchmarks: no network, configurable latency, and
+    `bytes_per_char` of silent payload per character (not a decodable audio stream).
+    """
+
+    name = "stub"
+
+    def __init__(self, first_byte_latency: float = 0.05, chunk_latency: float = 0.01, bytes_per_char: int = 60,
+                 chunk_bytes: int = 1024, output_format: str = TTS_OUTPUT_FORMAT):
+        super().__init__(output_format, "stub", "stub")
+        self.first_byte_latency = first_byte_latency
+        self.chunk_latency = chunk_latency
+        self.bytes_per_char = bytes_per_char
+        self.chunk_bytes = chunk_bytes
+
+    async def stream(self, text: str):
+        await asyncio.sleep(self.first_byte_latency)
+        remaining = max(self.chunk_bytes, len(text) * self.bytes_per_char)
+        while remaining > 0:
+            size = min(self.chunk_bytes, remaining)
+            remaining -= size
+            yield b"\x00" * size
+            await asyncio.sleep(self.chunk_latency)
+
+
+class TtsRouter:
+    """
+    Synthesizes with the preferred engine and fails over to the next one when it errors
+    or does not produce its first audio byte within `failover_ms`. Once audio has started
+    the engine is kept for the rest of the sentence.
+
+    With `order="latency"` engines are tried fastest first by their recent first-byte
+    p50; with `order="fixed"` the configured order is kept and the histograms are only
+    reported. All engines must share one output format, the codec negotiated with the
+    client does not change mid-session.
+
+    Repeated phrases are served from the TTS cache, keyed per engine voice: audio is
+    stored under the engine that produced it, and each engine only reads its own entries.
+    """
+
+    def __init__(
+        self,
+        engines: List[TtsEngine],
+        failover_ms: float = TTS_FAILOVER_MS,
+        order: str = TTS_ENGINE_ORDER,
+        cache: Optional[TtsCache] = None,
+    ):
+        if not engines:
+            raise ValueError("At least one TTS engine is required")
+        formats = {engine.output_format for engine in engines}
+        if len(formats) > 1:
+            raise ValueError(f"TTS engines must share one output format, got {sorted(formats)}")
+        self.engines = engines
+        self.failover = failover_ms / 1000
+        self.order = order
+        self.cache = cache
+        self.failovers = 0
+
+    @property
+    def output_format(self) -> str:
+        return self.engines[0].output_format
+
+    def ordered_engines(self) -> List[TtsEngine]:
+        if self.order != "latency":
+            return list(self.engines)
+        def expected_ms(engine: TtsEngine) -> float:
+            if engine.first_byte_ms.count < MIN_SAMPLES_FOR_ORDERING:
+                return 0.0
+            return engine.first_byte_ms.quantile(0.5)
+        # Stable sort: engines without enough samples keep their configured position
+        return sorted(self.engines, key=expected_ms)
+
+    def _cache_key(self, engine: TtsEngine, text: str) -> str:
+        return cache_key(text, engine.voice_id, engine.model_id, engine.output_format)
+
+    async def synthesize(self, text: str):
+        engines = self.ordered_engines()
+        for position, engine in enumerate(engines):
+            is_last = position == len(engines) - 1
+            # Only this engine's own audio: a failover voice never stands in for the primary's
+            key = self._cache_key(engine, text)
+            if self.cache is not None:
+                audio = await self.cache.alookup(key)
+                if audio is not None:
+                    for chunk in self.cache.serve(audio):
+                        yield chunk
+                    return
+
+            started = time.perf_counter()
+            stream = engine.stream(text).__aiter__()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), timeout=None if is_last else self.failover)
+            except StopAsyncIteration:
+                return
+            except (asyncio.TimeoutError, Exception) as e:
+                engine.errors += 1
+                await stream.aclose()
+                if is_last:
+                    raise
+                self.failovers += 1
+                logger.warning(f"TTS engine {engine.name} failed or slow ({e!r}), failing over")
+                continue
+
+            engine.first_byte_ms.observe((time.perf_counter() - started) * 1000)
+            parts = [first]
+            yield first
+            async for chunk in stream:
+                parts.append(chunk)
+                yield chunk
+            engine.total_ms.observe((time.perf_counter() - started) * 1000)
+            if self.cache is not None:
+                await self.cache.astore(key, b"".join(parts))
+            return
+
+    async def prewarm(self, phrases: Iterable[str]) -> int:
+        if self.cache is None:
+            return 0
+        engine = self.ordered_engines()[0]
+        return await self.cache.prewarm(phrases, engine.stream, engine.voice_id, engine.model_id, engine.output_format)
+
+    async def aclose(self):
+        for engine in self.engines:
+            await engine.aclose()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "order": [engine.name for engine in self.ordered_engines()],
+            "failovers": self.failovers,
+            "engines": {engine.name: engine.stats() for engine in self.engines},
+        }
+
+
+ENGINE_FACTORIES = {
+    ElevenLabsEngine.name: ElevenLabsEngine,
+    GoogleTtsEngine.name: GoogleTtsEngine,
+    StubTtsEngine.name: StubTtsEngine,
+}
+
+
+def build_tts_router() -> TtsRouter:
+    engines = [ENGINE_FACTORIES[name]() for name in TTS_ENGINES]
+    return TtsRouter(engines, cache=get_tts_cache() if TTS_CACHE_ENABLED else None)
+
+
+# Engines create their HTTP/gRPC clients on first use, so building the router is cheap
+resources.register("tts_router", build_tts_router, close=lambda router: router.aclose())
+
+
+def get_tts_router() -> TtsRouter:
+    return resources.get("tts_router")
+
+
+def set_tts_router(router: TtsRouter):
+    """Replaces the process-wide router, e.g. with one over `StubTtsEngine`s for benchmarks."""
+    resources.set("tts_router", router)
+
+
+def tts_engine_stats() -> Dict[str, object]:
+    router = resources.peek("tts_router")
+    return router.stats() if router is not None else {}
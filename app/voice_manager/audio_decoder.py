@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import struct
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+import ffmpeg
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # LINEAR16
+FRAME_MS = 100
+FRAME_BYTES = SAMPLE_RATE * SAMPLE_WIDTH * FRAME_MS // 1000
+
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"  # WebM/Matroska container header
+RIFF_MAGIC = b"RIFF"
+# Element id of a WebM Cluster: everything before the first one is the stream header
+WEBM_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Give up looking for the end of a container header after this much input
+MAX_HEADER_BYTES = 64 * 1024
+
+READ_SIZE = 4096
+
+
+@dataclass
+class WavFormat:
+    audio_format: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    # Offset of the first sample, i.e. the length of the header
+    data_offset: int
+
+    @property
+    def is_linear16_mono(self) -> bool:
+        """Already what STT takes, so the samples can be passed through as they are."""
+        return (
+            self.audio_format in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE)
+            and self.channels == 1
+            and self.sample_rate == SAMPLE_RATE
+            and self.bits_per_sample == SAMPLE_WIDTH * 8
+        )
+
+
+def parse_wav_header(data: bytes) -> Optional[WavFormat]:
+    """
+    Reads the `fmt ` chunk of a RIFF/WAVE header and finds where the `data` chunk starts.
+    Returns None while `data` does not reach the samples yet; raises ValueError if it is
+    not a WAVE header.
+    """
+    if len(data) < 12:
+        return None
+    if not data.startswith(RIFF_MAGIC) or data[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE header")
+    fmt: Optional[Tuple[int, int, int, int]] = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("data chunk before fmt chunk")
+            return WavFormat(*fmt, data_offset=body)
+        if chunk_id == b"fmt ":
+            if body + 16 > len(data):
+                return None
+            audio_format, channels, sample_rate, _, _, bits_per_sample = struct.unpack_from("<HHIIHH", data, body)
+            fmt = (audio_format, channels, sample_rate, bits_per_sample)
+        # Chunks are padded to an even length
+        offset = body + size + (size & 1)
+    return None
+
+
+class AudioDecoder:
+    """
+    Per-session streaming decoder that turns incoming WebSocket audio chunks into
+    16 kHz mono LINEAR16 frames without touching the disk.
+
+    Raw PCM, and WAV that is already 16 kHz mono 16-bit, is handled in-process: the WAV
+    header is parsed and stripped and the samples are passed straight through. WebM/Opus,
+    and WAV at any other rate, channel count or sample format, is piped into an ffmpeg
+    process (stdin -> stdout) that lives for the whole stream, so there is one process
+    per utterance instead of one per chunk.
+
+    The container format detected from the first header is kept for the session. Its
+    header is kept too, so when a client keeps one recorder running across utterances,
+    the decoder started for the next utterance gets the header in front of the
+    continuation chunks. A new header (the client restarted its recorder) starts a new
+    stream; the previous decoder is shut down in the background instead of on the
+    receive path, and its remaining output is still emitted before the new stream's.
+
+    Decoded audio is handed to `on_frame` in FRAME_MS sized frames as soon as it is
+    available.
+    """
+
+    def __init__(self, on_frame: Callable[[bytes], Awaitable[None]], input_format: str = "auto"):
+        self.on_frame = on_frame
+        self.input_format = input_format
+        self._format: Optional[str] = None if input_format == "auto" else input_format
+        self._header = bytearray()
+        self._header_complete = True
+        # Headerless WAV input is taken to be LINEAR16 already
+        self._passthrough = self._format == "wav"
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._retiring: Set[asyncio.Task] = set()
+        self._pending = bytearray()
+
+    def _detect_format(self, chunk: bytes) -> str:
+        if chunk.startswith(EBML_MAGIC):
+            return "webm"
+        if chunk.startswith(RIFF_MAGIC):
+            return "wav"
+        return "pcm"
+
+    def _ffmpeg_args(self):
+        stream = (
+            ffmpeg
+            .input("pipe:0", format=self._format)
+            .output("pipe:1", format="s16le", acodec="pcm_s16le", ac=1, ar=str(SAMPLE_RATE))
+            .global_args("-loglevel", "error", "-fflags", "nobuffer", "-flags", "low_delay")
+        )
+        return stream.compile()
+
+    async def _start_process(self):
+        args = self._ffmpeg_args()
+        self._process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader_task = asyncio.create_task(self._read_stdout(self._process, list(self._retiring)))
+
+    async def _read_stdout(self, process: asyncio.subprocess.Process, previous: List[asyncio.Task]):
+        try:
+            # Keeps the frames in order: the previous stream's tail goes out first
+            await asyncio.gather(*previous, return_exceptions=True)
+            while True:
+                data = await process.stdout.read(READ_SIZE)
+                if not data:
+                    break
+                await self._emit(data)
+        except Exception as e:
+            logger.error(f"Error reading decoded audio: {e}")
+
+    async def _emit(self, data: bytes):
+        self._pending.extend(data)
+        while len(self._pending) >= FRAME_BYTES:
+            frame = bytes(self._pending[:FRAME_BYTES])
+            del self._pending[:FRAME_BYTES]
+            await self.on_frame(frame)
+
+    async def _flush_pending(self):
+        # Only whole samples are forwarded to STT
+        usable = len(self._pending) - (len(self._pending) % SAMPLE_WIDTH)
+        if usable:
+            frame = bytes(self._pending[:usable])
+            await self.on_frame(frame)
+        self._pending.clear()
+
+    async def _close_process(self, process: asyncio.subprocess.Process, reader_task: Optional[asyncio.Task]):
+        try:
+            if process.stdin and not process.stdin.is_closing():
+                process.stdin.close()
+            if reader_task:
+                await reader_task
+            await process.wait()
+        except Exception as e:
+            logger.error(f"Error stopping audio decoder: {e}")
+            if process.returncode is None:
+                process.kill()
+
+    def _retire_process(self):
+        """Closes the running ffmpeg process in the background."""
+        process, reader_task = self._process, self._reader_task
+        self._process, self._reader_task = None, None
+        if process is None:
+            return
+        task = asyncio.create_task(self._close_process(process, reader_task))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def _stop_process(self):
+        process, reader_task = self._process, self._reader_task
+        self._process, self._reader_task = None, None
+        if process is not None:
+            await self._close_process(process, reader_task)
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+    def _start_stream(self):
+        # The client restarted its recorder; a new container needs a new decoder
+        self._retire_process()
+        self._header = bytearray()
+        self._header_complete = False
+        self._passthrough = False
+
+    def _header_end(self) -> Tuple[Optional[int], bool]:
+        """Length of the buffered container header (None if incomplete) and whether to pass the samples through."""
+        if self._format == "webm":
+            index = self._header.find(WEBM_CLUSTER_ID)
+            return (index if index >= 0 else None), False
+        try:
+            wav = parse_wav_header(bytes(self._header))
+        except ValueError as e:
+            logger.warning(f"Unreadable WAV header, decoding it with ffmpeg: {e}")
+            return len(self._header), False
+        if wav is None:
+            return None, False
+        if not wav.is_linear16_mono:
+            logger.info(
+                f"Converting {wav.channels} channel {wav.sample_rate} Hz {wav.bits_per_sample}-bit WAV "
+                f"(format {wav.audio_format:#x}) with ffmpeg"
+            )
+        return wav.data_offset, wav.is_linear16_mono
+
+    def _take_header(self, chunk: bytes) -> bytes:
+        """Buffers the start of a stream until its header is complete; returns what follows it."""
+        self._header.extend(chunk)
+        end, passthrough = self._header_end()
+        if end is None:
+            if len(self._header) < MAX_HEADER_BYTES:
+                return b""
+            # No recognisable header end; let ffmpeg make sense of it
+            end = len(self._header)
+        rest = bytes(self._header[end:])
+        del self._header[end:]
+        self._header_complete = True
+        self._passthrough = passthrough
+        return rest
+
+    async def _decode(self, chunk: bytes):
+        if self._process is None:
+            await self._start_process()
+            # Every process starts at the container header, also for a stream continued after flush()
+            chunk = bytes(self._header) + chunk
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.error(f"Audio decoder process exited unexpectedly: {e}")
+            self._retire_process()
+
+    async def feed(self, chunk: bytes):
+        """Decode one chunk of client audio. Frames are emitted through `on_frame`."""
+        if not chunk:
+            return
+        new_stream = chunk.startswith(EBML_MAGIC) or chunk.startswith(RIFF_MAGIC)
+        if self.input_format == "auto" and (self._format is None or new_stream):
+            self._format = self._detect_format(chunk)
+        if self._format == "pcm":
+            await self._emit(chunk)
+            return
+
+        if new_stream:
+            self._start_stream()
+        if not self._header_complete:
+            chunk = self._take_header(chunk)
+            if not self._header_complete:
+                return
+        if self._passthrough:
+            if chunk:
+                await self._emit(chunk)
+        elif chunk or self._process is None:
+            await self._decode(chunk)
+
+    async def flush(self):
+        """End of utterance: drain the decoder and emit the remaining audio."""
+        await self._stop_process()
+        await self._flush_pending()
+
+    async def close(self):
+        await self.flush()
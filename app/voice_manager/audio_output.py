@@ -0,0 +1,95 @@
+import base64
+import struct
+
+from app.voice_manager.websocket_sender import WebSocketSender
+
+# Binary TTS frame header (network byte order, 8 bytes):
+#   version:u8  flags:u8  codec:u8  reserved:u8  sequence:u32
+FRAME_HEADER = struct.Struct("!BBBBI")
+FRAME_VERSION = 1
+FLAG_END_OF_UTTERANCE = 0x01
+
+CODECS = {
+    "mp3": 1,
+    "pcm_s16le": 2,
+    "opus": 3,
+}
+
+OUTPUT_MODE_JSON = "json"
+OUTPUT_MODE_BINARY = "binary"
+
+
+def codec_for_output_format(output_format: str) -> str:
+    """Maps an ElevenLabs/Google output format (e.g. 'mp3_22050_32', 'pcm_16000') to a codec name."""
+    prefix = output_format.split("_", 1)[0]
+    return {"mp3": "mp3", "pcm": "pcm_s16le", "opus": "opus", "linear16": "pcm_s16le"}.get(prefix, prefix)
+
+
+def pack_frame(sequence: int, codec: str, payload: bytes, end_of_utterance: bool = False) -> bytes:
+    flags = FLAG_END_OF_UTTERANCE if end_of_utterance else 0
+    return FRAME_HEADER.pack(FRAME_VERSION, flags, CODECS[codec], 0, sequence & 0xFFFFFFFF) + payload
+
+
+def unpack_frame(frame: bytes):
+    """Returns (sequence, codec_id, end_of_utterance, payload). Used by clients and tests."""
+    version, flags, codec_id, _, sequence = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported audio frame version: {version}")
+    return sequence, codec_id, bool(flags & FLAG_END_OF_UTTERANCE), memoryview(frame)[FRAME_HEADER.size:]
+
+
+class JsonAudioOutput:
+    """Legacy output: each TTS chunk is base64 encoded in an `audio_response` JSON event."""
+
+    mode = OUTPUT_MODE_JSON
+
+    def __init__(self, websocket: WebSocketSender, codec: str = "mp3"):
+        self.websocket = websocket
+        self.codec = codec
+
+    async def send_chunk(self, chunk: bytes):
+        await self.websocket.send_json({
+            "event_type": "audio_response",
+            "audio_data": base64.b64encode(chunk).decode()
+        }, audio=True)
+
+    async def end_utterance(self):
+        await self.websocket.send_json({
+            "event_type": "final_audio_response",
+            "done": True
+        })
+
+
+class BinaryAudioOutput(JsonAudioOutput):
+    """
+    TTS chunks are sent as binary WebSocket frames with an 8 byte header (FRAME_HEADER),
+    avoiding the base64 expansion and JSON encoding. The end of an utterance is marked by
+    an empty frame with FLAG_END_OF_UTTERANCE, followed by the usual JSON control event.
+    """
+
+    mode = OUTPUT_MODE_BINARY
+
+    def __init__(self, websocket: WebSocketSender, codec: str = "mp3"):
+        super().__init__(websocket, codec)
+        self.sequence = 0
+
+    async def _send_frame(self, payload: bytes, end_of_utterance: bool = False):
+        frame = pack_frame(self.sequence, self.codec, payload, end_of_utterance)
+        # The end-of-utterance marker is a control frame and must survive a barge-in flush
+        await self.websocket.send_bytes(frame, audio=not end_of_utterance)
+        self.sequence += 1
+
+    async def send_chunk(self, chunk: bytes):
+        await self._send_frame(chunk)
+
+    async def end_utterance(self):
+        await self._send_frame(b"", end_of_utterance=True)
+        await super().end_utterance()
+
+
+def build_audio_output(websocket: WebSocketSender, mode: str, codec: str = "mp3"):
+    if mode == OUTPUT_MODE_BINARY:
+        return BinaryAudioOutput(websocket, codec)
+    if mode == OUTPUT_MODE_JSON:
+        return JsonAudioOutput(websocket, codec)
+    raise ValueError(f"Unknown audio output mode: {mode}")
@@ -0,0 +1,181 @@
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional, Tuple, Union
+
+from app.voice_manager.audio_decoder import SAMPLE_RATE, SAMPLE_WIDTH
+
+# Ten seconds of decoded LINEAR16 audio
+AUDIO_QUEUE_BYTES = int(os.environ.get("AUDIO_QUEUE_BYTES", str(SAMPLE_RATE * SAMPLE_WIDTH * 10)))
+AUDIO_OVERFLOW_POLICY = os.environ.get("AUDIO_OVERFLOW_POLICY", "drop_oldest")
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+THROTTLE = "throttle"
+OVERFLOW_POLICIES = (DROP_OLDEST, BLOCK, THROTTLE)
+
+# Throttle is signalled above the high watermark and lifted below the low one
+THROTTLE_HIGH_WATERMARK = 0.75
+THROTTLE_LOW_WATERMARK = 0.25
+
+_SENTINEL = None
+Record = Optional[Tuple[int, int]]
+
+
+@dataclass
+class AudioQueueStats:
+    depth_bytes: int = 0
+    depth_chunks: int = 0
+    max_depth_bytes: int = 0
+    dropped_chunks: int = 0
+    dropped_bytes: int = 0
+    blocked_puts: int = 0
+    throttle_signals: int = 0
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size audio queue for one session.
+
+    Chunks are copied once into a preallocated ring of `capacity` bytes and handed to the
+    consumer as `memoryview` slices of it, so queued audio never allocates and a session
+    can never hold more than `capacity` bytes. A slice returned by `get()` stays valid
+    until the next `get()`; consumers that keep audio longer must copy it.
+
+    When a chunk does not fit, `policy` decides:
+      drop_oldest - discard the oldest queued audio until it fits
+      block       - wait for the consumer, pushing back on the decoder and the socket
+      throttle    - like drop_oldest, but `on_throttle(True)` is called above the high
+                    watermark (and `on_throttle(False)` below the low one) so the client
+                    can slow down before anything is dropped
+
+    `None` may be queued as an end-of-utterance marker; markers are never dropped.
+    """
+
+    def __init__(
+        self,
+        capacity: int = AUDIO_QUEUE_BYTES,
+        policy: str = AUDIO_OVERFLOW_POLICY,
+        on_throttle: Optional[Callable[[bool], Awaitable[None]]] = None,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audio overflow policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.on_throttle = on_throttle
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._records: Deque[Record] = deque()
+        self._lease: Record = None
+        self._changed = asyncio.Event()
+        self.throttled = False
+        self.stats = AudioQueueStats()
+
+    def qsize(self) -> int:
+        return len(self._records)
+
+    def _occupied(self):
+        """First and last occupied regions, in ring order."""
+        first = last = self._lease
+        for record in self._records:
+            if record is not None:
+                if first is None:
+                    first = record
+                last = record
+        return first, last
+
+    def _reserve(self, size: int) -> Optional[int]:
+        first, last = self._occupied()
+        if first is None:
+            return 0 if size <= self.capacity else None
+        head = first[0]
+        tail = last[0] + last[1]
+        if tail > head:
+            if size <= self.capacity - tail:
+                return tail
+            # Wrap to the start; a chunk is never split across the end of the ring
+            return 0 if size <= head else None
+        return tail if size <= head - tail else None
+
+    def _drop_oldest(self) -> bool:
+        for index, record in enumerate(self._records):
+            if record is not None:
+                del self._records[index]
+                self.stats.dropped_chunks += 1
+                self.stats.dropped_bytes += record[1]
+                self.stats.depth_bytes -= record[1]
+                self.stats.depth_chunks -= 1
+                return True
+        return False
+
+    async def _signal_throttle(self, throttled: bool):
+        if self.throttled == throttled:
+            return
+        self.throttled = throttled
+        if throttled:
+            self.stats.throttle_signals += 1
+        if self.on_throttle is not None:
+            await self.on_throttle(throttled)
+
+    async def put(self, chunk: Union[bytes, bytearray, memoryview, None]):
+        if chunk is _SENTINEL:
+            self._records.append(_SENTINEL)
+            self._changed.set()
+            return
+        size = len(chunk)
+        if size == 0:
+            return
+        if size > self.capacity:
+            self.stats.dropped_chunks += 1
+            self.stats.dropped_bytes += size
+            return
+        start = self._reserve(size)
+        blocked = False
+        while start is None:
+            if self.policy == BLOCK:
+                if not blocked:
+                    blocked = True
+                    self.stats.blocked_puts += 1
+                self._changed.clear()
+                await self._changed.wait()
+            elif not self._drop_oldest():
+                # Everything left is the slice the consumer is reading
+                self.stats.dropped_chunks += 1
+                self.stats.dropped_bytes += size
+                return
+            start = self._reserve(size)
+        self._view[start:start + size] = chunk
+        self._records.append((start, size))
+        self.stats.depth_bytes += size
+        self.stats.depth_chunks += 1
+        self.stats.max_depth_bytes = max(self.stats.max_depth_bytes, self.stats.depth_bytes)
+        self._changed.set()
+        if self.policy == THROTTLE and self.stats.depth_bytes > self.capacity * THROTTLE_HIGH_WATERMARK:
+            await self._signal_throttle(True)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[memoryview]:
+        """
+        Returns the next chunk, or None for an end-of-utterance marker. Raises
+        asyncio.TimeoutError if nothing arrives within `timeout` seconds.
+        """
+        # The previous slice is no longer in use
+        self._lease = None
+        self._changed.set()
+        while not self._records:
+            self._changed.clear()
+            if timeout is None:
+                await self._changed.wait()
+            else:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+        record = self._records.popleft()
+        self._changed.set()
+        if record is _SENTINEL:
+            return None
+        self._lease = record
+        self.stats.depth_bytes -= record[1]
+        self.stats.depth_chunks -= 1
+        if self.throttled and self.stats.depth_bytes < self.capacity * THROTTLE_LOW_WATERMARK:
+            await self._signal_throttle(False)
+        start, size = record
+        return self._view[start:start + size]
@@ -1,31 +1,145 @@
 import asyncio
+from collections import deque
+from dataclasses import asdict, dataclass
 from fastapi import WebSocket
 import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+from app.voice_manager.audio_decoder import FRAME_MS
+from app.voice_manager.audio_ring_buffer import AUDIO_OVERFLOW_POLICY, AUDIO_QUEUE_BYTES, AudioRingBuffer
+from app.voice_manager.vad import VAD_PREROLL_MS, EnergyVad
+
+AUDIO_STALL_SECONDS = float(os.environ.get("AUDIO_STALL_SECONDS", "10"))
+
+
+@dataclass
+class VadStats:
+    frames_in: int = 0
+    frames_forwarded: int = 0
+    bytes_in: int = 0
+    bytes_forwarded: int = 0
+    endpoints: int = 0
+
+    @property
+    def bytes_dropped(self) -> int:
+        return self.bytes_in - self.bytes_forwarded
 
 
 class AudioStreamManager:
-    def __init__(self, websocket: WebSocket):
+    """
+    Per-session audio queue between the decoder and the recognizer.
+
+    With a `vad`, silent frames are kept out of the queue: a short pre-roll of silence is
+    forwarded when speech starts (so onsets are not clipped), the hangover after speech is
+    forwarded, and once the hangover expires the utterance is ended as if the client had
+    sent `stop_listening`. `on_speech_start` and `on_endpoint` let the route react (barge-in,
+    starting the turn) without waiting for the client.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        vad: Optional[EnergyVad] = None,
+        auto_endpoint: bool = True,
+        on_speech_start: Optional[Callable[[], Awaitable[None]]] = None,
+        on_endpoint: Optional[Callable[[], Awaitable[None]]] = None,
+        preroll_ms: int = VAD_PREROLL_MS,
+        queue_bytes: int = AUDIO_QUEUE_BYTES,
+        overflow_policy: str = AUDIO_OVERFLOW_POLICY,
+        on_throttle: Optional[Callable[[bool], Awaitable[None]]] = None,
+        stall_timeout: float = AUDIO_STALL_SECONDS,
+    ):
         self.websocket = websocket
-        self.audio_queue = asyncio.Queue()
+        # Bounded per session; see AudioRingBuffer for the overflow policies
+        self.audio_queue = AudioRingBuffer(queue_bytes, overflow_policy, on_throttle)
+        self.stall_timeout = stall_timeout
         self.is_streaming = False
+        self.utterance_complete = asyncio.Event()
+        self.utterance_complete.set()
         self.logger = logging.getLogger(__name__)
+        self.vad = vad
+        self.auto_endpoint = auto_endpoint
+        self.on_speech_start = on_speech_start
+        self.on_endpoint = on_endpoint
+        self.preroll = deque(maxlen=max(0, preroll_ms // FRAME_MS))
+        self.vad_stats = VadStats()
+
+    async def next_chunk(self):
+        """
+        Waits for the next audio chunk. Returns None at the end of an utterance. The chunk
+        is a memoryview into the session's ring buffer, valid until the next read.
+        """
+        return await self.audio_queue.get()
 
     async def audio_generator(self):
-        while self.is_streaming:
+        """
+        Yields audio chunks until the end-of-utterance sentinel is received. If the audio
+        stalls for `stall_timeout` seconds mid-utterance the utterance is ended instead of
+        waiting forever.
+        """
+        while True:
             try:
-                chunk = await asyncio.wait_for(self.audio_queue.get(), timeout=5.0)
-                self.logger.debug("Yielding audio chunk from generator")
-                yield chunk
+                chunk = await self.audio_queue.get(timeout=self.stall_timeout)
             except asyncio.TimeoutError:
-                self.logger.debug("Audio generator timed out, but continuing.")
-                continue
-            except Exception as e:
-                self.logger.error(f"Error in audio generator: {e}")
+                self.logger.warning(f"No audio for {self.stall_timeout}s, ending the utterance")
                 break
+            if chunk is None:
+                self.logger.debug("End of utterance reached in audio generator")
+                break
+            yield chunk
+
+    def stats(self) -> dict:
+        return {"queue": asdict(self.audio_queue.stats), "vad": asdict(self.vad_stats)}
 
     async def add_audio_chunk(self, chunk: bytes):
+        if self.vad is None:
+            self.is_streaming = True
+            await self.audio_queue.put(chunk)
+            return
+
+        stats = self.vad_stats
+        stats.frames_in += 1
+        stats.bytes_in += len(chunk)
+        result = self.vad.process(chunk)
+        if not self.vad.in_speech and not result.utterance_ended:
+            # Silence outside an utterance never reaches recognition
+            self.preroll.append(chunk)
+            return
+
+        if result.speech_started:
+            self.is_streaming = True
+            while self.preroll:
+                await self._forward(self.preroll.popleft())
+            if self.on_speech_start is not None:
+                await self.on_speech_start()
+        await self._forward(chunk)
+
+        if result.utterance_ended and self.auto_endpoint:
+            stats.endpoints += 1
+            self.logger.debug("VAD end of utterance")
+            await self.stop_streaming()
+            if self.on_endpoint is not None:
+                await self.on_endpoint()
+
+    async def _forward(self, chunk: bytes):
+        self.vad_stats.frames_forwarded += 1
+        self.vad_stats.bytes_forwarded += len(chunk)
         await self.audio_queue.put(chunk)
 
     async def stop_streaming(self):
         self.is_streaming = False
-        await self.audio_queue.put(None) # Sentinel value to unblock the generator
\ No newline at end of file
+        if self.vad is not None:
+            self.vad.end_utterance()
+        self.utterance_complete.clear()
+        await self.audio_queue.put(None) # Sentinel value to unblock the generator
+
+    def mark_utterance_complete(self):
+        """Called by the recognizer once every result for the utterance has been delivered."""
+        self.utterance_complete.set()
+
+    async def wait_for_utterance_end(self, timeout: float = 5.0):
+        try:
+            await asyncio.wait_for(self.utterance_complete.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("Timed out waiting for final transcripts")
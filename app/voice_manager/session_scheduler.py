@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAGE_LIMITS = {
+    "stt": int(os.environ.get("STT_CONCURRENCY", "64")),
+    "llm": int(os.environ.get("LLM_CONCURRENCY", "16")),
+    "tool": int(os.environ.get("TOOL_CONCURRENCY", "16")),
+    "tts": int(os.environ.get("TTS_CONCURRENCY", "16")),
+    "session": int(os.environ.get("SESSION_STORE_CONCURRENCY", "16")),
+}
+DEFAULT_MAX_WORKERS = int(os.environ.get("PIPELINE_WORKERS", "32"))
+
+_DONE = object()
+
+
+class SessionScheduler:
+    """
+    Runs the stages of a voice turn (STT, LLM, tools, TTS) without blocking the event loop.
+
+    Every stage has its own concurrency limit so a burst of slow LLM turns cannot starve
+    TTS for the other sessions. Async backends are awaited directly inside `stage()`;
+    blocking SDK calls go through `run_blocking()`/`iterate_blocking()`, which use a
+    bounded thread pool shared by the whole worker.
+    """
+
+    def __init__(self, stage_limits: Optional[Dict[str, int]] = None, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        if stage_limits:
+            self.stage_limits.update(stage_limits)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-stage")
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.stage_limits.get(stage, DEFAULT_MAX_WORKERS))
+            self._semaphores[stage] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def stage(self, stage: str):
+        async with self._semaphore(stage):
+            yield
+
+    async def run_blocking(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self.stage(stage):
+            return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def iterate_blocking(self, stage: str, iterator_factory: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+        """Consumes a blocking iterator (e.g. a sync streaming SDK response) from the thread pool."""
+        loop = asyncio.get_running_loop()
+        async with self.stage(stage):
+            iterator = await loop.run_in_executor(self._executor, iterator_factory)
+            while True:
+                item = await loop.run_in_executor(self._executor, next, iterator, _DONE)
+                if item is _DONE:
+                    break
+                yield item
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+scheduler = SessionScheduler()
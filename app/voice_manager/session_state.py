@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+import ulid
+
+from app.utils.affinity import HashRing, cluster_ring, default_node
+from app.utils.resources import resources
+from app.utils.session_store import SessionStore, build_session_store
+from app.voice_manager.session_scheduler import scheduler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+resources.register("session_store", build_session_store, close=lambda store: store.close())
+
+
+@dataclass
+class VoiceSession:
+    """
+    What a worker needs to pick up a conversation it did not start: the conversation
+    itself lives in the checkpointer under the same `chat_thread_id`.
+
+    `pending_transcript` holds final transcript segments that had not started a turn when
+    the previous connection dropped; they are replayed in front of the next utterance.
+    """
+
+    chat_thread_id: str
+    node: str
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    turns: int = 0
+    pending_transcript: List[str] = field(default_factory=list)
+
+
+class SessionStateStore:
+    """
+    Voice session records in the shared `SessionStore`, keyed by `chatThreadId`, plus the
+    hash ring that says which node a thread is pinned to. Store calls are blocking and
+    run on the scheduler's thread pool.
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, ring: HashRing = cluster_ring,
+                 node: Optional[str] = None, ttl: float = SESSION_TTL_SECONDS):
+        self._store = store
+        self._node = node
+        self.ring = ring
+        self.ttl = ttl
+        self._warned_off_ring = False
+
+    @property
+    def node(self) -> str:
+        # NODE_URL, or hostname:pid resolved on use so a forked worker reports its own pid
+        return self._node or default_node()
+
+    @property
+    def store(self) -> SessionStore:
+        return self._store if self._store is not None else resources.get("session_store")
+
+    @staticmethod
+    def _key(chat_thread_id: str) -> str:
+        return f"session:{chat_thread_id}"
+
+    def new_thread_id(self) -> str:
+        """A new `chatThreadId` that the ring pins to this node; unpinned if the node is not on the ring."""
+        node = self.node
+        if self.ring.nodes and node not in self.ring.nodes:
+            if not self._warned_off_ring:
+                logger.warning(
+                    f"This node ({node}) is not in CLUSTER_NODES {self.ring.nodes}; set NODE_URL to its entry. "
+                    "New conversations are not pinned to it"
+                )
+                self._warned_off_ring = True
+            return ulid.new().str
+        return self.ring.new_key_for(node)
+
+    def owner(self, chat_thread_id: str) -> Optional[str]:
+        """The node `chat_thread_id` is pinned to, or None when there is no cluster ring."""
+        return self.ring.node_for(chat_thread_id)
+
+    def _load(self, chat_thread_id: str) -> Optional[VoiceSession]:
+        raw = self.store.get(self._key(chat_thread_id))
+        if raw is None:
+            return None
+        try:
+            return VoiceSession(**json.loads(raw))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Discarding unreadable session record for {chat_thread_id}: {e}")
+            return None
+
+    def _save(self, session: VoiceSession):
+        session.updated_at = time.time()
+        self.store.set(self._key(session.chat_thread_id), json.dumps(asdict(session)).encode(), ttl=self.ttl)
+
+    async def load(self, chat_thread_id: str) -> Optional[VoiceSession]:
+        return await scheduler.run_blocking("session", self._load, chat_thread_id)
+
+    async def save(self, session: VoiceSession):
+        session.node = self.node
+        await scheduler.run_blocking("session", self._save, session)
+
+    async def delete(self, chat_thread_id: str):
+        await scheduler.run_blocking("session", self.store.delete, self._key(chat_thread_id))
+
+
+session_states = SessionStateStore()
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from functools import partial
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Deque, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from app.agent_builder.trace_callbacks import AGENT_NODE, TOOLS_NODE, GraphTraceHandler
+from app.utils.metrics import TurnTrace, current_trace, metrics, stage_histogram
+from app.utils.text_segmenter import SentenceSegmenter
+from app.voice_manager.audio_output import JsonAudioOutput
+from app.voice_manager.session_scheduler import scheduler
+from app.voice_manager.websocket_sender import WebSocketSender
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TTS_PARALLEL_SENTENCES = int(os.environ.get("TTS_PARALLEL_SENTENCES", "2"))
+
+Synthesizer = Callable[[str], AsyncIterator[bytes]]
+
+
+@dataclass
+class TurnTimings:
+    started: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None
+    first_audio: Optional[float] = None
+    finished: Optional[float] = None
+
+    def _ms(self, mark: Optional[float]) -> Optional[float]:
+        return None if mark is None else round((mark - self.started) * 1000, 1)
+
+    @property
+    def time_to_first_token_ms(self) -> Optional[float]:
+        return self._ms(self.first_token)
+
+    @property
+    def time_to_first_audio_ms(self) -> Optional[float]:
+        return self._ms(self.first_audio)
+
+    @property
+    def total_ms(self) -> Optional[float]:
+        return self._ms(self.finished)
+
+
+def message_text(content) -> str:
+    # Gemini may return either a plain string or a list of content parts
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return ""
+
+
+class TurnPipeline:
+    """
+    Pipelines one conversational turn: LLM tokens are streamed out of the graph, cut into
+    sentences, and each sentence is synthesized while the LLM keeps generating.
+
+    Up to `parallel_sentences` sentences of a reply are synthesized concurrently, but a
+    single consumer sends their audio so frames reach the client in the order the text
+    was produced.
+
+    A turn runs as its own task (`start()`), so the receive loop stays responsive. When
+    the caller barges in, `cancel()` stops the graph run and the TTS stream, drops the
+    audio still queued for the socket, and records in the thread history only the
+    sentences whose audio was actually written to the socket.
+
+    Each turn is traced (`TurnTrace`): graph, LLM and tool spans come from LangChain
+    callbacks, and every sentence adds `tts_first_byte`/`tts_last_byte` spans.
+    """
+
+    def __init__(self, websocket: WebSocketSender, graph, synthesize: Synthesizer, audio_output=None,
+                 parallel_sentences: int = TTS_PARALLEL_SENTENCES):
+        self.websocket = websocket
+        self.graph = graph
+        self.synthesize = synthesize
+        self.parallel_sentences = max(1, parallel_sentences)
+        # Negotiated per session, JSON/base64 unless the client asks for binary frames
+        self.audio_output = audio_output or JsonAudioOutput(websocket)
+        self._task: Optional[asyncio.Task] = None
+        self._spoken: List[str] = []
+        self._reply_complete = False
+
+    async def _produce_sentences(self, transcript: str, chat_thread_id: str, sentences: asyncio.Queue,
+                                 timings: TurnTimings, trace: TurnTrace) -> str:
+        segmenter = SentenceSegmenter()
+        response_parts = []
+        try:
+            # The agent node takes an "llm" slot per model call, so tool steps do not hold one
+            async for message, metadata in self.graph.astream(
+                {"messages": [HumanMessage(content=transcript)]},
+                config={"configurable": {"thread_id": chat_thread_id}, "callbacks": [GraphTraceHandler(trace)]},
+                stream_mode="messages",
+            ):
+                if metadata.get("langgraph_node") != AGENT_NODE or not isinstance(message, AIMessageChunk):
+                    continue
+                text = message_text(message.content)
+                if not text:
+                    continue
+                if timings.first_token is None:
+                    timings.first_token = time.perf_counter()
+                response_parts.append(text)
+                for sentence in segmenter.feed(text):
+                    await sentences.put(sentence)
+            for sentence in segmenter.flush():
+                await sentences.put(sentence)
+        finally:
+            await sentences.put(None)
+        return "".join(response_parts).strip()
+
+    async def _synthesize_into(self, sentence: str, chunks: asyncio.Queue, trace: TurnTrace):
+        started = time.perf_counter()
+        first_byte = False
+        try:
+            async with scheduler.stage("tts"):
+                async for chunk in self.synthesize(sentence):
+                    if chunk:
+                        if not first_byte:
+                            first_byte = True
+                            trace.add("tts_first_byte", started, chars=len(sentence))
+                        chunks.put_nowait(chunk)
+            trace.add("tts_last_byte", started, chars=len(sentence))
+        finally:
+            chunks.put_nowait(None)
+
+    def _start_synthesis(self, sentence: str, pending: Deque, trace: TurnTrace):
+        chunks: asyncio.Queue = asyncio.Queue()
+        pending.append((sentence, chunks, asyncio.create_task(self._synthesize_into(sentence, chunks, trace))))
+
+    def _start_ready_sentences(self, sentences: asyncio.Queue, pending: Deque, trace: TurnTrace) -> bool:
+        """Starts synthesis of queued sentences up to the lookahead. Returns False at the end marker."""
+        while len(pending) < self.parallel_sentences and not sentences.empty():
+            sentence = sentences.get_nowait()
+            if sentence is None:
+                return False
+            self._start_synthesis(sentence, pending, trace)
+        return True
+
+    async def _speak_sentences(self, sentences: asyncio.Queue, timings: TurnTimings, trace: TurnTrace):
+        # Up to `parallel_sentences` sentences are synthesized at once; audio is sent
+        # strictly in sentence order, later sentences are buffered until their turn
+        pending: Deque = deque()
+        more_text = True
+        try:
+            while True:
+                if not pending:
+                    if not more_text:
+                        break
+                    sentence = await sentences.get()
+                    if sentence is None:
+                        break
+                    self._start_synthesis(sentence, pending, trace)
+                if more_text:
+                    more_text = self._start_ready_sentences(sentences, pending, trace)
+
+                sentence, chunks, task = pending[0]
+                has_audio = False
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    if timings.first_audio is None:
+                        timings.first_audio = time.perf_counter()
+                    has_audio = True
+                    await self.audio_output.send_chunk(chunk)
+                    if more_text:
+                        more_text = self._start_ready_sentences(sentences, pending, trace)
+                if has_audio:
+                    # Spoken once its frames are written, not when queued: a barge-in drops
+                    # the queued audio together with this marker
+                    self.websocket.mark(partial(self._spoken.append, sentence))
+                pending.popleft()
+                # Surfaces synthesis errors
+                await task
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    async def run(self, transcript: str, chat_thread_id: str, trace: Optional[TurnTrace] = None) -> TurnTimings:
+        """
+        Runs one turn. With a `trace` (started when the caller stopped speaking), the
+        timings are measured from the end of the utterance rather than from this call.
+        """
+        trace = trace or TurnTrace(session_id=chat_thread_id, thread_id=chat_thread_id)
+        current_trace.set(trace)
+        timings = TurnTimings(started=trace.started)
+        self._spoken = []
+        self._reply_complete = False
+        metrics.counter("voice_turns_total", "Conversational turns started").inc()
+        sentences: asyncio.Queue = asyncio.Queue()
+        speaker = asyncio.create_task(self._speak_sentences(sentences, timings, trace))
+        try:
+            response_text = await self._produce_sentences(transcript, chat_thread_id, sentences, timings, trace)
+            self._reply_complete = True
+
+            await self.websocket.send_json({
+                "event_type": "agent_response",
+                "text": {"responseText": response_text, "chatThreadId": chat_thread_id}
+            })
+            await speaker
+            # Stay cancellable until the audio has gone out, so a barge-in while queued
+            # audio is still being written drops it
+            await self.websocket.drain()
+        except asyncio.CancelledError:
+            speaker.cancel()
+            await asyncio.gather(speaker, return_exceptions=True)
+            await self._handle_barge_in(chat_thread_id)
+            # How far into the turn the caller interrupted
+            trace.add("barge_in", trace.started, spoken_sentences=len(self._spoken))
+            trace.finish()
+            raise
+        except Exception as e:
+            # The turn runs detached from the receive loop, so the client has to be told
+            logger.error(f"Error in turn pipeline for {chat_thread_id}: {e}")
+            metrics.counter("voice_turn_errors_total", "Turns that failed in the LLM or TTS stage").inc()
+            speaker.cancel()
+            await asyncio.gather(speaker, return_exceptions=True)
+            self.websocket.drop_pending_audio()
+            await self.websocket.send_json({"event_type": "error", "reason": "Could not generate a reply"})
+            await self.audio_output.end_utterance()
+            trace.add("turn_error", trace.started, error=type(e).__name__)
+            trace.finish()
+            return timings
+        except BaseException:
+            speaker.cancel()
+            raise
+        await self.audio_output.end_utterance()
+
+        timings.finished = time.perf_counter()
+        self._observe(timings, trace)
+        logger.info(
+            f"Turn for {chat_thread_id}: time_to_first_token={timings.time_to_first_token_ms}ms "
+            f"time_to_first_audio={timings.time_to_first_audio_ms}ms total={timings.total_ms}ms"
+        )
+        return timings
+
+    @staticmethod
+    def _observe(timings: TurnTimings, trace: TurnTrace):
+        for stage, value in (
+            ("time_to_first_token", timings.time_to_first_token_ms),
+            ("time_to_first_audio", timings.time_to_first_audio_ms),
+            ("turn_total", timings.total_ms),
+        ):
+            if value is not None:
+                stage_histogram(stage).observe(value)
+        trace.finish(timings.total_ms)
+
+    async def _handle_barge_in(self, chat_thread_id: str):
+        metrics.counter("voice_barge_ins_total", "Replies interrupted by the caller").inc()
+        dropped = self.websocket.drop_pending_audio()
+        await self.websocket.send_json({
+            "event_type": "barge_in",
+            "text": "Response interrupted by caller"
+        })
+        logger.info(f"Barge-in on {chat_thread_id}: dropped {dropped} queued audio messages")
+        try:
+            await self._record_truncated_reply(chat_thread_id, " ".join(self._spoken))
+        except Exception as e:
+            logger.error(f"Could not record interrupted reply for {chat_thread_id}: {e}")
+
+    async def _record_truncated_reply(self, chat_thread_id: str, spoken_text: str):
+        """
+        Makes the thread history reflect what the caller heard. If the agent had already
+        finished its reply, that message is replaced (same id) by the spoken part; if it was
+        still generating, the spoken part is appended as the agent's reply.
+
+        Tool calls the barge-in left unanswered get a "cancelled" result first: the model
+        rejects a history with a tool call that has no matching tool message.
+        """
+        config = {"configurable": {"thread_id": chat_thread_id}}
+        content = f"{spoken_text} [interrupted by caller]".strip()
+        state = await self.graph.aget_state(config)
+        messages = state.values.get("messages", []) if state else []
+        last = messages[-1] if messages else None
+        if isinstance(last, AIMessage) and last.tool_calls:
+            answered = {message.tool_call_id for message in messages if isinstance(message, ToolMessage)}
+            cancelled = [
+                ToolMessage(content="cancelled", tool_call_id=call["id"], name=call["name"])
+                for call in last.tool_calls if call["id"] not in answered
+            ]
+            if cancelled:
+                await self.graph.aupdate_state(config, {"messages": cancelled}, as_node=TOOLS_NODE)
+        if self._reply_complete:
+            if isinstance(last, AIMessage) and not last.tool_calls:
+                # add_messages replaces a message with the same id
+                await self.graph.aupdate_state(config, {"messages": [AIMessage(content=content, id=last.id)]}, as_node=AGENT_NODE)
+        elif spoken_text:
+            await self.graph.aupdate_state(config, {"messages": [AIMessage(content=content)]}, as_node=AGENT_NODE)
+
+    def start(self, transcript: str, chat_thread_id: str, trace: Optional[TurnTrace] = None) -> asyncio.Task:
+        self._task = asyncio.create_task(self.run(transcript, chat_thread_id, trace))
+        self._task.add_done_callback(self._log_failure)
+        return self._task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error in turn pipeline: {task.exception()}")
+
+    def is_active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def cancel(self):
+        """Barge-in: cancels the running turn and waits for its cleanup."""
+        if not self.is_active():
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,136 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.voice_manager.audio_decoder import FRAME_MS, SAMPLE_RATE, SAMPLE_WIDTH
+
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+VAD_AUTO_ENDPOINT = os.environ.get("VAD_AUTO_ENDPOINT", "true").lower() in ("1", "true", "yes")
+VAD_HANGOVER_MS = int(os.environ.get("VAD_HANGOVER_MS", "800"))
+VAD_PREROLL_MS = int(os.environ.get("VAD_PREROLL_MS", "300"))
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", "12"))
+
+WINDOW_MS = 20
+WINDOW_SAMPLES = SAMPLE_RATE * WINDOW_MS // 1000
+# Absolute floor: anything quieter than this is never speech (dBFS)
+MIN_SPEECH_DBFS = -50.0
+# Weak fricatives (s, f, th) are quiet but have a high zero-crossing rate
+FRICATIVE_ZCR = 0.25
+FRICATIVE_MARGIN_DB = 6.0
+# Very high crossing rates with little energy are hiss, not speech
+MAX_VOICED_ZCR = 0.6
+NOISE_FLOOR_ADAPT = 0.05
+# A frame whose windows stay within this spread, at about the previous frame's level, is
+# stationary: syllables modulate speech too fast for that to last
+STATIONARY_SPREAD_DB = 3.0
+STATIONARY_FRAMES = 2
+STATIONARY_ADAPT = 0.3
+
+
+@dataclass
+class VadResult:
+    is_speech: bool
+    speech_started: bool = False
+    utterance_ended: bool = False
+
+
+def frame_features(pcm: bytes):
+    """Returns per-window energy (dBFS) and zero-crossing rate for a LINEAR16 frame."""
+    samples = np.frombuffer(pcm, dtype="<i2")
+    windows = len(samples) // WINDOW_SAMPLES
+    if windows == 0:
+        return np.empty(0), np.empty(0)
+    block = samples[: windows * WINDOW_SAMPLES].reshape(windows, WINDOW_SAMPLES).astype(np.float32)
+    rms = np.sqrt(np.mean(block * block, axis=1))
+    energy_db = 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+    signs = np.signbit(block)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (WINDOW_SAMPLES - 1)
+    return energy_db, zcr
+
+
+class EnergyVad:
+    """
+    Energy / zero-crossing voice activity detector over the decoder's LINEAR16 frames.
+
+    Each frame is split into WINDOW_MS windows. A window is speech when its energy is
+    `threshold_db` above the tracked noise floor, or slightly less when its zero-crossing
+    rate looks like a fricative. A frame is speech when at least `min_speech_windows` of
+    its windows are. The noise floor tracks the quietest window of each frame, so the
+    detector adapts to the caller's background. It only rises on non-speech frames, or,
+    faster, once the input has been stationary for STATIONARY_FRAMES (a steady background
+    rather than a talker), so a long sentence cannot raise the floor above itself.
+
+    The utterance ends after `hangover_ms` of consecutive non-speech frames.
+    """
+
+    def __init__(
+        self,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        threshold_db: float = VAD_THRESHOLD_DB,
+        min_speech_windows: int = 2,
+        initial_noise_floor_db: float = -60.0,
+    ):
+        self.hangover_ms = hangover_ms
+        self.threshold_db = threshold_db
+        self.min_speech_windows = min_speech_windows
+        self.initial_noise_floor_db = initial_noise_floor_db
+        self.reset()
+
+    def reset(self):
+        self.noise_floor_db = self.initial_noise_floor_db
+        self.in_speech = False
+        self.silence_ms = 0
+        self._stationary_frames = 0
+        self._last_level_db = None
+
+    def end_utterance(self):
+        """The utterance was ended externally (e.g. `stop_listening`); keeps the noise floor."""
+        self.in_speech = False
+        self.silence_ms = 0
+
+    def classify(self, pcm: bytes) -> bool:
+        energy_db, zcr = frame_features(pcm)
+        if energy_db.size == 0:
+            return self.in_speech
+        threshold = max(MIN_SPEECH_DBFS, self.noise_floor_db + self.threshold_db)
+        voiced = (energy_db > threshold) & (zcr < MAX_VOICED_ZCR)
+        fricative = (energy_db > threshold - FRICATIVE_MARGIN_DB) & (zcr >= FRICATIVE_ZCR)
+        speech_windows = voiced | fricative
+        is_speech = int(np.count_nonzero(speech_windows)) >= min(self.min_speech_windows, energy_db.size)
+
+        mean_db = float(energy_db.mean())
+        stationary = (
+            float(np.ptp(energy_db)) < STATIONARY_SPREAD_DB
+            and self._last_level_db is not None
+            and abs(mean_db - self._last_level_db) < STATIONARY_SPREAD_DB
+        )
+        self._stationary_frames = self._stationary_frames + 1 if stationary else 0
+        self._last_level_db = mean_db
+        # Minimum tracking: the floor drops at once and rises slowly, so the gaps between
+        # syllables keep it down while a steady background noise is learned in a few seconds
+        level = float(energy_db.min())
+        if level < self.noise_floor_db:
+            self.noise_floor_db = level
+        elif self._stationary_frames >= STATIONARY_FRAMES:
+            self.noise_floor_db += STATIONARY_ADAPT * (level - self.noise_floor_db)
+        elif not is_speech:
+            self.noise_floor_db += NOISE_FLOOR_ADAPT * (level - self.noise_floor_db)
+        return is_speech
+
+    def process(self, pcm: bytes) -> VadResult:
+        is_speech = self.classify(pcm)
+        frame_ms = len(pcm) * 1000 // (SAMPLE_RATE * SAMPLE_WIDTH) or FRAME_MS
+        if is_speech:
+            self.silence_ms = 0
+            if not self.in_speech:
+                self.in_speech = True
+                return VadResult(is_speech=True, speech_started=True)
+            return VadResult(is_speech=True)
+        if not self.in_speech:
+            return VadResult(is_speech=False)
+        self.silence_ms += frame_ms
+        if self.silence_ms >= self.hangover_ms:
+            self.end_utterance()
+            return VadResult(is_speech=False, utterance_ended=True)
+        return VadResult(is_speech=False)
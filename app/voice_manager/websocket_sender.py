@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+from fastapi import WebSocket
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_JSON = "json"
+_BYTES = "bytes"
+_MARK = "mark"
+
+
+class WebSocketSender:
+    """
+    Single writer for a WebSocket session.
+
+    The STT task, the turn pipeline and the receive loop all send through this queue, so
+    frames never interleave mid-write. Messages flagged as `audio` can be discarded with
+    `drop_pending_audio()` when the caller barges in; control events are always delivered.
+    `mark()` queues a callback that runs once everything queued before it has been
+    written, so callers can tell what actually went out rather than what was queued.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self.dropped_audio = 0
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            kind, payload, _ = item
+            if kind == _MARK:
+                payload()
+                continue
+            try:
+                if kind == _JSON:
+                    await self.websocket.send_json(payload)
+                else:
+                    await self.websocket.send_bytes(payload)
+            except Exception as e:
+                logger.info(f"WebSocket send failed, closing sender: {e}")
+                self.closed = True
+                break
+
+    def _enqueue(self, kind: str, payload: Any, audio: bool):
+        if self.closed:
+            return
+        self.queue.put_nowait((kind, payload, audio))
+
+    async def send_json(self, data: Any, audio: bool = False):
+        self._enqueue(_JSON, data, audio)
+
+    async def send_bytes(self, data: bytes, audio: bool = True):
+        self._enqueue(_BYTES, data, audio)
+
+    def mark(self, callback: Callable[[], None], droppable: bool = True):
+        """
+        Runs `callback` from the writer after the messages queued before it are sent. A
+        droppable mark is discarded with the audio by `drop_pending_audio()`.
+        """
+        self._enqueue(_MARK, callback, droppable)
+
+    async def drain(self):
+        """Waits until everything queued so far has been written (or the writer stopped)."""
+        if self.closed or self._writer is None or self._writer.done():
+            return
+        written = asyncio.get_running_loop().create_future()
+        self.mark(lambda: written.done() or written.set_result(None), droppable=False)
+        await asyncio.wait([written, self._writer], return_when=asyncio.FIRST_COMPLETED)
+
+    def drop_pending_audio(self) -> int:
+        """Removes queued audio messages, keeping control events in order."""
+        kept, dropped = [], 0
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is not None and item[2]:
+                if item[0] != _MARK:
+                    dropped += 1
+            else:
+                kept.append(item)
+        for item in kept:
+            self.queue.put_nowait(item)
+        self.dropped_audio += dropped
+        return dropped
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self.queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._writer, timeout=5.0)
+        except (asyncio.TimeoutError, Exception):
+            self._writer.cancel()
+        self._writer = None
+        self.closed = True
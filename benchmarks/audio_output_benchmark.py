@@ -0,0 +1,77 @@
+"""
+Throughput of the TTS output modes: base64-in-JSON vs binary WebSocket frames.
+
+Pushes synthetic MP3-sized chunks through JsonAudioOutput and BinaryAudioOutput into a
+WebSocket stub that serializes exactly like Starlette (json.dumps for send_json) and
+reports, per second of audio: bytes on the wire, overhead versus the raw audio, and CPU
+time spent framing.
+
+    poetry run python -m benchmarks.audio_output_benchmark --seconds 600 --bitrate-kbps 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.voice_manager.audio_output import BinaryAudioOutput, JsonAudioOutput
+
+
+class CountingWebSocket:
+    def __init__(self):
+        self.bytes_sent = 0
+        self.messages = 0
+
+    async def send_json(self, data, audio: bool = False):
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        self.bytes_sent += len(text.encode("utf-8"))
+        self.messages += 1
+
+    async def send_bytes(self, data: bytes, audio: bool = True):
+        self.bytes_sent += len(data)
+        self.messages += 1
+
+
+async def run(output_cls, chunks, chunks_per_utterance: int):
+    websocket = CountingWebSocket()
+    output = output_cls(websocket, "mp3")
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    for index, chunk in enumerate(chunks, start=1):
+        await output.send_chunk(chunk)
+        if index % chunks_per_utterance == 0:
+            await output.end_utterance()
+    return websocket, time.process_time() - started_cpu, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=600, help="seconds of audio to send")
+    parser.add_argument("--bitrate-kbps", type=int, default=32, help="TTS bitrate (mp3_22050_32 is 32)")
+    parser.add_argument("--chunk-bytes", type=int, default=1024)
+    parser.add_argument("--utterance-seconds", type=int, default=5)
+    args = parser.parse_args()
+
+    audio_bytes = args.seconds * args.bitrate_kbps * 1000 // 8
+    chunk_count = max(1, audio_bytes // args.chunk_bytes)
+    chunks = [os.urandom(args.chunk_bytes) for _ in range(chunk_count)]
+    chunks_per_utterance = max(1, chunk_count * args.utterance_seconds // args.seconds)
+    raw_bytes = chunk_count * args.chunk_bytes
+
+    results = []
+    for name, output_cls in (("json_base64", JsonAudioOutput), ("binary", BinaryAudioOutput)):
+        websocket, cpu_s, wall_s = asyncio.run(run(output_cls, chunks, chunks_per_utterance))
+        results.append({
+            "mode": name,
+            "audio_seconds": args.seconds,
+            "messages": websocket.messages,
+            "wire_bytes_per_audio_second": round(websocket.bytes_sent / args.seconds, 1),
+            "overhead_pct": round((websocket.bytes_sent - raw_bytes) / raw_bytes * 100, 2),
+            "cpu_us_per_audio_second": round(cpu_s / args.seconds * 1e6, 2),
+            "wall_s": round(wall_s, 4),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
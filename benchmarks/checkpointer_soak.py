@@ -0,0 +1,98 @@
+"""
+Soak test for the conversation checkpointer.
+
+Runs many short conversations through a small LangGraph graph (no LLM) and samples
+Python heap usage as threads accumulate, for the old InMemorySaver and the tiered
+SQLite checkpointer. It then opens a second checkpointer on the same database, as
+another worker would, and checks that it resumes an existing thread's history.
+
+    poetry run python -m benchmarks.checkpointer_soak --threads 2000 --turns 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, StateGraph, add_messages
+
+from app.agent_builder.checkpointer import TieredCheckpointSaver
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+async def reply(state):
+    return {"messages": [AIMessage(content="Sure, let me check that for you. " * 8)]}
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(State)
+    builder.add_node("agent_node", reply)
+    builder.set_entry_point("agent_node")
+    builder.add_edge("agent_node", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def tiered(db_path: str, max_hot_threads: int) -> TieredCheckpointSaver:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    return TieredCheckpointSaver(SqliteSaver(conn), max_hot_threads=max_hot_threads)
+
+
+async def soak(name: str, checkpointer, threads: int, turns: int, samples: int):
+    graph = build_graph(checkpointer)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    series = []
+    started = time.perf_counter()
+    for thread in range(threads):
+        config = {"configurable": {"thread_id": f"soak-{thread}"}}
+        for turn in range(turns):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"turn {turn} for caller {thread}")]}, config=config)
+        if (thread + 1) % max(1, threads // samples) == 0:
+            series.append({"threads": thread + 1, "heap_kb": round((tracemalloc.get_traced_memory()[0] - baseline) / 1024, 1)})
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    return {
+        "checkpointer": name,
+        "threads": threads,
+        "turns_per_thread": turns,
+        "turns_per_sec": round(threads * turns / elapsed, 1),
+        "heap_growth": series,
+    }
+
+
+async def resume_on_other_worker(db_path: str) -> bool:
+    graph = build_graph(tiered(db_path, max_hot_threads=8))
+    state = await graph.aget_state({"configurable": {"thread_id": "soak-0"}})
+    return bool(state.values.get("messages"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--hot-threads", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "checkpoints.sqlite")
+        results = [
+            asyncio.run(soak("in_memory", InMemorySaver(), args.threads, args.turns, args.samples)),
+            asyncio.run(soak("tiered_sqlite", tiered(db_path, args.hot_threads), args.threads, args.turns, args.samples)),
+        ]
+        results.append({"resume_on_other_worker": asyncio.run(resume_on_other_worker(db_path))})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares the legacy per-chunk decode path (temp .webm -> ffmpeg subprocess -> .wav on disk)
+with the streaming AudioDecoder (one piped ffmpeg process per stream, no temp files).
+
+Reports chunks/sec and p50/p99 per-chunk decode latency for each path.
+
+    poetry run python -m benchmarks.decode_benchmark --chunks 200 --chunk-ms 250 --sessions 4
+
+Requires the ffmpeg binary on PATH (it is used to synthesize the Opus input as well).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import ffmpeg
+
+from app.voice_manager.audio_decoder import AudioDecoder
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def encode_webm(duration_s: float) -> bytes:
+    """Synthesize a WebM/Opus clip of a sine tone, the same container the browser sends."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration_s}",
+            "-c:a", "libopus", "-b:a", "32k", "-f", "webm", "pipe:1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return result.stdout
+
+
+def legacy_decode(audio_data: bytes) -> bytes:
+    # Mirrors the original voice_streamer code path, including the leaked .wav
+    with tempfile.NamedTemporaryFile(delete=True, suffix=".webm") as webm_file:
+        webm_path = webm_file.name
+        webm_file.write(audio_data)
+        webm_file.flush()
+        wav_path = webm_path.replace(".webm", ".wav")
+        ffmpeg.input(webm_path).output(wav_path, format="wav", acodec="pcm_s16le", ac=1, ar="16000").run(quiet=True, overwrite_output=True)
+        with open(wav_path, "rb") as wav_file:
+            data = wav_file.read()
+    os.remove(wav_path)
+    return data
+
+
+async def run_legacy_session(clips, latencies):
+    for clip in clips:
+        started = time.perf_counter()
+        # The original handler ran this synchronously on the event loop
+        legacy_decode(clip)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def run_streaming_session(stream_chunks, latencies):
+    waiting = []
+
+    async def on_frame(frame: bytes):
+        now = time.perf_counter()
+        while waiting:
+            latencies.append(now - waiting.pop())
+
+    decoder = AudioDecoder(on_frame=on_frame)
+    for chunk in stream_chunks:
+        waiting.append(time.perf_counter())
+        await decoder.feed(chunk)
+        await asyncio.sleep(0)
+    await decoder.flush()
+    # Chunks that only produced output at flush time
+    now = time.perf_counter()
+    while waiting:
+        latencies.append(now - waiting.pop())
+
+
+async def bench(name, session_fn, session_inputs, chunks_per_session):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(session_fn(inputs, latencies) for inputs in session_inputs))
+    elapsed = time.perf_counter() - started
+    total_chunks = chunks_per_session * len(session_inputs)
+    return {
+        "path": name,
+        "sessions": len(session_inputs),
+        "chunks": total_chunks,
+        "elapsed_s": round(elapsed, 4),
+        "chunks_per_sec": round(total_chunks / elapsed, 2),
+        "p50_latency_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_latency_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100, help="chunks per session")
+    parser.add_argument("--chunk-ms", type=int, default=250, help="audio duration per chunk")
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent sessions")
+    args = parser.parse_args()
+
+    # Legacy path: every chunk is a standalone WebM file
+    clip = encode_webm(args.chunk_ms / 1000)
+    legacy_inputs = [[clip] * args.chunks for _ in range(args.sessions)]
+
+    # Streaming path: one continuous WebM stream sliced like MediaRecorder timeslices
+    stream = encode_webm(args.chunks * args.chunk_ms / 1000)
+    slice_size = max(1, len(stream) // args.chunks)
+    stream_chunks = [stream[i:i + slice_size] for i in range(0, len(stream), slice_size)]
+    streaming_inputs = [stream_chunks for _ in range(args.sessions)]
+
+    results = [
+        asyncio.run(bench("legacy_tempfile_ffmpeg", run_legacy_session, legacy_inputs, args.chunks)),
+        asyncio.run(bench("streaming_decoder", run_streaming_session, streaming_inputs, len(stream_chunks))),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+End-to-end replay benchmark: drives `/ws/voice` of a real server process with recorded
+(or synthesized) caller audio while ramping the number of concurrent sessions.
+
+The server runs the production route, agent graph, turn pipeline and tools, with the
+external backends replaced by local deterministic fakes of configurable latency:
+
+  STT       app.fakes.speech.FakeSpeechClient (Google streaming recognizer)
+  LLM       app.fakes.llm.ScriptedChatModel (Gemini, with scripted tool calls)
+  Calendar  app.fakes.calendar.FakeCalendarService
+  TTS       app.utils.tts_engines.StubTtsEngine (ElevenLabs/Google TTS)
+
+Each session plays the conversation turn by turn: start_listening, the turn's audio at
+real-time pace (`--speed` to go faster), stop_listening, then waits for the end of the
+assistant's audio. A fresh server is started for every concurrency level and its CPU
+time and RSS (including decoder subprocesses) are sampled from /proc.
+
+Reports per level: time to first audio (stop_listening -> first TTS chunk), turn latency
+(stop_listening -> end of the reply audio) and final-transcript latency percentiles,
+CPU ms per session and per turn, RSS baseline/peak/per session, and the server's own
+per-stage means scraped from /metrics.
+
+A recorded conversation is a JSON file:
+  {"turns": [{"audio": "turn1.wav", "transcript": "...", "reply": "...",
+              "tool_calls": [{"name": "check_calendar_availability", "args": {...}}]}]}
+Audio paths are relative to the file; WAV (16 kHz mono LINEAR16) and WebM/Opus work.
+
+    poetry run python -m benchmarks.e2e_replay --sessions 1 4 16 --output e2e.json
+    poetry run python -m benchmarks.e2e_replay --conversation recordings/booking.json --llm-latency 0.6
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import wave
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 16000
+# Rough WebM/Opus byte rate, used to pace recorded WebM files
+WEBM_BYTES_PER_SECOND = 4000
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Conversations
+
+
+@dataclass
+class ReplayTurn:
+    transcript: str
+    chunks: List[bytes]
+    chunk_seconds: List[float]
+    reply: Optional[str] = None
+    tool_calls: List[Dict] = field(default_factory=list)
+
+
+def wav_bytes(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def slice_audio(data: bytes, chunk_ms: int):
+    """Slices a clip like MediaRecorder timeslices; returns the chunks and their durations."""
+    if data.startswith(b"RIFF"):
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            bytes_per_second = wav_file.getframerate() * wav_file.getnchannels() * wav_file.getsampwidth()
+        header, body = data[:44], data[44:]
+        size = max(2, bytes_per_second * chunk_ms // 1000 // 2 * 2)
+        chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        # The header travels with the first chunk so the decoder detects the format
+        chunks[0] = header + chunks[0]
+    else:
+        bytes_per_second = WEBM_BYTES_PER_SECOND
+        size = max(1, bytes_per_second * chunk_ms // 1000)
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    return chunks, [len(chunk) / bytes_per_second for chunk in chunks]
+
+
+def synth_turn_audio(seed: int, transcript: str) -> bytes:
+    # Speech-like signal (see vad_benchmark) sized to the transcript, so VAD treats it as speech
+    from benchmarks.vad_benchmark import synth_speech
+
+    rng = np.random.default_rng(seed)
+    speech = synth_speech(rng, max(1.0, 0.3 * len(transcript.split()))) * 0.3
+    signal = np.concatenate([np.zeros(int(0.3 * SAMPLE_RATE)), speech, np.zeros(int(0.2 * SAMPLE_RATE))])
+    signal += rng.normal(0, 0.002, len(signal))
+    return wav_bytes(np.clip(signal * 32767, -32768, 32767).astype("<i2").tobytes())
+
+
+def load_conversation(path: Optional[str], chunk_ms: int) -> List[ReplayTurn]:
+    if path is None:
+        from app.fakes.llm import appointment_script
+
+        turns = []
+        for index, scripted in enumerate(appointment_script()):
+            chunks, seconds = slice_audio(synth_turn_audio(index, scripted.transcript), chunk_ms)
+            turns.append(ReplayTurn(scripted.transcript, chunks, seconds, scripted.reply, scripted.tool_calls))
+        return turns
+    with open(path) as conversation_file:
+        spec = json.load(conversation_file)
+    base = os.path.dirname(os.path.abspath(path))
+    turns = []
+    for turn in spec["turns"]:
+        with open(os.path.join(base, turn["audio"]), "rb") as audio_file:
+            chunks, seconds = slice_audio(audio_file.read(), chunk_ms)
+        turns.append(ReplayTurn(turn["transcript"], chunks, seconds, turn.get("reply"), turn.get("tool_calls", [])))
+    return turns
+
+
+# Server side
+
+
+def install_fakes(args):
+    """Swaps every external backend for its local fake before the app starts serving."""
+    from app.agent_builder.calendar_service import set_calendar_service
+    from app.fakes.calendar import FakeCalendarService
+    from app.fakes.llm import ScriptedChatModel, ScriptedTurn, appointment_script
+    from app.fakes.speech import FakeSpeechClient
+    from app.utils.resources import resources
+    from app.utils.stt_engines import set_speech_client
+    from app.utils.tts_cache import get_tts_cache
+    from app.utils.tts_engines import StubTtsEngine, TtsRouter, set_tts_router
+
+    if args.conversation:
+        with open(args.conversation) as conversation_file:
+            spec = json.load(conversation_file)
+        script = [
+            ScriptedTurn(
+                transcript=turn["transcript"],
+                reply=turn.get("reply", "Thank you, I have noted that."),
+                tool_calls=turn.get("tool_calls", []),
+            )
+            for turn in spec["turns"]
+        ]
+    else:
+        script = appointment_script()
+
+    set_speech_client(FakeSpeechClient([turn.transcript for turn in script], latency=args.stt_latency))
+    resources.set("chat_model", ScriptedChatModel(
+        turns=script, first_token_latency=args.llm_latency, token_latency=args.llm_token_latency,
+    ))
+    set_calendar_service(FakeCalendarService(latency=args.calendar_latency))
+    engine = StubTtsEngine(first_byte_latency=args.tts_latency, chunk_latency=args.tts_chunk_latency)
+    set_tts_router(TtsRouter([engine], cache=get_tts_cache() if args.tts_cache else None))
+
+
+def serve(args):
+    import uvicorn
+
+    install_fakes(args)
+    from app.server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def server_env(args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("STT_ENGINE", "google")
+    env.setdefault("TTS_ENGINES", "stub")
+    env["TTS_CACHE_ENABLED"] = "true" if args.tts_cache else "false"
+    env.setdefault("TTS_CACHE_PREWARM", "false")
+    return env
+
+
+def server_command(args, port: int) -> List[str]:
+    command = [
+        sys.executable, "-m", "benchmarks.e2e_replay", "serve", "--port", str(port),
+        "--stt-latency", str(args.stt_latency),
+        "--llm-latency", str(args.llm_latency),
+        "--llm-token-latency", str(args.llm_token_latency),
+        "--calendar-latency", str(args.calendar_latency),
+        "--tts-latency", str(args.tts_latency),
+        "--tts-chunk-latency", str(args.tts_chunk_latency),
+    ]
+    if args.conversation:
+        command += ["--conversation", args.conversation]
+    if args.tts_cache:
+        command.append("--tts-cache")
+    return command
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as children_file:
+                for child in children_file.read().split():
+                    pids.extend(process_tree(int(child)))
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return pids
+
+
+def sample_process(pid: int):
+    """CPU seconds and RSS in MB of the server and its children (e.g. ffmpeg decoders)."""
+    cpu_ticks = 0
+    rss_pages = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/stat") as stat_file:
+                # Fields after the command name, which may contain spaces
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{member}/statm") as statm_file:
+                rss_pages += int(statm_file.read().split()[1])
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        cpu_ticks += int(fields[11]) + int(fields[12])
+    return cpu_ticks / CLOCK_TICKS, rss_pages * PAGE_KB / 1024
+
+
+def http_get(url: str, timeout: float = 5.0) -> str:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with code {process.returncode}")
+        try:
+            await asyncio.to_thread(http_get, f"{base_url}/health", 1.0)
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError("Benchmark server did not become ready")
+
+
+def stage_means(metrics_text: str) -> Dict[str, float]:
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        match = re.match(r'voice_stage_latency_ms_(sum|count)\{(.*)\} (\S+)$', line)
+        if not match:
+            continue
+        target = sums if match.group(1) == "sum" else counts
+        target[match.group(2)] = float(match.group(3))
+    means = {}
+    for labels, count in counts.items():
+        if count:
+            name = ":".join(value for _, value in re.findall(r'(\w+)="([^"]*)"', labels))
+            means[name] = round(sums.get(labels, 0.0) / count, 1)
+    return dict(sorted(means.items()))
+
+
+# Client side
+
+
+@dataclass
+class TurnResult:
+    ttfa_ms: Optional[float] = None
+    turn_ms: Optional[float] = None
+    transcript_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+def classify(message):
+    """Maps a server message to (event_type, is_audio, ends_reply)."""
+    if isinstance(message, bytes):
+        from app.voice_manager.audio_output import unpack_frame
+
+        _, _, end_of_utterance, _ = unpack_frame(message)
+        return "audio_frame", True, end_of_utterance
+    event_type = json.loads(message).get("event_type")
+    return event_type, event_type == "audio_response", event_type == "final_audio_response"
+
+
+async def run_session(url: str, turns: List[ReplayTurn], args, results: List[TurnResult]):
+    async with websockets.connect(url, max_size=None) as ws:
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def reader():
+            async for message in ws:
+                events.put_nowait((time.perf_counter(), message))
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            if args.binary:
+                await ws.send(json.dumps({"event_type": "audio_output_mode", "mode": "binary"}))
+            for _ in range(args.repeat):
+                for turn in turns:
+                    results.append(await run_turn(ws, events, turn, args))
+                    await asyncio.sleep(args.think_time)
+        finally:
+            reader_task.cancel()
+
+
+async def run_turn(ws, events: asyncio.Queue, turn: ReplayTurn, args) -> TurnResult:
+    result = TurnResult()
+    while not events.empty():
+        events.get_nowait()
+    await ws.send(json.dumps({"event_type": "start_listening"}))
+    for chunk, seconds in zip(turn.chunks, turn.chunk_seconds):
+        await ws.send(chunk)
+        await asyncio.sleep(seconds / args.speed)
+    stopped = time.perf_counter()
+    await ws.send(json.dumps({"event_type": "stop_listening"}))
+    deadline = stopped + args.turn_timeout
+    try:
+        while True:
+            received_at, message = await asyncio.wait_for(events.get(), timeout=max(0.0, deadline - time.perf_counter()))
+            event_type, is_audio, ends_reply = classify(message)
+            elapsed_ms = round((received_at - stopped) * 1000, 1)
+            if event_type == "final_transcript" and result.transcript_ms is None:
+                result.transcript_ms = elapsed_ms
+            elif event_type == "error":
+                result.error = "server_error"
+                return result
+            if is_audio and result.ttfa_ms is None:
+                result.ttfa_ms = elapsed_ms
+            if ends_reply:
+                result.turn_ms = elapsed_ms
+                return result
+    except asyncio.TimeoutError:
+        result.error = "timeout"
+        return result
+
+
+async def run_level(args, sessions: int, turns: List[ReplayTurn]):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(server_command(args, port), env=server_env(args), stdout=subprocess.DEVNULL)
+    try:
+        await wait_ready(base_url, process)
+        cpu_before, rss_baseline = sample_process(process.pid)
+        rss_peak = rss_baseline
+        sampling = True
+
+        async def sample_rss():
+            nonlocal rss_peak
+            while sampling:
+                rss_peak = max(rss_peak, sample_process(process.pid)[1])
+                await asyncio.sleep(0.05)
+
+        sampler = asyncio.create_task(sample_rss())
+        results: List[TurnResult] = []
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(run_session(f"ws://127.0.0.1:{port}/ws/voice", turns, args, results) for _ in range(sessions)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        sampling = False
+        await sampler
+        cpu_after, rss_end = sample_process(process.pid)
+        server_stages = stage_means(await asyncio.to_thread(http_get, f"{base_url}/metrics"))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    completed = [result for result in results if result.error is None]
+    ttfa = [result.ttfa_ms for result in completed if result.ttfa_ms is not None]
+    turn_ms = [result.turn_ms for result in completed]
+    transcript_ms = [result.transcript_ms for result in completed if result.transcript_ms is not None]
+    cpu_s = cpu_after - cpu_before
+    return {
+        "sessions": sessions,
+        "turns": len(results),
+        "completed_turns": len(completed),
+        "timeouts": sum(result.error == "timeout" for result in results),
+        "server_errors": sum(result.error == "server_error" for result in results),
+        "failed_sessions": sum(isinstance(outcome, BaseException) for outcome in outcomes),
+        "elapsed_s": round(elapsed, 3),
+        "ttfa_ms_p50": percentile(ttfa, 50),
+        "ttfa_ms_p95": percentile(ttfa, 95),
+        "ttfa_ms_p99": percentile(ttfa, 99),
+        "turn_ms_p50": percentile(turn_ms, 50),
+        "turn_ms_p95": percentile(turn_ms, 95),
+        "turn_ms_p99": percentile(turn_ms, 99),
+        "final_transcript_ms_p50": percentile(transcript_ms, 50),
+        "cpu_s": round(cpu_s, 3),
+        "cpu_ms_per_session": round(cpu_s * 1000 / sessions, 1),
+        "cpu_ms_per_turn": round(cpu_s * 1000 / max(1, len(results)), 1),
+        "rss_baseline_mb": round(rss_baseline, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_mb_per_session": round((rss_peak - rss_baseline) / sessions, 2),
+        "server_stage_mean_ms": server_stages,
+    }
+
+
+async def main_async(args):
+    turns = load_conversation(args.conversation, args.chunk_ms)
+    return [await run_level(args, sessions, turns) for sessions in args.sessions]
+
+
+def add_backend_args(parser):
+    parser.add_argument("--conversation", help="recorded conversation JSON (default: synthesized booking call)")
+    parser.add_argument("--stt-latency", type=float, default=0.05, help="seconds per fake STT result")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds to the first token of each model call")
+    parser.add_argument("--llm-token-latency", type=float, default=0.01, help="seconds per streamed word")
+    parser.add_argument("--calendar-latency", type=float, default=0.1, help="seconds per Calendar API call")
+    parser.add_argument("--tts-latency", type=float, default=0.15, help="seconds to the first TTS byte")
+    parser.add_argument("--tts-chunk-latency", type=float, default=0.01, help="seconds per TTS chunk")
+    parser.add_argument("--tts-cache", action="store_true", help="enable the TTS audio cache")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        parser = argparse.ArgumentParser(description="Benchmark server with fake backends")
+        parser.add_argument("--port", type=int, required=True)
+        add_backend_args(parser)
+        serve(parser.parse_args(sys.argv[2:]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="concurrency levels to ramp through")
+    parser.add_argument("--repeat", type=int, default=1, help="times each session replays the conversation")
+    parser.add_argument("--chunk-ms", type=int, default=250, help="audio per WebSocket message")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio send rate relative to real time")
+    parser.add_argument("--think-time", type=float, default=0.5, help="caller pause between turns, seconds")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--binary", action="store_true", help="negotiate binary TTS frames instead of JSON/base64")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    add_backend_args(parser)
+    args = parser.parse_args()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": asyncio.run(main_async(args)),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Load test for the voice turn pipeline with stubbed backends.
+
+Simulates N concurrent sessions, each running turns of STT -> LLM -> TTS against
+deterministic stubs whose SDKs block the calling thread (like the sync Gemini and
+ElevenLabs clients). Two modes are compared:
+
+  inline     - blocking calls made directly on the event loop (the original handler)
+  scheduled  - the same calls routed through SessionScheduler stages
+
+For each mode it reports turn latency percentiles and event-loop lag, which is what
+every other WebSocket on the worker experiences while a turn is running.
+
+    poetry run python -m benchmarks.load_test --sessions 1 8 32 --turns 5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.voice_manager.session_scheduler import SessionScheduler
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StubBackends:
+    def __init__(self, stt_latency: float, llm_latency: float, tts_chunks: int, tts_chunk_latency: float):
+        self.stt_latency = stt_latency
+        self.llm_latency = llm_latency
+        self.tts_chunks = tts_chunks
+        self.tts_chunk_latency = tts_chunk_latency
+
+    def transcribe(self):
+        time.sleep(self.stt_latency)
+        return "I would like to book an appointment on Monday"
+
+    def generate(self, transcript: str):
+        time.sleep(self.llm_latency)
+        return "Sure, let me check that for you."
+
+    def synthesize(self, text: str):
+        for _ in range(self.tts_chunks):
+            time.sleep(self.tts_chunk_latency)
+            yield b"\x00" * 1024
+
+
+async def inline_turn(backends: StubBackends, scheduler: SessionScheduler):
+    transcript = backends.transcribe()
+    text = backends.generate(transcript)
+    for chunk in backends.synthesize(text):
+        await asyncio.sleep(0)  # websocket.send_json
+
+
+async def scheduled_turn(backends: StubBackends, scheduler: SessionScheduler):
+    transcript = await scheduler.run_blocking("stt", backends.transcribe)
+    text = await scheduler.run_blocking("llm", backends.generate, transcript)
+    async for chunk in scheduler.iterate_blocking("tts", lambda: backends.synthesize(text)):
+        await asyncio.sleep(0)  # websocket.send_json
+
+
+async def run_mode(mode: str, sessions: int, turns: int, backends: StubBackends):
+    scheduler = SessionScheduler()
+    turn_fn = inline_turn if mode == "inline" else scheduled_turn
+    latencies = []
+    loop_lag = []
+    stop = asyncio.Event()
+
+    async def heartbeat(interval: float = 0.01):
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            loop_lag.append(time.perf_counter() - started - interval)
+
+    async def session():
+        for _ in range(turns):
+            started = time.perf_counter()
+            await turn_fn(backends, scheduler)
+            latencies.append(time.perf_counter() - started)
+
+    monitor = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    scheduler.shutdown()
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "turns": sessions * turns,
+        "elapsed_s": round(elapsed, 3),
+        "turn_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "turn_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "loop_lag_p99_ms": round(percentile(loop_lag, 99) * 1000, 1),
+        "loop_lag_max_ms": round(max(loop_lag, default=0.0) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--stt-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-chunks", type=int, default=10)
+    parser.add_argument("--tts-chunk-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    backends = StubBackends(args.stt_latency, args.llm_latency, args.tts_chunks, args.tts_chunk_latency)
+    results = []
+    for sessions in args.sessions:
+        for mode in ("inline", "scheduled"):
+            results.append(asyncio.run(run_mode(mode, sessions, args.turns, backends)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Worker startup time and memory.
+
+import   - a fresh interpreter imports `app.server` (what every worker pays before it can
+           accept a connection), then optionally runs the lifespan warm-up of the resource
+           registry; reports wall time, RSS and module count after each step, and the state
+           and load time of every resource (missing credentials show up as failed, they do
+           not crash the import).
+servers  - starts N workers either as a pre-fork server (`WEB_WORKERS=N python -m app.server`,
+           modules imported once before the fork) or as N independent processes, waits
+           until /health leaves the "starting" state, and reports time to listening, time to
+           warm, and total RSS and PSS of the workers. PSS splits shared pages between the
+           processes that map them, so it shows what forking saves.
+
+    poetry run python -m benchmarks.startup_benchmark --warm
+    poetry run python -m benchmarks.startup_benchmark --workers 4
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+IMPORT_PROBE = """
+import asyncio, json, sys, time
+
+def rss_mb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * {page_kb} / 1024
+
+report = {{"baseline_rss_mb": round(rss_mb(), 1), "baseline_modules": len(sys.modules)}}
+started = time.perf_counter()
+import app.server
+report["import_s"] = round(time.perf_counter() - started, 3)
+report["import_rss_mb"] = round(rss_mb(), 1)
+report["import_modules"] = len(sys.modules)
+if {warm}:
+    from app.utils.resources import resources
+    started = time.perf_counter()
+    asyncio.run(resources.warm_up())
+    report["warm_s"] = round(time.perf_counter() - started, 3)
+    report["warm_rss_mb"] = round(rss_mb(), 1)
+    report["resources"] = resources.status()["resources"]
+print(json.dumps(report))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(warm: bool):
+    probe = IMPORT_PROBE.format(page_kb=PAGE_KB, warm=warm)
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def children(pid: int):
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as children_file:
+                pids.extend(int(child) for child in children_file.read().split())
+    except FileNotFoundError:
+        pass
+    return pids
+
+
+def memory_mb(pid: int):
+    """RSS and PSS of one process, in MB."""
+    rss_kb = pss_kb = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                if line.startswith("Rss:"):
+                    rss_kb = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss_kb = int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return rss_kb / 1024, pss_kb / 1024
+
+
+def health_status(port: int):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+            return json.loads(response.read())["status"]
+    except urllib.error.HTTPError as e:
+        # 503 while starting or degraded still means the worker is listening
+        return json.loads(e.read())["status"]
+    except OSError:
+        return None
+
+
+def wait_until(condition, timeout: float, interval: float = 0.05):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(interval)
+    raise TimeoutError("Server did not start in time")
+
+
+def start_workers(mode: str, workers: int):
+    """Returns (processes to stop, worker pids getter, ports to poll)."""
+    env = dict(os.environ, HOST="127.0.0.1")
+    if mode == "prefork":
+        port = free_port()
+        parent = subprocess.Popen(
+            [sys.executable, "-m", "app.server"],
+            env=dict(env, PORT=str(port), WEB_WORKERS=str(workers)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        return [parent], lambda: children(parent.pid), [port]
+    ports = [free_port() for _ in range(workers)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "app.server"],
+            env=dict(env, PORT=str(port), WEB_WORKERS="1"),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    return processes, lambda: [process.pid for process in processes], ports
+
+
+def measure_servers(mode: str, workers: int, timeout: float, settle: float):
+    started = time.perf_counter()
+    processes, worker_pids, ports = start_workers(mode, workers)
+    try:
+        wait_until(lambda: all(health_status(port) is not None for port in ports), timeout)
+        listening_s = time.perf_counter() - started
+        # Every worker finishes its own warm-up; poll until the ones answering are done
+        wait_until(lambda: all(health_status(port) not in (None, "starting") for port in ports), timeout)
+        warm_s = time.perf_counter() - started
+        wait_until(lambda: len(worker_pids()) >= workers, timeout)
+        time.sleep(settle)
+        statuses = sorted({health_status(port) for port in ports})
+        pids = worker_pids()
+        usage = [memory_mb(pid) for pid in pids]
+        parent_usage = memory_mb(processes[0].pid) if mode == "prefork" else (0.0, 0.0)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return {
+        "mode": mode,
+        "workers": len(pids),
+        "status": statuses,
+        "listening_s": round(listening_s, 3),
+        "warm_s": round(warm_s, 3),
+        "worker_rss_mb_total": round(sum(rss for rss, _ in usage), 1),
+        "worker_pss_mb_total": round(sum(pss for _, pss in usage), 1),
+        "parent_pss_mb": round(parent_usage[1], 1),
+        "pss_mb_per_worker": round(sum(pss for _, pss in usage) / max(1, len(usage)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warm", action="store_true", help="also run the resource warm-up after the import")
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="worker counts to start as servers")
+    parser.add_argument("--modes", nargs="+", default=["prefork", "independent"], choices=["prefork", "independent"])
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait before sampling memory")
+    args = parser.parse_args()
+
+    report = {"import": measure_import(args.warm), "servers": []}
+    for workers in args.workers:
+        for mode in args.modes:
+            report["servers"].append(measure_servers(mode, workers, args.timeout, args.settle))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
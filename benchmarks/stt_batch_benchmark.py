@@ -0,0 +1,140 @@
+"""
+Real-time factor and throughput of the local Whisper STT engine against session count,
+with and without micro-batching.
+
+Each simulated session speaks `--utterances` utterances of `--utterance-seconds` through
+WhisperEngine (AudioStreamManager -> MicroBatcher -> batched decode), pausing
+`--pause-seconds` between them. Reported per session count and mode:
+
+  rtf                 inference wall time / seconds of audio transcribed
+  audio_s_per_s       seconds of audio transcribed per wall-clock second (throughput)
+  latency_ms p50/p95  end of utterance -> final transcript
+  mean_batch_size
+
+With openai-whisper installed the real model is used (`--model tiny|base|turbo`).
+Otherwise, or with `--simulate`, inference is replaced by a cost model of a batched
+decoder: `--fixed-ms` per call plus `--per-item-ms` per clip.
+
+    poetry run python -m benchmarks.stt_batch_benchmark --sessions 1 4 16 --model tiny
+    poetry run python -m benchmarks.stt_batch_benchmark --sessions 1 4 16 --simulate
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import time
+
+import numpy as np
+
+from app.voice_manager.audio_decoder import FRAME_BYTES, SAMPLE_RATE
+from app.voice_manager.audio_stream_manager import AudioStreamManager
+from app.utils.stt_engines import MicroBatcher, WhisperEngine, get_whisper_model, whisper_transcribe_batch
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class TimedBackend:
+    def __init__(self, transcribe_batch):
+        self.transcribe_batch = transcribe_batch
+        self.busy_s = 0.0
+
+    def __call__(self, clips):
+        started = time.perf_counter()
+        try:
+            return self.transcribe_batch(clips)
+        finally:
+            self.busy_s += time.perf_counter() - started
+
+
+def simulated_backend(fixed_ms: float, per_item_ms: float):
+    def transcribe_batch(clips):
+        time.sleep((fixed_ms + per_item_ms * len(clips)) / 1000)
+        return ["i would like to book an appointment"] * len(clips)
+    return transcribe_batch
+
+
+def utterance_pcm(seconds: float) -> bytes:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.2 * np.sin(2 * np.pi * 180 * t) * np.clip(np.sin(np.pi * 4 * t) ** 2, 0.05, 1)
+    return (tone * 32767).astype("<i2").tobytes()
+
+
+async def run(sessions: int, max_batch: int, args, backend: TimedBackend):
+    batcher = MicroBatcher(backend, max_batch=max_batch, max_wait_ms=args.max_wait_ms)
+    engine = WhisperEngine(batcher)
+    pcm = utterance_pcm(args.utterance_seconds)
+    frames = [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)]
+    latencies = []
+
+    async def emit(transcript, is_final):
+        pass
+
+    async def session(index: int):
+        # Stagger session starts across one pause so utterance ends do not all align
+        await asyncio.sleep(args.pause_seconds * index / max(1, sessions))
+        for _ in range(args.utterances):
+            manager = AudioStreamManager(None)
+            for frame in frames[1:]:
+                await manager.add_audio_chunk(frame)
+            await manager.stop_streaming()
+            ended = time.perf_counter()
+            await engine.recognize(frames[0], manager, emit)
+            latencies.append((time.perf_counter() - ended) * 1000)
+            await asyncio.sleep(args.pause_seconds)
+
+    backend.busy_s = 0.0
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    wall_s = time.perf_counter() - started
+    audio_s = sessions * args.utterances * args.utterance_seconds
+    return {
+        "sessions": sessions,
+        "mode": "batched" if max_batch > 1 else "unbatched",
+        "max_batch": max_batch,
+        "rtf": round(backend.busy_s / audio_s, 4),
+        "audio_s_per_s": round(audio_s / wall_s, 2),
+        "latency_ms_p50": round(percentile(latencies, 50), 1),
+        "latency_ms_p95": round(percentile(latencies, 95), 1),
+        "mean_batch_size": batcher.stats()["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--utterances", type=int, default=4)
+    parser.add_argument("--utterance-seconds", type=float, default=3.0)
+    parser.add_argument("--pause-seconds", type=float, default=1.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--simulate", action="store_true", help="use the batched-decoder cost model")
+    parser.add_argument("--fixed-ms", type=float, default=120, help="simulated cost per inference call")
+    parser.add_argument("--per-item-ms", type=float, default=40, help="simulated cost per clip in a batch")
+    args = parser.parse_args()
+
+    if args.simulate or importlib.util.find_spec("whisper") is None:
+        backend = TimedBackend(simulated_backend(args.fixed_ms, args.per_item_ms))
+        engine_name = "simulated"
+    else:
+        model = get_whisper_model(args.model)
+        backend = TimedBackend(lambda clips: whisper_transcribe_batch(clips, model=model))
+        engine_name = f"whisper-{args.model}"
+
+    results = []
+    for sessions in args.sessions:
+        for max_batch in (1, args.max_batch):
+            result = asyncio.run(run(sessions, max_batch, args, backend))
+            result["engine"] = engine_name
+            results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
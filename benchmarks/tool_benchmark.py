@@ -0,0 +1,163 @@
+"""
+Tool-step latency of the agent graph with a stale free/busy index.
+
+Runs the real LangGraph agent (ScriptedChatModel, fake Calendar with a per-call delay)
+for a turn that needs three independent lookups: availability at two times on "next
+Tuesday" plus get_current_year. Before every turn the busy index is invalidated, as it
+is when a call comes in more than BUSY_INDEX_REFRESH_SECONDS after the previous one.
+
+  serial            - one tool call per model step, no prefetch (a strictly sequential loop)
+  parallel          - all three calls in one model step, run concurrently, no prefetch
+  parallel+prefetch - as parallel, with the speculative calendar prefetch started from the
+                      transcript while the model is thinking
+
+Reports turn latency, time spent in the tools step (first tool start to last tool end)
+and Calendar API requests per turn.
+
+    poetry run python -m benchmarks.tool_benchmark --sessions 1 8 --turns 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import date, timedelta
+
+# Keep the benchmark off the checkpoint file; must be set before the agent is imported
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+
+import ulid
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.agent_builder import agent
+from app.agent_builder.busy_index import get_busy_index
+from app.agent_builder.calendar_service import set_calendar_service
+from app.agent_builder.trace_callbacks import GraphTraceHandler
+from app.fakes.calendar import FakeCalendarService
+from app.fakes.llm import ScriptedChatModel, ScriptedTurn
+from app.utils.metrics import TurnTrace
+from app.utils.resources import resources
+
+MODES = ["serial", "parallel", "parallel+prefetch"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def next_tuesday(today: date) -> date:
+    return today + timedelta(days=(1 - today.weekday()) % 7 or 7)
+
+
+def script(parallel: bool) -> ScriptedTurn:
+    day = next_tuesday(date.today()).isoformat()
+    calls = [
+        {"name": "check_calendar_availability", "args": {"date_and_time": f"{day}T10:00:00"}},
+        {"name": "check_calendar_availability", "args": {"date_and_time": f"{day}T14:00:00"}},
+        {"name": "get_current_year", "args": {}},
+    ]
+    return ScriptedTurn(
+        transcript="Can I come in next Tuesday at ten or else at two",
+        tool_calls=[calls] if parallel else calls,
+        reply="Both ten and two are open next Tuesday. Which would you prefer?",
+    )
+
+
+def seed_calendar(calendar: FakeCalendarService, days: int = 30):
+    # A busy but not full calendar: a few one-hour blocks on every working day
+    today = date.today()
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for hour in (9, 11, 15):
+            calendar.add_event({
+                "summary": "Booked",
+                "start": {"dateTime": f"{day.isoformat()}T{hour:02d}:00:00", "timeZone": calendar.time_zone},
+                "end": {"dateTime": f"{day.isoformat()}T{hour + 1:02d}:00:00", "timeZone": calendar.time_zone},
+            })
+
+
+async def run_turn(graph, turn: ScriptedTurn):
+    trace = TurnTrace(session_id="benchmark")
+    started = time.perf_counter()
+    await graph.ainvoke(
+        {"messages": [HumanMessage(content=turn.transcript)]},
+        config={"configurable": {"thread_id": ulid.new().str}, "callbacks": [GraphTraceHandler(trace)]},
+    )
+    turn_ms = (time.perf_counter() - started) * 1000
+    tools = [span for span in trace.spans if span.name == "tool"]
+    tools_ms = (
+        max(span.start_ms + span.duration_ms for span in tools) - min(span.start_ms for span in tools)
+        if tools else 0.0
+    )
+    return turn_ms, tools_ms
+
+
+async def run_mode(mode: str, sessions: int, calendar: FakeCalendarService, args):
+    turn = script(parallel=mode != "serial")
+    resources.set("chat_model", ScriptedChatModel(
+        turns=[turn], first_token_latency=args.llm_latency, token_latency=args.llm_token_latency,
+    ))
+    agent.prompt_registry.set_llm(resources.get("chat_model"))
+    agent.calendar_prefetcher.enabled = mode.endswith("+prefetch")
+    graph = agent.graph_builder.compile(checkpointer=InMemorySaver())
+    index = get_busy_index(agent.CALENDAR_ID)
+
+    # Full sync and time zone lookup happen once per process; warm them outside the measurement
+    await run_turn(graph, turn)
+    turn_samples, tool_samples = [], []
+    requests_before = calendar.requests
+
+    async def session():
+        for _ in range(args.turns):
+            index.invalidate()
+            turn_ms, tools_ms = await run_turn(graph, turn)
+            turn_samples.append(turn_ms)
+            tool_samples.append(tools_ms)
+
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    turns = sessions * args.turns
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "turns": turns,
+        "turn_ms_p50": round(percentile(turn_samples, 50), 1),
+        "turn_ms_p95": round(percentile(turn_samples, 95), 1),
+        "tools_ms_p50": round(percentile(tool_samples, 50), 1),
+        "tools_ms_p95": round(percentile(tool_samples, 95), 1),
+        "calendar_requests_per_turn": round((calendar.requests - requests_before) / turns, 2),
+    }
+
+
+async def main_async(args):
+    # One calendar for every mode: the busy index keeps its sync token across them
+    calendar = FakeCalendarService(latency=args.calendar_latency)
+    seed_calendar(calendar)
+    set_calendar_service(calendar)
+    results = []
+    for sessions in args.sessions:
+        for mode in args.modes:
+            results.append(await run_mode(mode, sessions, calendar, args))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--turns", type=int, default=10, help="turns per session")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--calendar-latency", type=float, default=0.15, help="seconds per Calendar API call")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds to the first token of each model call")
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
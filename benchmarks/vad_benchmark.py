@@ -0,0 +1,175 @@
+"""
+Accuracy and latency of the server-side VAD stage (AudioStreamManager + EnergyVad).
+
+Fixtures are labelled LINEAR16 recordings: by default a deterministic set is synthesized
+(voiced harmonics with syllable envelopes and fricative bursts, separated by pauses, over
+white or babble-like noise at several SNRs). Real recordings can be passed with --wav; each
+`name.wav` (16 kHz mono s16le) needs a `name.json` next to it: {"speech": [[start_s, end_s], ...]}.
+
+Reports per fixture: frame accuracy, speech recall, false-alarm rate, the share of input
+bytes that still reaches STT, endpoint latency after the true end of speech, and CPU per
+frame.
+
+    poetry run python -m benchmarks.vad_benchmark --hangover-ms 800
+    poetry run python -m benchmarks.vad_benchmark --wav recordings/*.wav
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import wave
+
+import numpy as np
+
+from app.voice_manager.audio_decoder import FRAME_BYTES, FRAME_MS, SAMPLE_RATE
+from app.voice_manager.audio_stream_manager import AudioStreamManager
+from app.voice_manager.vad import EnergyVad
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def synth_speech(rng, seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    # ~4 syllables per second with short dips between them
+    envelope = np.clip(np.sin(np.pi * rng.uniform(3, 5) * t) ** 2, 0.05, 1.0)
+    signal = voiced * envelope
+    for _ in range(int(seconds * 1.5)):
+        # Fricatives: short bursts of high-passed noise
+        start = rng.integers(0, max(1, len(t) - 1600))
+        burst = np.diff(rng.normal(0, 1, 1601)) * 0.6
+        signal[start:start + 1600] += burst[: len(signal[start:start + 1600])]
+    return signal / np.max(np.abs(signal))
+
+
+def synth_noise(rng, samples: int, kind: str) -> np.ndarray:
+    if kind == "white":
+        return rng.normal(0, 1, samples)
+    # Babble-like: low-passed noise with a slow level wobble
+    noise = np.convolve(rng.normal(0, 1, samples), np.ones(8) / 8, mode="same")
+    wobble = 1 + 0.3 * np.sin(2 * np.pi * 0.3 * np.arange(samples) / SAMPLE_RATE)
+    return noise * wobble
+
+
+def synth_fixture(seed: int, snr_db: float, noise_kind: str, utterances: int = 6):
+    rng = np.random.default_rng(seed)
+    pieces, segments, cursor = [], [], 0.0
+    for _ in range(utterances):
+        pause = rng.uniform(1.0, 2.5)
+        speech = rng.uniform(1.0, 3.0)
+        pieces.append(np.zeros(int(pause * SAMPLE_RATE)))
+        pieces.append(synth_speech(rng, speech) * 0.3)
+        segments.append((cursor + pause, cursor + pause + speech))
+        cursor += pause + speech
+    pieces.append(np.zeros(int(2.0 * SAMPLE_RATE)))
+    clean = np.concatenate(pieces)
+    noise = synth_noise(rng, len(clean), noise_kind)
+    speech_power = np.mean(np.concatenate([clean[int(a * SAMPLE_RATE):int(b * SAMPLE_RATE)] for a, b in segments]) ** 2)
+    noise *= np.sqrt(speech_power / (10 ** (snr_db / 10)) / np.mean(noise ** 2))
+    pcm = np.clip((clean + noise) * 32767, -32768, 32767).astype("<i2").tobytes()
+    return f"synthetic_{noise_kind}_snr{snr_db:g}", pcm, segments
+
+
+def load_wav_fixture(path: str):
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono LINEAR16")
+        pcm = wav_file.readframes(wav_file.getnframes())
+    with open(os.path.splitext(path)[0] + ".json") as labels_file:
+        segments = [tuple(segment) for segment in json.load(labels_file)["speech"]]
+    return os.path.basename(path), pcm, segments
+
+
+def frame_labels(segments, frame_count: int):
+    labels = np.zeros(frame_count, dtype=bool)
+    for start, end in segments:
+        first = int(start * 1000 // FRAME_MS)
+        last = int(np.ceil(end * 1000 / FRAME_MS))
+        labels[first:last] = True
+    return labels
+
+
+async def run_fixture(name, pcm, segments, hangover_ms: int):
+    frames = [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)]
+    labels = frame_labels(segments, len(frames))
+    vad = EnergyVad(hangover_ms=hangover_ms)
+    endpoint_frames = []
+    current = 0
+
+    async def on_endpoint():
+        endpoint_frames.append(current)
+
+    # Nothing consumes the queue here, so it must hold the whole fixture
+    manager = AudioStreamManager(None, vad=vad, on_endpoint=on_endpoint, queue_bytes=len(pcm))
+    decisions = np.zeros(len(frames), dtype=bool)
+    forwarded = np.zeros(len(frames), dtype=bool)
+    started_cpu = time.process_time()
+    for current, frame in enumerate(frames):
+        before = manager.vad_stats.frames_forwarded
+        await manager.add_audio_chunk(frame)
+        forwarded[current] = manager.vad_stats.frames_forwarded > before
+        decisions[current] = vad.in_speech and vad.silence_ms == 0
+    cpu_s = time.process_time() - started_cpu
+
+    latencies = []
+    missed = 0
+    for _, end in segments:
+        end_frame = int(np.ceil(end * 1000 / FRAME_MS))
+        after = [index for index in endpoint_frames if index >= end_frame - 1]
+        if not after:
+            missed += 1
+            continue
+        # Endpoint fires at the end of its frame
+        latencies.append((after[0] + 1) * FRAME_MS - end * 1000)
+
+    stats = manager.vad_stats
+    speech_frames = max(1, int(labels.sum()))
+    silence_frames = max(1, int((~labels).sum()))
+    return {
+        "fixture": name,
+        "frames": len(frames),
+        "frame_accuracy": round(float(np.mean(decisions == labels)), 4),
+        "speech_recall": round(float(np.sum(forwarded & labels) / speech_frames), 4),
+        "false_alarm_rate": round(float(np.sum(decisions & ~labels) / silence_frames), 4),
+        "stt_bytes_pct": round(stats.bytes_forwarded / max(1, stats.bytes_in) * 100, 1),
+        "utterances": len(segments),
+        "endpoints": stats.endpoints,
+        "missed_endpoints": missed,
+        "endpoint_latency_ms_p50": round(percentile(latencies, 50), 1),
+        "endpoint_latency_ms_p95": round(percentile(latencies, 95), 1),
+        "cpu_us_per_frame": round(cpu_s / max(1, len(frames)) * 1e6, 1),
+    }
+
+
+async def main_async(args):
+    if args.wav:
+        fixtures = [load_wav_fixture(path) for path in args.wav]
+    else:
+        fixtures = [
+            synth_fixture(seed, snr, kind)
+            for seed, (kind, snr) in enumerate(
+                (kind, snr) for kind in ("white", "babble") for snr in (30, 20, 10)
+            )
+        ]
+    return [await run_fixture(name, pcm, segments, args.hangover_ms) for name, pcm, segments in fixtures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hangover-ms", type=int, default=800)
+    parser.add_argument("--wav", nargs="*", help="labelled 16 kHz mono WAV fixtures instead of synthetic ones")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from collections import Counter
+
+import pytest
+
+from app.utils.affinity import HashRing
+from app.utils.session_store import MemorySessionStore
+from app.voice_manager.session_state import SessionStateStore
+
+NODES = ["ws://10.0.0.1:8000", "ws://10.0.0.2:8000", "ws://10.0.0.3:8000"]
+KEYS = [f"thread-{number}" for number in range(3000)]
+
+
+def owners(ring):
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+def test_keys_spread_evenly_and_deterministically():
+    ring = HashRing(NODES)
+
+    counts = Counter(owners(ring).values())
+
+    assert set(counts) == set(NODES)
+    assert all(0.25 < count / len(KEYS) < 0.42 for count in counts.values())
+    # Stable across instances (and so across processes and hosts)
+    assert owners(HashRing(reversed(NODES))) == owners(ring)
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(NODES)
+    before = owners(ring)
+
+    ring.add("ws://10.0.0.4:8000")
+    after = owners(ring)
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "ws://10.0.0.4:8000" for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+
+    ring.remove(NODES[1])
+    after = owners(ring)
+
+    assert NODES[1] not in ring.nodes
+    for key in KEYS:
+        if before[key] == NODES[1]:
+            assert after[key] in (NODES[0], NODES[2])
+        else:
+            assert after[key] == before[key]
+
+
+def test_empty_ring_owns_nothing_and_pins_nothing():
+    ring = HashRing()
+
+    assert ring.node_for("thread") is None
+    assert ring.owns("anywhere", "thread")
+    assert ring.new_key_for("anywhere")
+
+
+def test_new_keys_are_pinned_to_the_node():
+    ring = HashRing(NODES)
+
+    keys = [ring.new_key_for(NODES[2]) for _ in range(20)]
+
+    assert all(ring.node_for(key) == NODES[2] for key in keys)
+    with pytest.raises(ValueError):
+        ring.new_key_for("ws://10.0.0.9:8000")
+
+
+def test_node_missing_from_the_ring_gets_unpinned_ids(caplog):
+    states = SessionStateStore(MemorySessionStore(), ring=HashRing(NODES), node="worker-host:1234")
+
+    thread_ids = {states.new_thread_id() for _ in range(5)}
+
+    assert len(thread_ids) == 5
+    assert sum("not in CLUSTER_NODES" in record.message for record in caplog.records) == 1
@@ -0,0 +1,205 @@
+import asyncio
+import time as clock
+from datetime import datetime, time, timedelta
+
+import pytest
+import pytz
+
+from app.agent_builder.busy_index import BusyIndex
+from app.agent_builder.calendar_service import set_calendar_service
+from app.agent_builder.slot_finder import find_free_slots, working_windows
+from app.fakes.calendar import FakeCalendarService
+
+TZ = pytz.timezone("Australia/Sydney")
+
+
+def at(day, hour, minute=0):
+    return TZ.localize(datetime.combine(day, time(hour, minute)))
+
+
+def add_event(calendar, start, minutes=60, summary="Booked"):
+    end = start + timedelta(minutes=minutes)
+    return calendar.add_event({
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": end.isoformat()},
+    })
+
+
+@pytest.fixture
+def tomorrow():
+    return datetime.now(TZ).date() + timedelta(days=1)
+
+
+@pytest.fixture
+def calendar():
+    service = FakeCalendarService(time_zone=TZ.zone)
+    set_calendar_service(service)
+    return service
+
+
+@pytest.fixture
+def index(calendar):
+    return BusyIndex("primary", service_factory=lambda: calendar)
+
+
+def test_full_sync_then_incremental_sync(calendar, index, tomorrow):
+    first = add_event(calendar, at(tomorrow, 9))
+    second = add_event(calendar, at(tomorrow, 11))
+    assert [block.event_id for block in index.overlapping(at(tomorrow, 0), at(tomorrow, 23))] == [first["id"], second["id"]]
+    assert index.api_requests == 1
+
+    # Within refresh_seconds the index answers locally
+    add_event(calendar, at(tomorrow, 14))
+    assert len(index.overlapping(at(tomorrow, 0), at(tomorrow, 23))) == 2
+    assert index.api_requests == 1
+
+    calendar.delete_event(first["id"])
+    third = add_event(calendar, at(tomorrow, 16))
+    index.invalidate()
+    blocks = index.overlapping(at(tomorrow, 0), at(tomorrow, 23))
+    assert index.api_requests == 2
+    assert first["id"] not in {block.event_id for block in blocks}
+    assert third["id"] in {block.event_id for block in blocks}
+    assert len(blocks) == 3
+
+
+def test_expired_sync_token_triggers_full_resync(calendar, index, tomorrow):
+    add_event(calendar, at(tomorrow, 9))
+    index.ensure_fresh()
+    calendar.expire_sync_tokens()
+    later = add_event(calendar, at(tomorrow, 13))
+    index.invalidate()
+
+    blocks = index.overlapping(at(tomorrow, 0), at(tomorrow, 23))
+
+    # The rejected delta request plus the full listing
+    assert index.api_requests == 3
+    assert later["id"] in {block.event_id for block in blocks}
+    assert len(blocks) == 2
+    # The new token works for the next delta
+    index.invalidate()
+    index.ensure_fresh()
+    assert index.api_requests == 4
+
+
+def test_busy_and_free_answers(calendar, index, tomorrow):
+    add_event(calendar, at(tomorrow, 10), minutes=60)
+    add_event(calendar, at(tomorrow, 10, 30), minutes=60)
+
+    assert not index.is_free(at(tomorrow, 10, 45), at(tomorrow, 11, 15))
+    assert not index.is_free(at(tomorrow, 9, 30), at(tomorrow, 10, 1))
+    assert index.is_free(at(tomorrow, 9), at(tomorrow, 10))
+    assert index.is_free(at(tomorrow, 11, 30), at(tomorrow, 12))
+
+    windows = [(at(tomorrow, 9), at(tomorrow, 13))]
+    busy = [(block.start, block.end) for block in index.overlapping(*windows[0])]
+    slots = find_free_slots(busy, windows, timedelta(minutes=30), max_results=4)
+    assert [slot[0] for slot in slots] == [at(tomorrow, 9), at(tomorrow, 9, 15), at(tomorrow, 9, 30), at(tomorrow, 11, 30)]
+
+
+def test_free_slots_skip_weekends_and_busy_days(calendar, index, tomorrow):
+    monday = tomorrow + timedelta(days=(7 - tomorrow.weekday()) % 7)
+    add_event(calendar, at(monday, 9), minutes=8 * 60)
+    windows = working_windows(monday - timedelta(days=2), monday + timedelta(days=1), time(9), time(17), TZ)
+    busy = [(block.start, block.end) for block in index.overlapping(windows[0][0], windows[-1][1])]
+
+    slots = find_free_slots(busy, windows, timedelta(minutes=30), max_results=1)
+
+    assert slots == [(at(monday + timedelta(days=1), 9), at(monday + timedelta(days=1), 9, 30))]
+
+
+def test_concurrent_callers_share_one_sync(index, tomorrow):
+    index.service_factory().latency = 0.2
+    add_event(index.service_factory(), at(tomorrow, 9))
+
+    async def main():
+        index.ensure_fresh()
+        index.invalidate()
+        before = index.api_requests
+        await asyncio.gather(*(index.aensure_fresh() for _ in range(8)))
+        return index.api_requests - before
+
+    assert asyncio.run(main()) == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_sync(index, tomorrow):
+    index.service_factory().latency = 0.2
+    add_event(index.service_factory(), at(tomorrow, 9))
+
+    async def main():
+        first = asyncio.create_task(index.aensure_fresh())
+        second = asyncio.create_task(index.aensure_fresh())
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await second
+        return index.is_stale()
+
+    assert asyncio.run(main()) is False
+    assert index.api_requests == 1
+
+
+def test_sync_prunes_events_behind_the_horizon(calendar, tomorrow):
+    index = BusyIndex("primary", service_factory=lambda: calendar, history=timedelta(hours=1))
+    now = datetime.now(TZ).replace(second=0, microsecond=0)
+    add_event(calendar, now - timedelta(days=3))
+    add_event(calendar, at(tomorrow, 9))
+    index.ensure_fresh()
+    assert len(index._blocks) == 1
+
+    # An old event edited after the full sync comes back in a delta and is dropped
+    add_event(calendar, now - timedelta(hours=5))
+    current = add_event(calendar, now - timedelta(minutes=30))
+    index.invalidate()
+    index.ensure_fresh()
+    assert current["id"] in index._blocks
+    assert len(index._blocks) == 2
+    assert all(block.end > now - timedelta(hours=1) for block in index._snapshot.blocks)
+
+
+def test_query_does_not_block_the_loop_during_a_prefetch_sync(calendar, index, tomorrow):
+    booked = add_event(calendar, at(tomorrow, 9))
+    index.ensure_fresh()
+    calendar.latency = 0.8
+
+    async def main():
+        gaps = []
+
+        async def ticker():
+            last = clock.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = clock.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        # The prefetch looks ahead, so it syncs while queries still find the index fresh
+        prefetch = asyncio.create_task(index.aensure_fresh(lookahead=index.refresh_seconds, trigger="prefetch"))
+        await asyncio.sleep(0.05)
+        blocks = await index.aoverlapping(at(tomorrow, 0), at(tomorrow, 23))
+        await prefetch
+        ticking.cancel()
+        return blocks, max(gaps)
+
+    blocks, longest_gap = asyncio.run(main())
+
+    assert [block.event_id for block in blocks] == [booked["id"]]
+    assert index.api_requests == 2
+    assert longest_gap < 0.3
+
+
+def test_upsert_during_a_sync_survives_it(calendar, index, tomorrow):
+    index.ensure_fresh()
+    calendar.latency = 0.3
+
+    async def main():
+        sync = asyncio.create_task(index.aensure_fresh(lookahead=index.refresh_seconds))
+        await asyncio.sleep(0.05)
+        # Booked after the sync listed the calendar
+        index.upsert(add_event(calendar, at(tomorrow, 10)))
+        await sync
+
+    asyncio.run(main())
+
+    assert len(index.overlapping(at(tomorrow, 0), at(tomorrow, 23))) == 1
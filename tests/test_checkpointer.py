@@ -0,0 +1,120 @@
+import asyncio
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph, add_messages
+
+from app.agent_builder.checkpointer import StoreCheckpointSaver
+from app.fakes.redis import FakeRedis
+from app.utils.session_store import RedisSessionStore
+
+
+class EchoState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def echo(state: EchoState):
+    return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+
+def build_graph(saver):
+    builder = StateGraph(EchoState)
+    builder.add_node("echo", echo)
+    builder.set_entry_point("echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=saver)
+
+
+def config(thread_id="thread-1"):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+def saver_on(client, **kwargs):
+    return StoreCheckpointSaver(RedisSessionStore(client), **kwargs)
+
+
+def contents(state):
+    return [message.content for message in state.values["messages"]]
+
+
+def test_conversation_resumes_on_another_saver(client):
+    async def main():
+        await build_graph(saver_on(client)).ainvoke({"messages": [HumanMessage(content="hi")]}, config())
+        # Another worker, with its own saver over the same store
+        other = build_graph(saver_on(client))
+        await other.ainvoke({"messages": [HumanMessage(content="again")]}, config())
+        return await other.aget_state(config())
+
+    state = asyncio.run(main())
+
+    assert contents(state) == ["hi", "echo: hi", "again", "echo: again"]
+
+
+def test_threads_are_kept_apart(client):
+    async def main():
+        graph = build_graph(saver_on(client))
+        await graph.ainvoke({"messages": [HumanMessage(content="one")]}, config("a"))
+        await graph.ainvoke({"messages": [HumanMessage(content="two")]}, config("b"))
+        return await graph.aget_state(config("a")), await graph.aget_state(config("b"))
+
+    first, second = asyncio.run(main())
+
+    assert contents(first) == ["one", "echo: one"]
+    assert contents(second) == ["two", "echo: two"]
+
+
+def test_only_the_newest_checkpoints_are_kept(client):
+    saver = saver_on(client, keep_per_thread=2)
+
+    async def main():
+        graph = build_graph(saver)
+        for turn in range(4):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"turn {turn}")]}, config())
+        return [checkpoint async for checkpoint in saver.alist(config())], await graph.aget_state(config())
+
+    checkpoints, state = asyncio.run(main())
+
+    assert len(checkpoints) == 2
+    stored = list(saver.store.scan("ckpt:thread-1::cp:"))
+    assert len(stored) == 2
+    # Pruning old checkpoints does not lose history: each one holds the full state
+    assert len(state.values["messages"]) == 8
+
+
+def test_update_state_is_seen_by_another_saver(client):
+    async def main():
+        graph = build_graph(saver_on(client))
+        await graph.ainvoke({"messages": [HumanMessage(content="book me in")]}, config())
+        state = await graph.aget_state(config())
+        reply = state.values["messages"][-1]
+        # Replace the reply in place, as a barge-in truncation does
+        await graph.aupdate_state(config(), {"messages": [AIMessage(content="echo: bo", id=reply.id)]}, as_node="echo")
+        return await build_graph(saver_on(client)).aget_state(config())
+
+    state = asyncio.run(main())
+
+    assert contents(state) == ["book me in", "echo: bo"]
+    assert state.next == ()
+
+
+def test_delete_thread_removes_every_key(client):
+    saver = saver_on(client)
+
+    async def main():
+        graph = build_graph(saver)
+        await graph.ainvoke({"messages": [HumanMessage(content="hi")]}, config("gone"))
+        await graph.ainvoke({"messages": [HumanMessage(content="hi")]}, config("kept"))
+        await saver.adelete_thread("gone")
+        return await graph.aget_state(config("gone")), await graph.aget_state(config("kept"))
+
+    gone, kept = asyncio.run(main())
+
+    assert not gone.values
+    assert contents(kept) == ["hi", "echo: hi"]
+    assert not list(saver.store.scan("ckpt:gone:"))
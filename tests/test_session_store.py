@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from app.fakes.redis import FakeRedis
+from app.utils.affinity import HashRing
+from app.utils.session_store import MemorySessionStore, RedisSessionStore, SqliteSessionStore
+from app.voice_manager.session_state import SessionStateStore, VoiceSession
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store_factory(request, tmp_path):
+    """Builds stores that share state the way the backend does across workers."""
+    if request.param == "memory":
+        store = MemorySessionStore()
+        return lambda: store
+    if request.param == "sqlite":
+        return lambda: SqliteSessionStore(str(tmp_path / "sessions.sqlite"))
+    client = FakeRedis()
+    return lambda: RedisSessionStore(client)
+
+
+def test_set_get_delete(store_factory):
+    store = store_factory()
+
+    store.set("session:a", b"1")
+    store.set("session:b", b"2")
+    store.delete("session:a", "session:missing")
+
+    assert store.get("session:a") is None
+    assert store.get("session:b") == b"2"
+
+
+def test_expired_keys_are_gone(store_factory):
+    store = store_factory()
+
+    store.set("session:short", b"1", ttl=0.05)
+    store.set("session:long", b"2", ttl=60)
+    time.sleep(0.1)
+
+    assert store.get("session:short") is None
+    assert list(store.scan("session:")) == ["session:long"]
+
+
+def test_scan_matches_the_prefix_literally(store_factory):
+    store = store_factory()
+    for key in ("ckpt:a*:ns:index", "ckpt:ab:ns:index", "ckpt:a*:other:index", "other:a*"):
+        store.set(key, b"x")
+
+    assert sorted(store.scan("ckpt:a*:")) == ["ckpt:a*:ns:index", "ckpt:a*:other:index"]
+
+
+def test_another_worker_sees_the_session(store_factory):
+    ring = HashRing(["ws://host-1", "ws://host-2"])
+    first = SessionStateStore(store_factory(), ring=ring, node="ws://host-1")
+    second = SessionStateStore(store_factory(), ring=ring, node="ws://host-2")
+    thread_id = first.new_thread_id()
+
+    async def main():
+        await first.save(VoiceSession(chat_thread_id=thread_id, node="", turns=2, pending_transcript=["next tuesday"]))
+        resumed = await second.load(thread_id)
+        await second.delete(thread_id)
+        return resumed, await first.load(thread_id)
+
+    resumed, after_delete = asyncio.run(main())
+
+    assert first.owner(thread_id) == "ws://host-1"
+    assert resumed.node == "ws://host-1"
+    assert resumed.turns == 2
+    assert resumed.pending_transcript == ["next tuesday"]
+    assert after_delete is None
+
+
+def test_unreadable_session_record_is_discarded():
+    store = MemorySessionStore()
+    store.set("session:broken", b"{not json")
+
+    assert asyncio.run(SessionStateStore(store, ring=HashRing()).load("broken")) is None
@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.voice_manager.audio_decoder import FRAME_BYTES, FRAME_MS, SAMPLE_RATE
+from app.voice_manager.vad import EnergyVad
+from benchmarks.vad_benchmark import run_fixture, synth_fixture, synth_noise, synth_speech
+
+
+def to_frames(signal: np.ndarray):
+    pcm = np.clip(signal * 32767, -32768, 32767).astype("<i2").tobytes()
+    return [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)]
+
+
+def seconds(value: float) -> int:
+    return int(value * SAMPLE_RATE)
+
+
+@pytest.mark.parametrize("seed, snr_db, noise_kind", [(1, 20, "white"), (4, 20, "babble"), (0, 30, "white")])
+def test_detects_speech_and_silence_in_fixtures(seed, snr_db, noise_kind):
+    name, pcm, segments = synth_fixture(seed, snr_db, noise_kind)
+
+    result = asyncio.run(run_fixture(name, pcm, segments, hangover_ms=800))
+
+    assert result["speech_recall"] >= 0.95
+    assert result["false_alarm_rate"] <= 0.1
+    assert result["missed_endpoints"] == 0
+
+
+def test_background_noise_alone_is_not_speech():
+    rng = np.random.default_rng(3)
+    vad = EnergyVad()
+    frames = to_frames(synth_noise(rng, seconds(5), "babble") * 0.01)
+
+    results = [vad.process(frame) for frame in frames]
+
+    # The first frames calibrate the noise floor
+    settled = results[10:]
+    assert not any(result.is_speech or result.speech_started for result in settled)
+
+
+@pytest.mark.parametrize("hangover_ms", [400, 800])
+def test_endpoint_fires_within_the_hangover_window(hangover_ms):
+    _, pcm, segments = synth_fixture(2, 20, "babble")
+    frames = [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES)]
+    vad = EnergyVad(hangover_ms=hangover_ms)
+
+    endpoints_ms = [(index + 1) * FRAME_MS for index, frame in enumerate(frames) if vad.process(frame).utterance_ended]
+    # Ignore the false start while the noise floor is still calibrating
+    endpoints_ms = [endpoint_ms for endpoint_ms in endpoints_ms if endpoint_ms > segments[0][0] * 1000]
+
+    assert len(endpoints_ms) == len(segments)
+    for endpoint_ms, (_, end) in zip(endpoints_ms, segments):
+        # The labelled end can fall in a syllable's fade-out, hence the early margin
+        assert hangover_ms - 2 * FRAME_MS <= endpoint_ms - end * 1000 <= hangover_ms + 2 * FRAME_MS
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_noise_floor_does_not_rise_during_sustained_speech(seed):
+    rng = np.random.default_rng(seed)
+    noise = synth_noise(rng, seconds(8), "white") * 0.01
+    signal = np.concatenate([np.zeros(seconds(2)), synth_speech(rng, 6) * 0.3]) + noise
+    vad = EnergyVad()
+    floors, speech, in_utterance = [], [], []
+
+    for frame in to_frames(signal):
+        speech.append(vad.process(frame).is_speech)
+        floors.append(vad.noise_floor_db)
+        in_utterance.append(vad.in_speech)
+
+    speech_start = 2000 // FRAME_MS
+    assert max(floors[speech_start:]) - floors[speech_start - 1] < 1.0
+    # Still heard as speech to the end, not absorbed into the floor
+    assert all(in_utterance[speech_start + 1:])
+    assert np.mean(speech[speech_start:]) >= 0.6
+
+
+def test_louder_steady_background_is_learned():
+    rng = np.random.default_rng(5)
+    quiet = synth_noise(rng, seconds(2), "white") * 0.003
+    loud = synth_noise(rng, seconds(4), "white") * 0.03
+    vad = EnergyVad()
+
+    results = [vad.process(frame) for frame in to_frames(np.concatenate([quiet, loud]))]
+
+    assert not any(result.is_speech for result in results[-10:])